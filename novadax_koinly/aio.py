@@ -0,0 +1,182 @@
+"""
+API assíncrona (asyncio) da conversão, para serviços que recebem vários
+extratos ao mesmo tempo sem travar o event loop.
+
+O trabalho bloqueante (leitura, classificação e gravação) roda em um
+executor; a extração das páginas do PDF, que é a parte pesada, fica nos
+processos de extração (veja pdf_converter.PageExtractor e pipeline), fora
+do GIL. Cada AsyncConverter limita quantas conversões rodam ao mesmo tempo.
+"""
+import asyncio
+import functools
+import io
+import os
+import threading
+
+from .converter import convert_novadax_to_koinly, iter_koinly_records_from, iter_novadax_rows
+from .pdf_converter import DEFAULT_PAGE_TIMEOUT, PDF_MAGIC_WINDOW, is_pdf_data
+
+# Conversões simultâneas por AsyncConverter
+DEFAULT_CONCURRENCY = 4
+
+# Registros gerados a cada ida ao executor
+DEFAULT_CHUNK_SIZE = 256
+
+class _Cancelled(Exception):
+    """
+    Interrompe a conversão em andamento no executor (veja _cancellable).
+    """
+
+def _cancellable(rows, stop):
+    """
+    Repassa as linhas do extrato até 'stop' ser acionado: o cancelamento é
+    cooperativo e vale a partir da próxima linha lida.
+    """
+    for row in rows:
+        if stop.is_set():
+            raise _Cancelled()
+        yield row
+
+def _source_rows(source, pdf=None, since=None, until=None, pages=None, page_timeout=None,
+                 on_page=None):
+    """
+    Linhas do extrato a partir de qualquer fonte aceita por
+    iter_novadax_rows ou, se for PDF, por iter_pdf_transactions. Com
+    pdf=None o tipo é detectado pelo conteúdo.
+    """
+    if pdf is None:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, mode='rb') as infile:
+                pdf = is_pdf_data(infile.read(PDF_MAGIC_WINDOW))
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            pdf = is_pdf_data(bytes(source[:PDF_MAGIC_WINDOW]))
+        elif hasattr(source, 'read'):
+            source = source.read()
+            if isinstance(source, str):
+                source = io.StringIO(source)
+                pdf = False
+            else:
+                pdf = is_pdf_data(source)
+        else:
+            pdf = False  # Linhas já separadas em campos
+
+    if not pdf:
+        return iter_novadax_rows(source)
+
+    from .pdf_converter import iter_pdf_transactions
+    from .pipeline import pipeline_enabled
+
+    return iter_pdf_transactions(source, since, until, pages, page_timeout=page_timeout,
+                                 pipelined=pipeline_enabled(), on_page=on_page)
+
+def _page_hook(options):
+    progress = options.get('progress')
+    return progress.page_done if progress is not None else None
+
+def _open_records(source, stop, pdf_options, options):
+    rows = _cancellable(_source_rows(source, on_page=_page_hook(options), **pdf_options), stop)
+    return iter_koinly_records_from(rows, **options)
+
+def _next_chunk(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            break
+    return chunk
+
+def _convert(source, output_file, stop, pdf_options, options):
+    rows = _cancellable(_source_rows(source, on_page=_page_hook(options), **pdf_options), stop)
+    return convert_novadax_to_koinly(rows, output_file, **options)
+
+class AsyncConverter:
+    """
+    Conversões sem bloquear o event loop, no máximo 'concurrency' ao mesmo
+    tempo (as demais esperam a vez). 'executor' é o concurrent.futures
+    onde roda o trabalho bloqueante; None usa o executor padrão do loop.
+    Deve ser um executor de threads, já que os geradores da conversão
+    continuam vivos entre uma chamada e outra.
+
+    Uma instância pertence a um único event loop.
+    """
+
+    def __init__(self, executor=None, concurrency=DEFAULT_CONCURRENCY,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        if concurrency < 1:
+            raise ValueError("concurrency deve ser pelo menos 1")
+        self.executor = executor
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self._semaphore = None
+
+    @property
+    def _limit(self):
+        # Criado no primeiro uso, já dentro do event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run(self, stop, function, *args):
+        """
+        Roda function no executor. Se a tarefa for cancelada, aciona 'stop'
+        e espera a função terminar antes de propagar o cancelamento, para
+        que nada continue rodando depois que quem pediu desistiu.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(function, *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            stop.set()
+            await asyncio.wait([future])
+            if not future.cancelled():
+                future.exception()  # Já tratada: o cancelamento é o que vale
+            raise
+
+    async def iter_records(self, source, pdf=None, since=None, until=None, pages=None,
+                           page_timeout=DEFAULT_PAGE_TIMEOUT, **options):
+        """
+        Gerador assíncrono de KoinlyRecords a partir de um CSV ou PDF da
+        Novadax (caminho, bytes, arquivo aberto ou linhas). 'options' vai
+        para iter_koinly_records_from (stats, on_reject, price_index,
+        row_filter, progress); since/until/pages/page_timeout valem para
+        PDF (veja iter_pdf_transactions). Os registros são produzidos em
+        lotes de 'chunk_size' no executor, onde também roda o callback de
+        progress.
+
+        Se o consumo parar antes do fim (break, aclose ou cancelamento da
+        tarefa), a extração é interrompida e os processos de extração são
+        encerrados.
+        """
+        stop = threading.Event()
+        pdf_options = dict(pdf=pdf, since=since, until=until, pages=pages,
+                           page_timeout=page_timeout)
+        async with self._limit:
+            records = await self._run(stop, _open_records, source, stop, pdf_options, options)
+            try:
+                while True:
+                    chunk = await self._run(stop, _next_chunk, records, self.chunk_size)
+                    for record in chunk:
+                        yield record
+                    if len(chunk) < self.chunk_size:
+                        break
+            finally:
+                stop.set()
+                await self._run(stop, records.close)
+
+    async def convert(self, source, output_file, pdf=None, since=None, until=None, pages=None,
+                      page_timeout=DEFAULT_PAGE_TIMEOUT, **options) -> dict:
+        """
+        Conversão completa, como convert_novadax_to_koinly (que recebe
+        'options' e cujo resultado é retornado), a partir de um CSV ou PDF;
+        veja iter_records para as fontes e as opções de PDF.
+
+        Se a tarefa for cancelada, a conversão para na próxima linha lida e
+        o cancelamento é propagado depois que ela parou; o arquivo de saída
+        fica incompleto.
+        """
+        stop = threading.Event()
+        pdf_options = dict(pdf=pdf, since=since, until=until, pages=pages,
+                           page_timeout=page_timeout)
+        async with self._limit:
+            return await self._run(stop, _convert, source, output_file, stop, pdf_options, options)
@@ -0,0 +1,107 @@
+"""
+Identificadores de ativos do Koinly para os tickers da NovaDax.
+
+Quando um ticker é ambíguo (vários ativos com o mesmo símbolo), o Koinly
+para a importação e pede que o ativo seja escolhido à mão. Com o
+identificador 'ID:<número>' do ativo na coluna de moeda, a importação segue
+direto. A tabela do pacote (koinly_assets.csv) pode ser complementada ou
+sobreposta por um arquivo do usuário no mesmo formato.
+"""
+import csv
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+from typing import Dict, Optional
+
+# Tabela distribuída com o pacote (CSV: Ticker,Koinly ID)
+SHIPPED_ASSET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "koinly_assets.csv")
+
+def cache_dir() -> str:
+    """
+    Pasta de cache do pacote: a forma compilada das tabelas de ativos e o
+    cache de conversões (veja jobcache).
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'novadax_koinly')
+
+def read_asset_file(path: str) -> Dict[str, str]:
+    """
+    Lê uma tabela de ativos: CSV com cabeçalho 'Ticker,Koinly ID'. Linhas em
+    branco, comentários ('#') e linhas sem as duas colunas são ignorados; o
+    ticker é comparado em maiúsculas.
+    """
+    asset_ids = {}
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.reader(line for line in infile if not line.lstrip().startswith('#'))
+        next(reader, None)  # Cabeçalho: Ticker,Koinly ID
+        for row in reader:
+            if len(row) < 2 or not row[0].strip() or not row[1].strip():
+                continue
+            asset_ids[sys.intern(row[0].strip().upper())] = sys.intern(row[1].strip())
+    return asset_ids
+
+@lru_cache(maxsize=None)
+def _load_asset_ids(sources: tuple) -> Dict[str, str]:
+    # Um arquivo compilado por combinação de tabelas, válido enquanto
+    # nenhuma delas mudar (data de modificação e tamanho)
+    paths = [path for path, _, _ in sources]
+    key = hashlib.sha1("\n".join(paths).encode('utf-8')).hexdigest()[:16]
+    cache_file = os.path.join(cache_dir(), f"asset_ids-{key}.json")
+    try:
+        with open(cache_file, mode='r', encoding='utf-8') as infile:
+            cached = json.load(infile)
+        if [tuple(source) for source in cached["sources"]] == list(sources):
+            return {sys.intern(k): sys.intern(v) for k, v in cached["asset_ids"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    asset_ids = {}
+    for path in paths:
+        # O arquivo do usuário vem depois e sobrepõe a tabela do pacote
+        asset_ids.update(read_asset_file(path))
+
+    # A forma compilada é só um atalho: sem permissão de escrita, segue sem ela
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, mode='w', encoding='utf-8') as outfile:
+            json.dump({"sources": sources, "asset_ids": asset_ids}, outfile)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return asset_ids
+
+def load_asset_ids(asset_file: Optional[str] = None) -> Dict[str, str]:
+    """
+    Tabela ticker -> identificador Koinly: a do pacote, sobreposta pela do
+    usuário (asset_file), se houver. É compilada uma vez por processo
+    enquanto os arquivos não mudarem, e a forma compilada fica gravada em
+    cache_dir() para as próximas execuções.
+    """
+    paths = [SHIPPED_ASSET_FILE] + ([asset_file] if asset_file else [])
+    sources = []
+    for path in paths:
+        path = os.path.abspath(path)
+        info = os.stat(path)
+        sources.append((path, info.st_mtime_ns, info.st_size))
+    return _load_asset_ids(tuple(sources))
+
+def asset_id(asset_ids: Dict[str, str], currency: str) -> str:
+    """
+    Identificador Koinly de um ticker (comparado em maiúsculas, como em
+    read_asset_file); fora da tabela, o ticker fica como está.
+    """
+    return asset_ids.get(currency.upper(), currency)
+
+def apply_asset_ids(records, asset_ids: Dict[str, str]):
+    """
+    Troca os tickers das colunas de envio, recebimento e taxa pelos
+    identificadores Koinly da tabela; moedas fora dela ficam como estão.
+    """
+    for record in records:
+        record.sent_currency = asset_id(asset_ids, record.sent_currency)
+        record.received_currency = asset_id(asset_ids, record.received_currency)
+        record.fee_currency = asset_id(asset_ids, record.fee_currency)
+        yield record
@@ -0,0 +1,160 @@
+from decimal import Decimal
+from typing import Dict, Optional
+
+from .converter import format_date, group_koinly_records
+
+ZERO = Decimal(0)
+
+class _CurrencyTotals:
+    """
+    Acumuladores de uma moeda. 'prefix' é o saldo parcial na ordem do arquivo;
+    'low_prefix'/'high_prefix' guardam os extremos usados para achar o ponto
+    de menor saldo em extratos crescentes ou decrescentes.
+    """
+    __slots__ = ('sent', 'received', 'fees', 'prefix',
+                 'low_prefix', 'low_date', 'high_prefix', 'high_date')
+
+    def __init__(self):
+        self.sent = ZERO
+        self.received = ZERO
+        self.fees = ZERO
+        self.prefix = ZERO
+        self.low_prefix = None
+        self.low_date = None
+        self.high_prefix = None
+        self.high_date = None
+
+class BalanceTracker:
+    """
+    Soma, em uma única passada e com Decimal exato, o total enviado, recebido
+    e pago em taxas por moeda, e acompanha o ponto de menor saldo.
+
+    Como o extrato pode vir em ordem crescente ou decrescente de data, são
+    guardados os dois candidatos (menor saldo parcial e maior saldo parcial
+    antes da linha); a ordem é decidida no resumo pela primeira e última data.
+    Os saldos só são amostrados entre grupos de transações com a mesma
+    data/hora: as pernas de uma operação (Convert e taxa, Compra e taxa)
+    entram juntas, em qualquer ordem do arquivo.
+    """
+
+    def __init__(self, opening_balances: Optional[Dict[str, Decimal]] = None,
+                 closing_balances: Optional[Dict[str, Decimal]] = None):
+        self.opening = {k.upper(): Decimal(v) for k, v in (opening_balances or {}).items()}
+        self.closing = {k.upper(): Decimal(v) for k, v in (closing_balances or {}).items()}
+        self.totals = {}
+        self.first_date = None
+        self.last_date = None
+
+    def _totals(self, currency: str) -> _CurrencyTotals:
+        totals = self.totals.get(currency)
+        if totals is None:
+            totals = self.totals[currency] = _CurrencyTotals()
+        return totals
+
+    def _apply(self, currency: str, delta: Decimal, date) -> None:
+        totals = self._totals(currency)
+
+        # Ordem decrescente: o saldo cronológico após esta linha depende do
+        # saldo parcial ANTES dela
+        if totals.high_prefix is None or totals.prefix > totals.high_prefix:
+            totals.high_prefix = totals.prefix
+            totals.high_date = date
+
+        totals.prefix += delta
+
+        # Ordem crescente: o saldo após esta linha é o saldo parcial
+        if totals.low_prefix is None or totals.prefix < totals.low_prefix:
+            totals.low_prefix = totals.prefix
+            totals.low_date = date
+
+    def update(self, record) -> None:
+        """
+        Acumula uma transação sozinha (O(1) por linha).
+        """
+        self.update_group([record])
+
+    def update_group(self, group) -> None:
+        """
+        Acumula um grupo de transações com a mesma data/hora (veja
+        converter.group_koinly_records), aplicando o saldo de cada moeda de
+        uma vez.
+        """
+        deltas = {}
+        for record in group:
+            if record.date is not None:
+                if self.first_date is None:
+                    self.first_date = record.date
+                self.last_date = record.date
+
+            if record.received_amount is not None and record.received_currency:
+                currency = record.received_currency.upper()
+                self._totals(currency).received += record.received_amount
+                deltas[currency] = deltas.get(currency, ZERO) + record.received_amount
+            if record.sent_amount is not None and record.sent_currency:
+                currency = record.sent_currency.upper()
+                self._totals(currency).sent += record.sent_amount
+                deltas[currency] = deltas.get(currency, ZERO) - record.sent_amount
+            if record.fee_amount is not None and record.fee_currency:
+                currency = record.fee_currency.upper()
+                self._totals(currency).fees += record.fee_amount
+                deltas[currency] = deltas.get(currency, ZERO) - record.fee_amount
+
+        date = group[0].date
+        for currency, delta in deltas.items():
+            self._apply(currency, delta, date)
+
+    def track(self, records):
+        """
+        Repassa as transações acumulando os totais no caminho, grupo a grupo.
+        """
+        for group in group_koinly_records(records):
+            self.update_group(group)
+            yield from group
+
+    def summary(self) -> dict:
+        """
+        Retorna os totais por moeda, o saldo final calculado, a diferença em
+        relação ao saldo final informado e o ponto de menor saldo de cada
+        moeda que ficou negativa.
+        """
+        descending = (self.first_date is not None and self.last_date is not None
+                      and self.first_date > self.last_date)
+        currencies = {}
+        negative_balances = {}
+
+        for currency in sorted(set(self.totals) | set(self.opening) | set(self.closing)):
+            totals = self.totals.get(currency) or _CurrencyTotals()
+            opening = self.opening.get(currency, ZERO)
+            net = totals.received - totals.sent - totals.fees
+            computed_closing = opening + net
+
+            entry = {
+                "sent": totals.sent,
+                "received": totals.received,
+                "fees": totals.fees,
+                "net": net,
+                "opening": opening,
+                "computed_closing": computed_closing,
+            }
+            if currency in self.closing:
+                entry["expected_closing"] = self.closing[currency]
+                entry["difference"] = computed_closing - self.closing[currency]
+            currencies[currency] = entry
+
+            if descending and totals.high_prefix is not None:
+                lowest, lowest_date = opening + net - totals.high_prefix, totals.high_date
+            elif totals.low_prefix is not None:
+                lowest, lowest_date = opening + totals.low_prefix, totals.low_date
+            else:
+                continue
+            if lowest < ZERO:
+                negative_balances[currency] = {
+                    "balance": lowest,
+                    "date": format_date(lowest_date),
+                }
+
+        return {
+            "order": "descending" if descending else "ascending",
+            "currencies": currencies,
+            "negative_balances": negative_balances,
+        }
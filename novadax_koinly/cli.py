@@ -1,25 +1,300 @@
 import argparse
+import contextlib
+import io
 import os
 import sys
-from .converter import convert_novadax_to_koinly
-from .pdf_converter import novadax_pdf_to_csv
+from decimal import Decimal, InvalidOperation
+from .jobcache import DEFAULT_CACHE_MB
+from .pdf_converter import (
+    DEFAULT_PAGE_TIMEOUT, PDF_MAGIC_WINDOW, is_pdf_data, parse_date_bound, parse_page_ranges,
+)
 
-def main():
+def parse_balances(values):
+    """
+    Converte argumentos 'MOEDA=VALOR' em um dicionário {moeda: Decimal}.
+    """
+    balances = {}
+    for value in values:
+        currency, sep, amount = value.partition('=')
+        try:
+            balances[currency.strip().upper()] = Decimal(amount.strip())
+        except InvalidOperation:
+            sep = ''
+        if not sep or not currency.strip():
+            raise ValueError(f"Saldo inválido: {value} (use MOEDA=VALOR)")
+    return balances
+
+def print_balance_summary(summary):
+    """
+    Exibe a conferência de saldos por moeda.
+    """
+    print("\nConferência de saldos:")
+    for currency, entry in summary['currencies'].items():
+        line = (f"  {currency}: recebido {entry['received']}, enviado {entry['sent']}, "
+                f"taxas {entry['fees']}, saldo final {entry['computed_closing']}")
+        if 'difference' in entry:
+            line += f" (esperado {entry['expected_closing']}, diferença {entry['difference']})"
+        print(line)
+    for currency, point in summary['negative_balances'].items():
+        print(f"  Atenção: saldo de {currency} negativo ({point['balance']}) em {point['date']}")
+
+def reprocess_main(argv):
+    """
+    Subcomando `reprocess`: converte só as linhas em quarentena e as insere
+    na saída Koinly existente.
+    """
+    parser = argparse.ArgumentParser(
+        prog='nova2k reprocess',
+        description='Reprocessa as linhas rejeitadas (arquivo de quarentena) e as '
+                    'insere na saída Koinly existente'
+    )
+    
+    parser.add_argument(
+        'quarantine_file',
+        help='Arquivo de quarentena gerado na conversão (<saida>_quarantine.csv)'
+    )
+    
+    parser.add_argument(
+        '-o', '--output',
+        help='Saída Koinly onde inserir as transações recuperadas '
+             '(padrão: nome do arquivo de quarentena sem "_quarantine")',
+        default=None
+    )
+    
+    parser.add_argument(
+        '--price-file',
+        default=None,
+        help='CSV de preços históricos em BRL (Date,Asset,Price)'
+    )
+    
+    parser.add_argument(
+        '--asset-map',
+        metavar='ARQUIVO',
+        default=None,
+        help='Tabela CSV (Ticker,Koinly ID) com identificadores de ativos do Koinly; '
+             'complementa e sobrepõe a tabela do pacote'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    output = args.output
+    if output is None:
+        base, ext = os.path.splitext(args.quarantine_file)
+        if not base.endswith('_quarantine'):
+            print("Erro: informe a saída Koinly com -o.")
+            sys.exit(1)
+        output = base[:-len('_quarantine')] + ext
+        if not os.path.isfile(output):
+            # Ex.: saída dividida em vários arquivos ou gravada na saída padrão
+            print(f"Erro: Arquivo {output} não encontrado; informe a saída Koinly com -o.")
+            sys.exit(1)
+    
+    for path in (args.quarantine_file, output) + ((args.asset_map,) if args.asset_map else ()):
+        if not os.path.isfile(path):
+            print(f"Erro: Arquivo {path} não encontrado.")
+            sys.exit(1)
+    
+    from .quarantine import reprocess_quarantine
+    
+    result = reprocess_quarantine(args.quarantine_file, output, price_file=args.price_file,
+                                  asset_file=args.asset_map)
+    print(f"Reprocessadas {result['reprocessed_rows']} linhas: "
+          f"{result['recovered_rows']} transações inseridas em {output}")
+    if result['quarantine_file']:
+        print(f"{result['remaining_rows']} linhas continuam em {result['quarantine_file']}")
+
+def merge_main(argv):
+    """
+    Subcomando `merge`: junta vários arquivos Koinly ou extratos NovaDax em
+    uma única saída Koinly em ordem cronológica.
+    """
+    parser = argparse.ArgumentParser(
+        prog='nova2k merge',
+        description='Junta vários arquivos Koinly ou CSVs da NovaDax em um único '
+                    'arquivo Koinly em ordem cronológica'
+    )
+    
+    parser.add_argument(
+        'input_files',
+        nargs='+',
+        help='Arquivos Koinly ou CSVs da NovaDax'
+    )
+    
+    parser.add_argument(
+        '-o', '--output',
+        required=True,
+        help='Arquivo de saída (formato Koinly)'
+    )
+    
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Remove transações repetidas entre os arquivos'
+    )
+    
+    parser.add_argument(
+        '--run-rows',
+        type=int,
+        default=None,
+        help='Linhas ordenadas em memória por vez para arquivos fora de ordem '
+             '(padrão: 100000)'
+    )
+    
+    parser.add_argument(
+        '--asset-map',
+        metavar='ARQUIVO',
+        default=None,
+        help='Tabela CSV (Ticker,Koinly ID) com identificadores de ativos do Koinly; '
+             'complementa e sobrepõe a tabela do pacote'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    for path in args.input_files + ([args.asset_map] if args.asset_map else []):
+        if not os.path.isfile(path):
+            print(f"Erro: Arquivo {path} não encontrado.")
+            sys.exit(1)
+    
+    from .merge import DEFAULT_RUN_ROWS, merge_statements
+    
+    try:
+        result = merge_statements(args.input_files, args.output, dedup=args.dedup,
+                                  run_rows=args.run_rows or DEFAULT_RUN_ROWS,
+                                  asset_file=args.asset_map)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    print(f"Juntados {result['input_files']} arquivos: {result['merged_rows']} transações em {args.output}")
+    if result['spilled_runs']:
+        print(f"{result['input_files'] - result['sorted_inputs']} arquivos fora de ordem "
+              f"ordenados em {result['spilled_runs']} trechos")
+    if args.dedup:
+        print(f"{result['duplicate_rows']} transações repetidas removidas")
+    if result['rejected_rows']:
+        print(f"Atenção: {result['rejected_rows']} linhas da NovaDax não foram convertidas "
+              f"(converta o extrato com nova2k para gerar a quarentena)")
+
+def print_cost_basis_summary(summary):
+    """
+    Exibe o total alienado por mês e a situação da isenção.
+    """
+    print("\nAlienações por mês (FIFO):")
+    for month, entry in summary['months'].items():
+        if entry['exempt'] is None:
+            status = f"isenção indeterminada: {entry['unpriced_rows']} alienações sem valor em reais"
+        else:
+            status = "isento" if entry['exempt'] else "acima do limite de isenção"
+        print(f"  {month}: alienado R$ {entry['proceeds']:.2f}, ganho R$ {entry['gain']:.2f} ({status})")
+        for asset, disposals in entry['assets'].items():
+            print(f"    {asset}: {disposals['quantity']} por R$ {disposals['proceeds']:.2f}, "
+                  f"custo R$ {disposals['cost']:.2f}")
+    for asset, quantity in summary['uncovered'].items():
+        print(f"  Atenção: venda de {quantity} {asset} sem compra correspondente (custo zero)")
+    if summary['unpriced_rows']:
+        print(f"  Atenção: {summary['unpriced_rows']} alienações sem valor em reais "
+              f"(use --price-file)")
+
+def costbasis_main(argv):
+    """
+    Subcomando `costbasis`: calcula localmente o custo FIFO e o total
+    alienado por mês de um CSV da NovaDax ou de uma saída Koinly.
+    """
     parser = argparse.ArgumentParser(
-        description='Conversor de relatórios da NovaDax para formato Koinly'
+        prog='nova2k costbasis',
+        description='Calcula o custo de aquisição (FIFO) e o total alienado por mês '
+                    'e ativo, para conferir o limite de isenção de R$ 35.000'
     )
     
     parser.add_argument(
         'input_file',
-        help='Arquivo de entrada (CSV da NovaDax ou PDF)'
+        help='CSV da NovaDax ou arquivo Koinly'
     )
     
     parser.add_argument(
         '-o', '--output',
-        help='Arquivo de saída (formato Koinly)',
+        default=None,
+        help='Relatório mensal de alienações em CSV (padrão: <entrada>_alienacoes.csv)'
+    )
+    
+    parser.add_argument(
+        '--price-file',
+        default=None,
+        help='CSV de preços históricos em BRL (Date,Asset,Price) para transações sem estimativa'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    if not os.path.isfile(args.input_file):
+        print(f"Erro: Arquivo {args.input_file} não encontrado.")
+        sys.exit(1)
+    
+    output = args.output or os.path.splitext(args.input_file)[0] + "_alienacoes.csv"
+    
+    from .costbasis import compute_cost_basis
+    
+    try:
+        summary = compute_cost_basis(args.input_file, output, price_file=args.price_file)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    print_cost_basis_summary(summary)
+    print(f"\nRelatório salvo em {output}")
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    if argv and argv[0] == 'reprocess':
+        return reprocess_main(argv[1:])
+    if argv and argv[0] == 'merge':
+        return merge_main(argv[1:])
+    if argv and argv[0] == 'costbasis':
+        return costbasis_main(argv[1:])
+    
+    parser = argparse.ArgumentParser(
+        description='Conversor de relatórios da NovaDax para formato Koinly',
+        epilog='Para reprocessar linhas rejeitadas: nova2k reprocess ARQUIVO_QUARANTINE. '
+               'Para juntar vários arquivos: nova2k merge ARQUIVOS -o SAIDA. '
+               'Para o custo FIFO e as alienações mensais: nova2k costbasis ARQUIVO'
+    )
+    
+    parser.add_argument(
+        'input_file',
+        help='Arquivo de entrada (CSV da NovaDax ou PDF); "-" lê da entrada padrão'
+    )
+    
+    parser.add_argument(
+        '-o', '--output',
+        help='Arquivo de saída (formato Koinly); "-" escreve na saída padrão '
+             '(padrão quando a entrada é "-")',
         default=None
     )
     
+    parser.add_argument(
+        '--also',
+        action='append',
+        default=[],
+        metavar='FORMATO=ARQUIVO',
+        help='Grava também outro formato na mesma passada: cointracking, ledger '
+             'ou koinly (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--quarantine',
+        default=None,
+        metavar='ARQUIVO',
+        help='Arquivo para as linhas rejeitadas (padrão: <saida>_quarantine.csv; '
+             'com entrada e saída padrão, as linhas rejeitadas só são contadas)'
+    )
+    
+    parser.add_argument(
+        '--append-to',
+        default=None,
+        metavar='ARQUIVO',
+        help='Acrescenta a um CSV Koinly só as transações posteriores à última '
+             'conversão incremental (o extrato pode repetir todo o histórico)'
+    )
+    
     parser.add_argument(
         '--pdf',
         action='store_true',
@@ -32,29 +307,233 @@ def main():
         help='Força o processamento como CSV, mesmo se a extensão não for .csv'
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        '--shard-rows',
+        type=int,
+        default=None,
+        help='Divide a saída em arquivos com no máximo N linhas'
+    )
     
-    # Verifica se o arquivo de entrada existe
-    if not os.path.isfile(args.input_file):
-        print(f"Erro: Arquivo {args.input_file} não encontrado.")
+    parser.add_argument(
+        '--shard-bytes',
+        type=int,
+        default=None,
+        help='Divide a saída em arquivos com no máximo N bytes'
+    )
+    
+    parser.add_argument(
+        '--shard-period',
+        choices=['month', 'year'],
+        default=None,
+        help='Divide a saída em um arquivo por mês ou por ano'
+    )
+    
+    parser.add_argument(
+        '--shard-workers',
+        type=int,
+        default=4,
+        help='Número de threads usadas para gravar os arquivos divididos (padrão: 4)'
+    )
+    
+    parser.add_argument(
+        '--price-file',
+        default=None,
+        help='CSV de preços históricos em BRL (Date,Asset,Price) usado para preencher '
+             'o Net Worth de transações sem estimativa no extrato'
+    )
+    
+    parser.add_argument(
+        '--asset-map',
+        metavar='ARQUIVO',
+        default=None,
+        help='Tabela CSV (Ticker,Koinly ID) com identificadores de ativos do Koinly; '
+             'complementa e sobrepõe a tabela do pacote'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Converte CSVs grandes em paralelo usando N processos'
+    )
+    
+    parser.add_argument(
+        '--opening-balance',
+        action='append',
+        default=[],
+        metavar='MOEDA=VALOR',
+        help='Saldo inicial de uma moeda para a conferência de saldos (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--closing-balance',
+        action='append',
+        default=[],
+        metavar='MOEDA=VALOR',
+        help='Saldo final esperado de uma moeda para a conferência de saldos (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--since',
+        default=None,
+        help='Converte só transações a partir desta data (AAAA-MM-DD ou DD/MM/AAAA); '
+             'no PDF, as páginas anteriores nem são extraídas'
+    )
+    
+    parser.add_argument(
+        '--until',
+        default=None,
+        help='Converte só transações até esta data, inclusive (AAAA-MM-DD ou DD/MM/AAAA); '
+             'no PDF, as páginas posteriores nem são extraídas'
+    )
+    
+    parser.add_argument(
+        '--status',
+        action='append',
+        default=[],
+        help='Converte só linhas com este Status, ex.: Concluído (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--currency',
+        action='append',
+        default=[],
+        help='Converte só linhas desta moeda, ex.: BTC (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--label',
+        action='append',
+        default=[],
+        help='Converte só transações com este label do Koinly, ex.: buy, sell, trade (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--type',
+        action='append',
+        default=[],
+        help='Converte só linhas cujo Tipo contém este texto, ex.: Compra (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--pages',
+        default=None,
+        help='PDF: processa só estas páginas (ex.: 1-3,5,10-)'
+    )
+    
+    parser.add_argument(
+        '--page-timeout',
+        type=float,
+        default=DEFAULT_PAGE_TIMEOUT,
+        metavar='SEGUNDOS',
+        help='PDF: tempo máximo de extração por página; páginas mais lentas são '
+             f'refeitas por um método mais simples (padrão: {DEFAULT_PAGE_TIMEOUT:g}, 0 desliga)'
+    )
+    
+    parser.add_argument(
+        '--no-progress',
+        action='store_true',
+        help='Não mostra a linha de progresso (páginas, linhas, velocidade e tempo restante), '
+             'que só aparece quando stderr é um terminal'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Converte sempre, sem reaproveitar nem guardar o resultado no cache de conversões'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        metavar='PASTA',
+        help='Pasta do cache de conversões (padrão: ~/.cache/novadax_koinly/jobs)'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        metavar='MB',
+        help=f'Tamanho máximo do cache de conversões (padrão: {DEFAULT_CACHE_MB})'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        opening_balances = parse_balances(args.opening_balance)
+        closing_balances = parse_balances(args.closing_balance)
+        since = parse_date_bound(args.since)
+        until = parse_date_bound(args.until, end_of_day=True)
+        pages = parse_page_ranges(args.pages) if args.pages else None
+    except ValueError as e:
+        print(f"Erro: {e}")
         sys.exit(1)
     
-    # Determina o tipo de arquivo
-    file_ext = os.path.splitext(args.input_file)[1].lower()
-    is_pdf = file_ext == '.pdf' or args.pdf
-    is_csv = file_ext == '.csv' or args.csv
+    convert_options = {
+        'shard_rows': args.shard_rows,
+        'shard_bytes': args.shard_bytes,
+        'shard_period': args.shard_period,
+        'shard_workers': args.shard_workers,
+        'quarantine_file': args.quarantine,
+        'price_file': args.price_file,
+        'asset_file': args.asset_map,
+        'workers': args.workers,
+        'opening_balances': opening_balances,
+        'closing_balances': closing_balances,
+    }
+    
+    # '-' significa entrada padrão / saída padrão
+    use_stdin = args.input_file == '-'
+    use_stdout = args.output == '-' or (use_stdin and args.output is None and not args.append_to)
     
     if args.pdf and args.csv:
         print("Erro: Não é possível especificar --pdf e --csv ao mesmo tempo.")
         sys.exit(1)
     
-    if not (is_pdf or is_csv):
-        print(f"Erro: Tipo de arquivo não suportado: {file_ext}")
-        print("Use arquivos .csv ou .pdf, ou especifique --pdf ou --csv.")
+    if use_stdout and (args.shard_rows or args.shard_bytes or args.shard_period):
+        print("Erro: A divisão em vários arquivos não é possível com a saída padrão (-o -).")
+        sys.exit(1)
+    
+    if args.append_to and (args.output or args.shard_rows or args.shard_bytes or args.shard_period):
+        print("Erro: --append-to não pode ser usado com -o nem com a divisão em vários arquivos.")
+        sys.exit(1)
+    
+    if args.asset_map and not os.path.isfile(args.asset_map):
+        print(f"Erro: Arquivo {args.asset_map} não encontrado.")
         sys.exit(1)
     
+    if use_stdin:
+        # O tipo é detectado pelo conteúdo (%PDF), já que não há extensão
+        input_stream = sys.stdin.buffer
+        is_pdf = args.pdf or (not args.csv and is_pdf_data(input_stream.peek(PDF_MAGIC_WINDOW)))
+        is_csv = not is_pdf
+    else:
+        # Verifica se o arquivo de entrada existe
+        if not os.path.isfile(args.input_file):
+            print(f"Erro: Arquivo {args.input_file} não encontrado.")
+            sys.exit(1)
+        
+        # Determina o tipo de arquivo pela extensão ou, se ela não disser, pelo conteúdo
+        file_ext = os.path.splitext(args.input_file)[1].lower()
+        is_pdf = file_ext == '.pdf' or args.pdf
+        is_csv = file_ext == '.csv' or args.csv
+        if not (is_pdf or is_csv):
+            with open(args.input_file, 'rb') as infile:
+                is_pdf = is_pdf_data(infile.read(PDF_MAGIC_WINDOW))
+            is_csv = not is_pdf
+    
     # Define o arquivo de saída padrão se não for especificado
-    if args.output is None:
+    if args.append_to:
+        koinly_output = args.append_to
+        if is_pdf:
+            csv_output = os.path.splitext(args.input_file)[0] + "_extraido.csv"
+    elif use_stdout:
+        # A saída padrão é capturada antes de redirecionar as mensagens para stderr
+        koinly_output = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='')
+        if not use_stdin and not args.quarantine:
+            convert_options['quarantine_file'] = os.path.splitext(args.input_file)[0] + "_koinly_quarantine.csv"
+    elif args.output is None:
         if is_pdf:
             # Para PDF, o padrão é salvar primeiro o CSV intermediário e depois o Koinly
             csv_output = os.path.splitext(args.input_file)[0] + "_extraido.csv"
@@ -72,22 +551,179 @@ def main():
             # Para CSV, o arquivo de saída é o Koinly
             koinly_output = args.output
     
-    # Processa o arquivo
-    if is_pdf:
-        print(f"Processando PDF: {args.input_file}")
-        result = novadax_pdf_to_csv(args.input_file, csv_output)
-        print(f"Extraídas {result['total_rows']} transações para {csv_output}")
+    # Os módulos de conversão são importados só aqui, para que `--help` e
+    # validações de argumentos não carreguem o logging nem o pdfplumber
+    from .converter import RowFilter, convert_novadax_to_koinly
+    from .formats import parse_outputs
+    
+    try:
+        convert_options['extra_outputs'] = parse_outputs(args.also)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    
+    if since or until or args.status or args.currency or args.label or args.type:
+        convert_options['row_filter'] = RowFilter(
+            statuses=args.status, currencies=args.currency, labels=args.label,
+            types=args.type, since=since, until=until,
+        )
+    
+    pdf_since = since
+    if args.append_to:
+        from .incremental import HighWaterMark, default_state_file
+        
+        convert_options['append'] = True
+        try:
+            mark = HighWaterMark.load(default_state_file(args.append_to), args.append_to)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            sys.exit(1)
+        # No PDF, as páginas anteriores à marca nem são extraídas
+        if mark.since and not (since and since > mark.since):
+            pdf_since = mark.since
+    
+    # Cache de conversões: a mesma entrada, com as mesmas opções e regras,
+    # reaproveita os arquivos gerados da vez anterior. Não vale para fluxos,
+    # para o modo incremental (que depende do estado) nem para a divisão
+    job_cache = cached = None
+    sharded = args.shard_rows or args.shard_bytes or args.shard_period
+    if not (args.no_cache or use_stdin or use_stdout or args.append_to or sharded):
+        from .jobcache import JobCache, file_digest
+        from .quarantine import default_quarantine_file
         
-        print(f"Convertendo para formato Koinly: {csv_output}")
-        result = convert_novadax_to_koinly(csv_output, koinly_output)
-        print(f"Conversão concluída: {result['converted_rows']} transações convertidas para {koinly_output}")
+        job_cache = JobCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+        job_key = job_cache.job_key(args.input_file, {
+            'pdf': is_pdf,
+            'since': since, 'until': until, 'pages': pages,
+            'page_timeout': args.page_timeout if is_pdf else None,
+            'status': args.status, 'currency': args.currency,
+            'label': args.label, 'type': args.type,
+            'opening_balances': opening_balances, 'closing_balances': closing_balances,
+            'also': [name for name, _ in convert_options['extra_outputs']],
+            'price_file': file_digest(args.price_file) if args.price_file else None,
+            'asset_map': file_digest(args.asset_map) if args.asset_map else None,
+        })
+        job_outputs = {'koinly': koinly_output,
+                       'quarantine': args.quarantine or default_quarantine_file(koinly_output)}
+        if is_pdf:
+            job_outputs['extracted'] = csv_output
+        for i, (_, path) in enumerate(convert_options['extra_outputs']):
+            job_outputs[f'also{i}'] = path
+        cached = job_cache.restore(job_key, job_outputs)
     
-    else:  # is_csv
-        print(f"Convertendo CSV para formato Koinly: {args.input_file}")
-        result = convert_novadax_to_koinly(args.input_file, koinly_output)
-        print(f"Conversão concluída: {result['converted_rows']} transações convertidas para {koinly_output}")
+    # Linha de progresso no terminal; o registro de cada transação, que
+    # rolaria por baixo dela, fica só no arquivo de log
+    progress = progress_line = None
+    if cached is None and not args.no_progress and sys.stderr.isatty():
+        from .converter import configure_logging
+        from .progress import Progress, ProgressLine
+        
+        configure_logging()
+        progress_line = ProgressLine(sys.stderr)
+        progress_line.quiet_logging()
+        progress = convert_options['progress'] = Progress(progress_line)
+    on_page = progress.page_done if progress is not None else None
     
-    print("\nProcessamento concluído com sucesso!")
+    # Com a saída padrão, as mensagens vão para stderr para não misturar com o CSV
+    with contextlib.redirect_stdout(sys.stderr) if use_stdout else contextlib.nullcontext():
+        input_name = "entrada padrão" if use_stdin else args.input_file
+        try:
+            if cached is not None:
+                result = cached
+                print(f"Entrada, opções e regras iguais às de uma conversão anterior: "
+                      f"resultado reaproveitado do cache ({job_cache.directory})")
+            
+            elif is_pdf and (use_stdin or use_stdout):
+                from .pdf_converter import iter_pdf_transactions
+                from .pipeline import pipeline_enabled
+                
+                # Em um pipeline não há CSV intermediário: as linhas extraídas
+                # vão direto para a conversão. O PDF precisa de acesso
+                # aleatório, então a entrada padrão é lida por inteiro.
+                print(f"Processando PDF: {input_name}")
+                pdf_source = input_stream.read() if use_stdin else args.input_file
+                rows = iter_pdf_transactions(pdf_source, since=pdf_since, until=until,
+                                             pages=pages, verbose=progress is None,
+                                             page_timeout=args.page_timeout,
+                                             pipelined=pipeline_enabled(), on_page=on_page)
+                result = convert_novadax_to_koinly(rows, koinly_output, **convert_options)
+            
+            elif is_pdf:
+                from .pdf_converter import extraction_summary, iter_pdf_to_csv
+                from .pipeline import pipeline_enabled
+                
+                # Extração, conversão e gravação correm juntas: as páginas
+                # vêm de um processo produtor e a conversão consome cada
+                # linha logo que ela é gravada no CSV intermediário
+                print(f"Processando PDF: {args.input_file}")
+                print(f"Convertendo para formato Koinly: {csv_output}")
+                extraction_stats = {}
+                rows = iter_pdf_to_csv(args.input_file, csv_output,
+                                       since=pdf_since, until=until, pages=pages,
+                                       stats=extraction_stats,
+                                       page_timeout=args.page_timeout, pipelined=pipeline_enabled(),
+                                       verbose=progress is None, on_page=on_page)
+                result = convert_novadax_to_koinly(rows, koinly_output, **convert_options)
+                extraction = extraction_summary(csv_output, extraction_stats)
+                print(f"Extraídas {extraction['total_rows']} transações para {csv_output}")
+            
+            else:  # is_csv
+                print(f"Convertendo CSV para formato Koinly: {input_name}")
+                source = input_stream if use_stdin else args.input_file
+                result = convert_novadax_to_koinly(source, koinly_output, **convert_options)
+        except ImportError as e:
+            print(f"Erro: {e}")
+            sys.exit(1)
+        except BrokenPipeError:
+            # O programa seguinte do pipeline parou de ler (ex.: head): o que
+            # ainda estiver no buffer vai para /dev/null
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.__stdout__.fileno())
+            sys.exit(1)
+        finally:
+            if progress_line is not None:
+                progress_line.clear()
+            if use_stdout:
+                koinly_output.detach()
+        
+        if job_cache is not None and cached is None:
+            produced = dict(job_outputs)
+            if 'quarantine_file' not in result:
+                del produced['quarantine']
+            try:
+                job_cache.store(job_key, produced, result)
+            except OSError as e:
+                print(f"Aviso: não foi possível guardar o resultado no cache: {e}")
+        
+        print(f"Conversão concluída: {result['converted_rows']} transações convertidas para {result['output_file']}")
+        
+        if result['filtered_rows']:
+            print(f"{result['filtered_rows']} linhas descartadas pelos filtros")
+        
+        if 'skipped_rows' in result:
+            print(f"{result['skipped_rows']} linhas já convertidas antes foram puladas "
+                  f"(estado em {result['state_file']})")
+        
+        print_balance_summary(result['balances'])
+        
+        if 'quarantine_file' in result:
+            print(f"\n{result['quarantined_rows']} linhas rejeitadas salvas em {result['quarantine_file']}")
+            if 'shards' in result or use_stdout:
+                # Não há um arquivo Koinly único com o nome da quarentena
+                print(f"Depois de corrigir as regras, use: nova2k reprocess "
+                      f"{result['quarantine_file']} -o ARQUIVO_KOINLY")
+            else:
+                print(f"Depois de corrigir as regras, use: nova2k reprocess {result['quarantine_file']}")
+        elif result['quarantined_rows']:
+            print(f"\n{result['quarantined_rows']} linhas rejeitadas descartadas; "
+                  f"use --quarantine ARQUIVO para guardá-las")
+        
+        if 'extra_outputs' in result:
+            print(f"Também gravado em: {', '.join(result['extra_outputs'])}")
+        
+        if 'shards' in result:
+            print(f"Saída dividida em {len(result['shards'])} arquivos (manifesto: {result['manifest_file']})")
+        
+        print("\nProcessamento concluído com sucesso!")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
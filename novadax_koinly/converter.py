@@ -1,19 +1,36 @@
 import csv
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from decimal import Decimal
 import re
 import unicodedata
 import logging
 from typing import List, Optional
 
-# Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('converter_novadax_koinly.log', mode='w', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from .prices import fill_net_worth, load_price_index
+
+LOG_FILE = 'converter_novadax_koinly.log'
+
+def configure_logging() -> None:
+    """
+    Configura o logging (arquivo de log + terminal) na primeira conversão.
+    Feito sob demanda para que importar o módulo não crie o arquivo de log.
+    """
+    if logging.getLogger().handlers:
+        return
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE, mode='w', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
 
 def normalize_str(s: str) -> str:
     """
@@ -23,16 +40,31 @@ def normalize_str(s: str) -> str:
     nfkd = unicodedata.normalize("NFKD", s)
     return "".join(c for c in nfkd if not unicodedata.combining(c)).lower()
 
+KOINLY_DATE_FORMAT = "%Y-%m-%d %H:%M UTC"
+
+def parse_date(novadax_date: str) -> Optional[datetime]:
+    """
+    Interpreta data/hora no formato 'DD/MM/YYYY HH:MM:SS'.
+    Se falhar, retorna None.
+    """
+    try:
+        return datetime.strptime(novadax_date, "%d/%m/%Y %H:%M:%S")
+    except ValueError:
+        return None
+
+def format_date(date: Optional[datetime]) -> str:
+    """
+    Formata a data no padrão do Koinly ('YYYY-MM-DD HH:MM UTC').
+    Datas inválidas (None) viram 'Invalid Date'.
+    """
+    return date.strftime(KOINLY_DATE_FORMAT) if date else "Invalid Date"
+
 def convert_date(novadax_date: str) -> str:
     """
     Converte data/hora do formato 'DD/MM/YYYY HH:MM:SS' para 'YYYY-MM-DD HH:MM UTC'.
     Se falhar, retorna 'Invalid Date'.
     """
-    try:
-        dt = datetime.strptime(novadax_date, "%d/%m/%Y %H:%M:%S")
-        return dt.strftime("%Y-%m-%d %H:%M UTC")
-    except ValueError:
-        return "Invalid Date"
+    return format_date(parse_date(novadax_date))
 
 def extract_numeric_value(text: str) -> str:
     """
@@ -67,6 +99,17 @@ def extract_numeric_value(text: str) -> str:
 
     return raw_val
 
+def extract_brl_estimate(text: str) -> Optional[Decimal]:
+    """
+    Extrai a estimativa em reais que a Novadax mostra junto ao valor, no
+    trecho '(≈R$1.234,56)'. Retorna None se não houver estimativa.
+    """
+    match = re.search(r'\(≈\s*R\$\s*([^)]*)\)', text)
+    if not match:
+        return None
+    value = extract_numeric_value(match.group(1))
+    return to_decimal(value) if value else None
+
 def extract_trading_pair(tipo_str: str) -> tuple:
     """
     Extrai o par de trading de strings como 'Compra(BTC/BRL)' ou 'Venda(ETH/BRL)'.
@@ -77,7 +120,102 @@ def extract_trading_pair(tipo_str: str) -> tuple:
         return match.group(1), match.group(2)
     return None, None
 
-def log_transaction(row: List[str], koinly_row: List[str], error: Optional[str] = None) -> None:
+def to_decimal(value: str) -> Optional[Decimal]:
+    """
+    Converte um valor já extraído (ex.: '0.00450000') em Decimal, sem sinal.
+    Valores vazios viram None.
+    """
+    value = value.lstrip("+-")
+    return Decimal(value) if value else None
+
+def format_amount(amount: Optional[Decimal]) -> str:
+    """
+    Formata um valor Decimal sem notação científica (None vira string vazia).
+    """
+    return "" if amount is None else format(amount, 'f')
+
+class KoinlyRecord:
+    """
+    Transação no formato Koinly, com valores em Decimal, data já interpretada
+    e moedas/labels internados. As strings do CSV só são montadas na escrita
+    (to_row).
+    """
+    __slots__ = (
+        'date', 'sent_amount', 'sent_currency',
+        'received_amount', 'received_currency',
+        'fee_amount', 'fee_currency',
+        'net_worth_amount', 'net_worth_currency',
+        'label', 'description', 'tx_hash', 'status',
+    )
+
+    def __init__(self, date: Optional[datetime], sent_amount: Optional[Decimal] = None,
+                 sent_currency: str = "", received_amount: Optional[Decimal] = None,
+                 received_currency: str = "", fee_amount: Optional[Decimal] = None,
+                 fee_currency: str = "", net_worth_amount: Optional[Decimal] = None,
+                 net_worth_currency: str = "", label: str = "", description: str = "",
+                 tx_hash: str = "", status: str = ""):
+        self.date = date
+        self.sent_amount = sent_amount
+        self.sent_currency = sys.intern(sent_currency)
+        self.received_amount = received_amount
+        self.received_currency = sys.intern(received_currency)
+        self.fee_amount = fee_amount
+        self.fee_currency = sys.intern(fee_currency)
+        self.net_worth_amount = net_worth_amount
+        self.net_worth_currency = sys.intern(net_worth_currency)
+        self.label = sys.intern(label)
+        self.description = description
+        self.tx_hash = tx_hash
+        self.status = sys.intern(status)
+
+    def to_row(self) -> List[str]:
+        """
+        Monta a linha do CSV Koinly (na ordem de KOINLY_HEADER).
+        """
+        return [
+            format_date(self.date),
+            format_amount(self.sent_amount),
+            self.sent_currency,
+            format_amount(self.received_amount),
+            self.received_currency,
+            format_amount(self.fee_amount),
+            self.fee_currency,
+            format_amount(self.net_worth_amount),
+            self.net_worth_currency,
+            self.label,
+            self.description,
+            self.tx_hash,
+        ]
+
+    @classmethod
+    def from_row(cls, row: List[str]) -> "KoinlyRecord":
+        """
+        Reconstrói a transação a partir de uma linha do CSV Koinly.
+        """
+        row = list(row) + [""] * (len(KOINLY_HEADER) - len(row))
+        try:
+            date = datetime.strptime(row[0], KOINLY_DATE_FORMAT)
+        except ValueError:
+            date = None
+        return cls(
+            date,
+            sent_amount=to_decimal(row[1]),
+            sent_currency=row[2],
+            received_amount=to_decimal(row[3]),
+            received_currency=row[4],
+            fee_amount=to_decimal(row[5]),
+            fee_currency=row[6],
+            net_worth_amount=to_decimal(row[7]),
+            net_worth_currency=row[8],
+            label=row[9],
+            description=row[10],
+            tx_hash=row[11],
+        )
+
+    def __repr__(self):
+        return f"KoinlyRecord({self.to_row()!r})"
+
+def log_transaction(row: List[str], record: KoinlyRecord, error: Optional[str] = None) -> None:
     """
     Registra informações sobre o processamento de uma transação.
     """
@@ -87,30 +225,65 @@ def log_transaction(row: List[str], koinly_row: List[str], error: Optional[str]
             logging.warning(f"ERRO - Data: {data}, Tipo: {tipo}, Moeda: {moeda}, Valor: {valor}, Status: {status}")
             logging.warning(f"Detalhes do erro: {error}")
         else:
-            sent = f"{koinly_row[1]} {koinly_row[2]}" if koinly_row[1] else "nada"
-            received = f"{koinly_row[3]} {koinly_row[4]}" if koinly_row[3] else "nada"
-            fee = f"{koinly_row[5]} {koinly_row[6]}" if koinly_row[5] else "sem taxa"
+            sent = f"{format_amount(record.sent_amount)} {record.sent_currency}" if record.sent_amount is not None else "nada"
+            received = f"{format_amount(record.received_amount)} {record.received_currency}" if record.received_amount is not None else "nada"
+            fee = f"{format_amount(record.fee_amount)} {record.fee_currency}" if record.fee_amount is not None else "sem taxa"
             
             logging.info(f"Processado - Data: {data}, Tipo: {tipo}")
-            logging.info(f"-> Enviado: {sent}, Recebido: {received}, Taxa: {fee}, Label: {koinly_row[9]}")
+            logging.info(f"-> Enviado: {sent}, Recebido: {received}, Taxa: {fee}, Label: {record.label}")
     else:
         logging.error(f"Linha inválida (menos de 5 campos): {row}")
 
+# Classificação do campo Tipo (já normalizado) em labels do Koinly, na ordem
+# em que as regras são testadas
+TYPE_LABELS = [
+    (("taxa de transacao",), "fee"),
+    (("taxa de saque",), "withdrawal-fee"),
+    (("deposito em reais",), "deposit"),
+    (("saque em reais",), "withdrawal"),
+    (("deposito de criptomoedas",), "deposit"),
+    (("redeemed bonus", "staking", "bonus"), "reward"),
+    (("airdrop",), "airdrop"),
+    (("convert", "troca"), "trade"),
+    (("compra",), "buy"),
+    (("venda",), "sell"),
+    (("saque de criptomoedas",), "withdrawal"),
+]
+
+# Labels das pernas de uma operação (Compra/Venda, Convert): cada perna vem
+# em uma linha, e as linhas da mesma operação têm a mesma data/hora
+TRADE_LABELS = frozenset(("buy", "sell", "trade"))
+
+# Tipos (normalizados, por trecho) cujas linhas com a mesma data/hora formam
+# uma operação, que o filtro de moeda mantém ou descarta inteira: as pernas
+# de Convert, Compra e Venda e as taxas delas
+OPERATION_TYPES = ("convert", "compra", "venda", "taxa de transacao")
+
+def label_for_type(tipo_normalizado: str) -> str:
+    """
+    Label do Koinly para um tipo de transação normalizado ('' se desconhecido).
+    """
+    for keywords, label in TYPE_LABELS:
+        for keyword in keywords:
+            if keyword in tipo_normalizado:
+                return label
+    return ""
+
 def process_novadax_row(row):
     """
-    Converte uma linha do CSV da Novadax em uma linha do CSV no padrão Koinly,
-    mantendo campos vazios quando não há dados.
+    Converte uma linha do CSV da Novadax em um KoinlyRecord, mantendo campos
+    vazios quando não há dados. Linhas com menos de 5 campos retornam None.
     """
     if len(row) < 5:
         error_msg = f"Linha com formato inválido (menos de 5 campos): {row}"
         logging.error(error_msg)
-        return ["Invalid Row"] * 12
+        return None
 
     data_str, tipo_str, moeda, valor_str, status = row[:5]
 
     # Converte data
-    date = convert_date(data_str)
-    if date == "Invalid Date":
+    date = parse_date(data_str)
+    if date is None:
         error_msg = f"Data inválida: {data_str}"
         logging.error(error_msg)
 
@@ -129,42 +302,23 @@ def process_novadax_row(row):
     received_currency = ""
     fee_amount = ""
     fee_currency = ""
-    label = ""
     description = tipo_str  # Texto original na descrição
 
     # Extrai par de trading se existir
     moeda_base, moeda_cotacao = extract_trading_pair(tipo_str)
 
     # Verifica qual tipo de operação
-    if "taxa de transacao" in tipo_normalizado:
+    label = label_for_type(tipo_normalizado)
+    if label in ("fee", "withdrawal-fee"):
         fee_amount = valor
         fee_currency = moeda
-        label = "fee"
-    elif "taxa de saque" in tipo_normalizado:
-        fee_amount = valor
-        fee_currency = moeda
-        label = "withdrawal-fee"
-    elif "deposito em reais" in tipo_normalizado:
+    elif label in ("deposit", "reward", "airdrop"):
         received_amount = valor.lstrip("+")
         received_currency = moeda
-        label = "deposit"
-    elif "saque em reais" in tipo_normalizado:
+    elif label == "withdrawal":
         sent_amount = valor.lstrip("-")
         sent_currency = moeda
-        label = "withdrawal"
-    elif "deposito de criptomoedas" in tipo_normalizado:
-        received_amount = valor.lstrip("+")
-        received_currency = moeda
-        label = "deposit"
-    elif "redeemed bonus" in tipo_normalizado or "staking" in tipo_normalizado or "bonus" in tipo_normalizado:
-        received_amount = valor.lstrip("+")
-        received_currency = moeda
-        label = "reward"
-    elif "airdrop" in tipo_normalizado:
-        received_amount = valor.lstrip("+")
-        received_currency = moeda
-        label = "airdrop"
-    elif "convert" in tipo_normalizado or "troca" in tipo_normalizado:
+    elif label == "trade":
         # Para conversão/troca, o valor negativo é o sent e o positivo é o received
         if valor.startswith("-"):
             sent_amount = valor.lstrip("-")
@@ -172,8 +326,7 @@ def process_novadax_row(row):
         else:
             received_amount = valor.lstrip("+")
             received_currency = moeda
-        label = "trade"
-    elif "compra" in tipo_normalizado:
+    elif label == "buy":
         # Se temos o par de trading, usamos ele para determinar a direção
         if moeda_base and moeda_cotacao:
             if moeda == moeda_cotacao:
@@ -190,8 +343,7 @@ def process_novadax_row(row):
             else:
                 received_amount = valor.lstrip("+")
                 received_currency = moeda
-        label = "buy"
-    elif "venda" in tipo_normalizado:
+    elif label == "sell":
         # Se temos o par de trading, usamos ele para determinar a direção
         if moeda_base and moeda_cotacao:
             if moeda == moeda_cotacao:
@@ -208,35 +360,25 @@ def process_novadax_row(row):
             else:
                 sent_amount = valor.lstrip("-")
                 sent_currency = moeda
-        label = "sell"
-    elif "saque de criptomoedas" in tipo_normalizado:
-        sent_amount = valor.lstrip("-")
-        sent_currency = moeda
-        label = "withdrawal"
-
-    # Limpa os valores (remove + ou - do início)
-    if sent_amount:
-        sent_amount = sent_amount.lstrip("+-")
-    if received_amount:
-        received_amount = received_amount.lstrip("+-")
-    if fee_amount:
-        fee_amount = fee_amount.lstrip("+-")
-
-    # Retorna a linha no formato do Koinly
-    koinly_row = [
+
+    # Estimativa em reais informada pela própria Novadax
+    net_worth = extract_brl_estimate(valor_str)
+
+    # Retorna a transação no formato do Koinly (valores sem sinal)
+    record = KoinlyRecord(
         date,
-        sent_amount,
-        sent_currency,
-        received_amount,
-        received_currency,
-        fee_amount,
-        fee_currency,
-        "",  # Net Worth Amount
-        "",  # Net Worth Currency
-        label,
-        description,
-        "",  # TxHash
-    ]
+        sent_amount=to_decimal(sent_amount),
+        sent_currency=sent_currency,
+        received_amount=to_decimal(received_amount),
+        received_currency=received_currency,
+        fee_amount=to_decimal(fee_amount),
+        fee_currency=fee_currency,
+        net_worth_amount=net_worth,
+        net_worth_currency="BRL" if net_worth is not None else "",
+        label=label,
+        description=description,
+        status=status,
+    )
 
     # Verifica se os campos essenciais estão preenchidos
     if not label:
@@ -244,123 +386,644 @@ def process_novadax_row(row):
     if not (sent_amount or received_amount):
         logging.warning(f"Nenhum valor de envio ou recebimento encontrado para: {tipo_str}")
 
-    return koinly_row
+    return record
+
+KOINLY_HEADER = [
+    "Date", "Sent Amount", "Sent Currency",
+    "Received Amount", "Received Currency",
+    "Fee Amount", "Fee Currency",
+    "Net Worth Amount", "Net Worth Currency",
+    "Label", "Description", "TxHash"
+]
+
+# Motivos de rejeição registrados no arquivo de quarentena
+REJECT_INVALID_ROW = "formato inválido (menos de 5 campos)"
+REJECT_UNCLASSIFIED = "tipo de transação não identificado"
+REJECT_ERROR = "erro ao processar"
+
+SHARD_PERIODS = {
+    'month': lambda date: (date.year, date.month),
+    'year': lambda date: date.year,
+}
+
+# Arquivos divididos esperando gravação, por worker de escrita
+SHARD_PENDING = 2
 
-def convert_novadax_to_koinly(input_file, output_file):
+def new_stats() -> dict:
     """
-    Lê o CSV da Novadax (input_file) e gera um CSV no formato Koinly (output_file).
+    Contadores de uma conversão (veja iter_koinly_records).
     """
-    logging.info(f"Iniciando conversão de {input_file} para {output_file}")
-    
-    total_rows = 0
-    converted_rows = 0
-    error_rows = 0
-    
-    with open(input_file, mode='r', encoding='utf-8') as infile, \
-         open(output_file, mode='w', encoding='utf-8', newline='') as outfile:
-
-        reader = csv.reader(infile)
-        writer = csv.writer(outfile)
-
-        # Cabeçalho Koinly
-        writer.writerow([
-            "Date", "Sent Amount", "Sent Currency",
-            "Received Amount", "Received Currency",
-            "Fee Amount", "Fee Currency",
-            "Net Worth Amount", "Net Worth Currency",
-            "Label", "Description", "TxHash"
-        ])
-
-        # Pula a linha de cabeçalho do CSV da Novadax
-        next(reader, None)
-
-        # Buffer para armazenar transações relacionadas
-        current_convert = None
-        convert_fee = None
-        
-        for row in reader:
-            total_rows += 1
-            
-            if len(row) < 5:
-                error_rows += 1
-                logging.error(f"Linha {total_rows}: formato inválido (menos de 5 campos)")
+    return {"total_rows": 0, "converted_rows": 0, "error_rows": 0, "unclassified_rows": 0,
+            "filtered_rows": 0}
+
+def _date_key(novadax_date: str) -> Optional[str]:
+    """
+    'DD/MM/YYYY HH:MM:SS' -> 'YYYYMMDD HH:MM:SS', comparável como texto.
+    Retorna None se o texto não tiver esse formato.
+    """
+    if len(novadax_date) != 19 or novadax_date[2] != '/' or novadax_date[5] != '/':
+        return None
+    return novadax_date[6:10] + novadax_date[3:5] + novadax_date[0:2] + novadax_date[10:]
+
+class RowFilter:
+    """
+    Filtros de status, moeda, label, tipo e período aplicados aos campos
+    brutos da linha (row[:5]), antes de interpretar datas e valores, de modo
+    que linhas descartadas quase não custam nada.
+
+    Status e tipo são comparados sem acentos e sem diferenciar maiúsculas
+    (tipo por trecho: 'compra' aceita 'Compra(BTC/BRL)'); labels usam a mesma
+    classificação de process_novadax_row. No filtro de moeda, as linhas de
+    uma operação (veja OPERATION_TYPES) são avaliadas juntas, antes da
+    conversão (accepts_operation). Linhas com data em formato inesperado
+    não são filtradas pelo período (seguem para a conversão, que as
+    rejeita).
+    """
+
+    def __init__(self, statuses=None, currencies=None, labels=None, types=None,
+                 since: Optional[datetime] = None, until: Optional[datetime] = None):
+        self.statuses = frozenset(normalize_str(s).strip() for s in statuses) if statuses else None
+        self.currencies = frozenset(c.strip().upper() for c in currencies) if currencies else None
+        self.labels = frozenset(l.strip().lower() for l in labels) if labels else None
+        self.types = tuple(normalize_str(t).strip() for t in types) if types else None
+        self.since = since.strftime("%Y%m%d %H:%M:%S") if since else None
+        self.until = until.strftime("%Y%m%d %H:%M:%S") if until else None
+
+    def accepts_row(self, row, tipo_normalizado: str) -> bool:
+        """
+        Verifica a linha bruta; tipo_normalizado é normalize_str(row[1]).
+        """
+        if self.statuses is not None and normalize_str(row[4]).strip() not in self.statuses:
+            return False
+        if self.since or self.until:
+            key = _date_key(row[0].strip())
+            if key is not None:
+                if self.since and key < self.since:
+                    return False
+                if self.until and key > self.until:
+                    return False
+        if self.types is not None and not any(t in tipo_normalizado for t in self.types):
+            return False
+        if self.labels is not None and label_for_type(tipo_normalizado) not in self.labels:
+            return False
+        if (self.currencies is not None and not is_operation_type(tipo_normalizado)
+                and row[2].strip().upper() not in self.currencies):
+            return False
+        return True
+
+    def accepts_operation(self, rows) -> bool:
+        """
+        Filtro de moeda de uma operação inteira (linhas brutas com a mesma
+        data/hora): passa se qualquer uma das moedas foi pedida.
+        """
+        return (self.currencies is None
+                or any(row[2].strip().upper() in self.currencies for row in rows))
+
+def is_operation_type(tipo_normalizado: str) -> bool:
+    return any(keyword in tipo_normalizado for keyword in OPERATION_TYPES)
+
+def _filter_operations(rows, row_filter, stats):
+    """
+    Junta as linhas consecutivas de operação com a mesma data/hora e
+    descarta as operações recusadas por row_filter.accepts_operation,
+    contando-as como lidas e filtradas; as demais linhas passam direto.
+    """
+    operation = []
+    for row in rows:
+        if len(row) >= 5 and is_operation_type(normalize_str(row[1])):
+            if operation and row[0].strip() != operation[0][0].strip():
+                yield from _flush_operation(operation, row_filter, stats)
+                operation = []
+            operation.append(row)
+            continue
+        if operation:
+            yield from _flush_operation(operation, row_filter, stats)
+            operation = []
+        yield row
+    if operation:
+        yield from _flush_operation(operation, row_filter, stats)
+
+def _flush_operation(operation, row_filter, stats):
+    if row_filter.accepts_operation(operation):
+        yield from operation
+    else:
+        stats['total_rows'] += len(operation)
+        stats['filtered_rows'] += len(operation)
+
+def iter_koinly_records(reader, stats, edge=None, on_reject=None, row_filter=None):
+    """
+    Percorre as linhas da Novadax (já sem cabeçalho) e gera KoinlyRecords,
+    juntando as duas partes de cada Convert e aplicando a Taxa de Convert.
+    Os contadores de 'stats' (veja new_stats) são atualizados durante a
+    iteração.
+
+    Linhas inválidas, com erro ou de tipo não identificado não geram
+    transação: são passadas para on_reject(numero_da_linha, linha, motivo),
+    se informado, para serem reprocessadas depois.
+
+    Quando as linhas são só um trecho do arquivo (conversão em paralelo),
+    'edge' recebe o estado necessário para emendar os trechos: os Converts
+    que ainda poderiam receber uma Taxa de Convert do trecho anterior
+    ('open_converts'), se houve alguma Taxa de Convert ('fee_seen') e a taxa
+    pendente no final ('fee').
+
+    Linhas recusadas por row_filter (veja RowFilter) são descartadas antes
+    de qualquer interpretação e contadas em 'filtered_rows'.
+    """
+    if edge is not None:
+        edge.update(open_converts=[], fee_seen=False, fee=None)
+    if row_filter is not None:
+        reader = _filter_operations(reader, row_filter, stats)
+
+    # Buffer para armazenar transações relacionadas
+    current_convert = None
+    convert_fee = None
+
+    for row in reader:
+        stats['total_rows'] += 1
+
+        if len(row) < 5:
+            stats['error_rows'] += 1
+            logging.error(f"Linha {stats['total_rows']}: formato inválido (menos de 5 campos)")
+            if on_reject:
+                on_reject(stats['total_rows'], row, REJECT_INVALID_ROW)
+            continue
+
+        data_str, tipo_str, moeda, valor_str, status = row[:5]
+        tipo_normalizado = normalize_str(tipo_str)
+
+        if row_filter is not None and not row_filter.accepts_row(row, tipo_normalizado):
+            stats['filtered_rows'] += 1
+            continue
+
+        try:
+            # Se é uma taxa de Convert
+            if "taxa de convert" in tipo_normalizado:
+                convert_fee = {
+                    'amount': to_decimal(extract_numeric_value(valor_str)),
+                    'currency': moeda,
+                    'date': data_str
+                }
+                if edge is not None:
+                    edge['fee_seen'] = True
+                logging.info(f"Taxa de Convert encontrada: {format_amount(convert_fee['amount'])} {convert_fee['currency']}")
                 continue
-                
-            data_str, tipo_str, moeda, valor_str, status = row[:5]
-            tipo_normalizado = normalize_str(tipo_str)
-            
-            try:
-                # Se é uma taxa de Convert
-                if "taxa de convert" in tipo_normalizado:
-                    convert_fee = {
-                        'amount': extract_numeric_value(valor_str).lstrip("-"),
-                        'currency': moeda,
-                        'date': data_str
-                    }
-                    logging.info(f"Taxa de Convert encontrada: {convert_fee['amount']} {convert_fee['currency']}")
+
+            # Se é uma operação Convert
+            if "convert" in tipo_normalizado:
+                if current_convert is None:
+                    # Primeira parte do Convert
+                    current_convert = process_novadax_row(row)
+                    current_convert.description = tipo_str  # Mantém a descrição original
+
+                    # Se tiver uma taxa de Convert pendente da mesma data, aplica
+                    if convert_fee and convert_fee['date'] == data_str:
+                        current_convert.fee_amount = convert_fee['amount']
+                        current_convert.fee_currency = sys.intern(convert_fee['currency'])
+                        logging.info(f"Taxa aplicada ao Convert: {format_amount(convert_fee['amount'])} {convert_fee['currency']}")
+                        convert_fee = None
+                    elif edge is not None and not edge['fee_seen']:
+                        edge['open_converts'].append((current_convert, data_str))
+                else:
+                    # Segunda parte do Convert - complementa a transação
+                    valor = extract_numeric_value(valor_str)
+                    if valor.startswith("-"):
+                        current_convert.sent_amount = to_decimal(valor)
+                        current_convert.sent_currency = sys.intern(moeda)
+                    else:
+                        current_convert.received_amount = to_decimal(valor)
+                        current_convert.received_currency = sys.intern(moeda)
+                    if current_convert.net_worth_amount is None:
+                        current_convert.net_worth_amount = extract_brl_estimate(valor_str)
+
+                    # Emite a transação Convert completa
+                    completed, current_convert = current_convert, None
+                    log_transaction(row, completed)
+                    stats['converted_rows'] += 1
+                    yield completed
+            else:
+                # Para outras operações (não Convert), processa normalmente
+                if current_convert:
+                    # Se havia um Convert incompleto, emite ele antes
+                    pending, current_convert = current_convert, None
+                    log_transaction(row, pending)
+                    stats['converted_rows'] += 1
+                    yield pending
+
+                row_data = process_novadax_row(row)
+                if not row_data.label:
+                    stats['unclassified_rows'] += 1
+                    if on_reject:
+                        on_reject(stats['total_rows'], row, REJECT_UNCLASSIFIED)
                     continue
 
-                # Se é uma operação Convert
-                if "convert" in tipo_normalizado:
-                    if current_convert is None:
-                        # Primeira parte do Convert
-                        current_convert = process_novadax_row(row)
-                        current_convert[10] = tipo_str  # Mantém a descrição original
-                        
-                        # Se tiver uma taxa de Convert pendente da mesma data, aplica
-                        if convert_fee and convert_fee['date'] == data_str:
-                            current_convert[5] = convert_fee['amount']
-                            current_convert[6] = convert_fee['currency']
-                            logging.info(f"Taxa aplicada ao Convert: {convert_fee['amount']} {convert_fee['currency']}")
-                            convert_fee = None
+                log_transaction(row, row_data)
+                stats['converted_rows'] += 1
+                yield row_data
+
+        except Exception as e:
+            stats['error_rows'] += 1
+            logging.error(f"Erro ao processar linha {stats['total_rows']}: {str(e)}")
+            logging.error(f"Conteúdo da linha: {row}")
+            if on_reject:
+                on_reject(stats['total_rows'], row, f"{REJECT_ERROR}: {e}")
+
+    if edge is not None:
+        edge['fee'] = convert_fee
+
+    # Se sobrou algum Convert incompleto
+    if current_convert:
+        stats['converted_rows'] += 1
+        yield current_convert
+
+def group_koinly_records(records):
+    """
+    Agrupa transações consecutivas com a mesma data/hora. Todas as pernas de
+    uma mesma operação (Compra/Venda, taxa, Convert) ficam no mesmo grupo, que
+    nunca deve ser separado entre arquivos.
+    """
+    group = []
+    for record in records:
+        if group and record.date != group[0].date:
+            yield group
+            group = []
+        group.append(record)
+    if group:
+        yield group
+
+def serialize_rows(rows) -> str:
+    """
+    Serializa linhas no formato CSV (mesmo dialeto do csv.writer padrão).
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def _write_shard(path: str, chunks: List[str]) -> None:
+    with open(path, mode='w', encoding='utf-8', newline='') as outfile:
+        outfile.write(serialize_rows([KOINLY_HEADER]))
+        outfile.writelines(chunks)
+
+def write_sharded_output(records, output_file, shard_rows=None, shard_bytes=None,
+                         shard_period=None, shard_workers=4):
+    """
+    Divide a saída Koinly em vários arquivos limitados por número de linhas,
+    tamanho em bytes e/ou período ('month' ou 'year'). Cada arquivo repete o
+    cabeçalho do Koinly e é gravado em paralelo por um pool de escrita.
+    Grupos de linhas da mesma operação nunca são divididos; um grupo maior que
+    o limite fica sozinho em um arquivo.
+    Gera também um manifesto JSON com o intervalo de datas e o total de linhas
+    de cada arquivo. Arquivos numerados que sobraram de uma divisão anterior
+    em mais partes são apagados. Retorna (lista de shards, caminho do
+    manifesto).
+
+    Cada worker tem no máximo SHARD_PENDING arquivos esperando na fila de
+    escrita; a leitura espera quando ela enche.
+    """
+    if shard_period is not None and shard_period not in SHARD_PERIODS:
+        raise ValueError(f"Período de divisão inválido: {shard_period}")
+
+    base, ext = os.path.splitext(output_file)
+    ext = ext or '.csv'
+    header_bytes = len(serialize_rows([KOINLY_HEADER]).encode('utf-8'))
+    period_key = SHARD_PERIODS.get(shard_period)
+
+    shards = []
+    futures = []
+    chunks, rows_in_shard, bytes_in_shard = [], 0, header_bytes
+    first_date = last_date = period = None
+    workers = max(1, shard_workers)
+    pending = threading.BoundedSemaphore(workers * SHARD_PENDING)
+
+    def flush(executor):
+        path = f"{base}_{len(shards) + 1:03d}{ext}"
+        pending.acquire()
+        future = executor.submit(_write_shard, path, chunks)
+        future.add_done_callback(lambda _: pending.release())
+        futures.append(future)
+        shards.append({
+            "file": path,
+            "first_date": format_date(first_date) if first_date else None,
+            "last_date": format_date(last_date) if last_date else None,
+            "rows": rows_in_shard,
+            "bytes": bytes_in_shard,
+        })
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for group in group_koinly_records(records):
+            text = serialize_rows(record.to_row() for record in group)
+            size = len(text.encode('utf-8'))
+            date = group[0].date
+            group_period = period_key(date) if period_key and date else None
+
+            if rows_in_shard and (
+                (shard_rows and rows_in_shard + len(group) > shard_rows)
+                or (shard_bytes and bytes_in_shard + size > shard_bytes)
+                or (group_period and period and group_period != period)
+            ):
+                flush(executor)
+                chunks, rows_in_shard, bytes_in_shard = [], 0, header_bytes
+                first_date = last_date = period = None
+
+            chunks.append(text)
+            rows_in_shard += len(group)
+            bytes_in_shard += size
+            if date:
+                first_date = first_date or date
+                last_date = date
+            period = group_period or period
+
+        if rows_in_shard or not shards:
+            flush(executor)
+
+        # Propaga eventuais erros de escrita
+        for future in futures:
+            future.result()
+
+    # Partes de uma divisão anterior além da última desta
+    number = len(shards) + 1
+    while os.path.exists(f"{base}_{number:03d}{ext}"):
+        os.remove(f"{base}_{number:03d}{ext}")
+        logging.info(f"Arquivo {base}_{number:03d}{ext} de uma divisão anterior removido")
+        number += 1
+
+    manifest_file = f"{base}_manifest.json"
+    with open(manifest_file, mode='w', encoding='utf-8') as manifest:
+        json.dump({"output_file": output_file, "shards": shards}, manifest, indent=2, ensure_ascii=False)
+
+    for shard in shards:
+        logging.info(f"Arquivo {shard['file']}: {shard['rows']} linhas ({shard['first_date']} a {shard['last_date']})")
+
+    return shards, manifest_file
+
+def is_novadax_header(row) -> bool:
+    """
+    Verifica se a linha é o cabeçalho do CSV da Novadax ('Data', 'Tipo', ...).
+    """
+    return bool(row) and normalize_str(str(row[0])).strip() == "data"
+
+def iter_novadax_rows(source):
+    """
+    Gera as linhas do extrato da Novadax (sem o cabeçalho) a partir de:
+    - caminho de arquivo CSV;
+    - bytes com o conteúdo do CSV;
+    - arquivo aberto, em modo texto ou binário;
+    - iterável de linhas já separadas em campos (o cabeçalho, se houver, é
+      reconhecido e descartado).
+    Nada é gravado em disco.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, mode='r', encoding='utf-8') as infile:
+            reader = csv.reader(infile)
+
+            # Pula a linha de cabeçalho do CSV da Novadax
+            next(reader, None)
+            yield from reader
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(bytes(source))
+
+    if hasattr(source, 'read'):
+        text = source
+        if isinstance(source.read(0), bytes):
+            text = io.TextIOWrapper(source, encoding='utf-8')
+        try:
+            reader = csv.reader(text)
+            next(reader, None)
+            yield from reader
+        finally:
+            if text is not source:
+                # Não fecha o arquivo de quem chamou
+                text.detach()
+        return
+
+    rows = iter(source)
+    first = next(rows, None)
+    if first is not None and not is_novadax_header(first):
+        yield first
+    yield from rows
+
+def iter_koinly_records_from(source, stats=None, on_reject=None, price_index=None,
+                             row_filter=None, progress=None):
+    """
+    API em streaming: gera KoinlyRecords sob demanda a partir de qualquer
+    fonte aceita por iter_novadax_rows, sem gravar arquivos. Use
+    record.to_row() para obter a linha do CSV Koinly.
+
+    progress (veja progress.Progress) acompanha as linhas lidas e pode
+    interromper a leitura.
+    """
+    stats = new_stats() if stats is None else stats
+    rows = iter_novadax_rows(source)
+    if progress is not None:
+        rows = progress.track(rows)
+    records = iter_koinly_records(rows, stats, on_reject=on_reject, row_filter=row_filter)
+    return fill_net_worth(records, price_index)
+
+def convert_novadax_to_koinly(input_file, output_file, shard_rows=None, shard_bytes=None,
+                              shard_period=None, shard_workers=4, price_file=None,
+                              workers=None, opening_balances=None, closing_balances=None,
+                              quarantine_file=None, row_filter=None, append=False,
+                              extra_outputs=None, asset_file=None, progress=None):
+    """
+    Lê o CSV da Novadax (input_file) e gera um CSV no formato Koinly (output_file).
+    input_file pode ser qualquer fonte aceita por iter_novadax_rows.
+
+    As colunas Net Worth recebem a estimativa '(≈R$...)' do extrato; quando ela
+    não existe, o valor é calculado pelo arquivo de preços históricos em BRL
+    (price_file), se informado.
+
+    Se shard_rows, shard_bytes ou shard_period for informado, a saída é dividida
+    em vários arquivos (veja write_sharded_output) e um manifesto é gerado.
+
+    Com workers > 1 o arquivo é convertido em trechos paralelos (veja
+    parallel.iter_koinly_records_parallel), com saída idêntica à sequencial.
+
+    Na mesma passada são somados os totais por moeda (veja
+    balances.BalanceTracker); o resumo, comparado com os saldos inicial e
+    final informados, é retornado em 'balances'.
+
+    Linhas rejeitadas (inválidas, com erro ou de tipo não identificado) vão
+    para o arquivo de quarentena (padrão: '<saida>_quarantine.csv'), que pode
+    ser reprocessado depois com quarantine.reprocess_quarantine. Com saída
+    em fluxo, o padrão é '<entrada>_koinly_quarantine.csv'; se a entrada
+    também não for um arquivo, as linhas rejeitadas são só contadas (em
+    'quarantined_rows'), sem gravar nada na pasta atual.
+
+    row_filter (veja RowFilter) descarta linhas por status, moeda, label,
+    tipo ou período antes da conversão; o total vai em 'filtered_rows'.
+
+    output_file também pode ser um arquivo aberto em modo texto (ex.: a
+    saída padrão): cada linha é enviada (flush) assim que é convertida, para
+    que o próximo programa de um pipeline comece a ler imediatamente.
+
+    Com append=True, as transações novas são acrescentadas ao final de
+    output_file. A marca d'água (veja incremental.HighWaterMark) fica em
+    '<saida>_state.json', e as linhas até ela são descartadas sem
+    interpretação e contadas em 'skipped_rows'. O modo incremental lê o
+    extrato em sequência (workers é ignorado) e não combina com a divisão
+    em vários arquivos nem com fluxos de saída.
+
+    extra_outputs é uma lista de (formato, arquivo) com outros formatos
+    gravados na mesma passada (veja formats.OUTPUT_FORMATS), sem reler nem
+    reclassificar o extrato.
+
+    Na saída Koinly, os tickers com identificador conhecido (tabela do
+    pacote, sobreposta por asset_file; veja assets.load_asset_ids) são
+    trocados pelo identificador do ativo no Koinly.
+
+    progress (veja progress.Progress) recebe as páginas e linhas lidas, a
+    velocidade e o tempo restante, e pode cancelar a conversão com um
+    CancelToken. Para PDF, passe progress.page_done como on_page da
+    extração (veja pdf_converter.iter_pdf_transactions).
+    """
+    from .assets import apply_asset_ids, load_asset_ids
+    from .balances import BalanceTracker
+    from .quarantine import QuarantineWriter, default_quarantine_file
+
+    configure_logging()
+
+    stats = new_stats()
+    streaming = hasattr(output_file, 'write')
+    output_name = getattr(output_file, 'name', "saida") if streaming else output_file
+    input_name = (input_file if isinstance(input_file, (str, os.PathLike))
+                  else getattr(input_file, 'name', "entrada em memória"))
+    logging.info(f"Iniciando conversão de {input_name} para {output_name}")
+    if quarantine_file is None and not streaming:
+        quarantine_file = default_quarantine_file(output_file)
+    elif quarantine_file is None and isinstance(input_file, (str, os.PathLike)):
+        quarantine_file = os.path.splitext(input_file)[0] + "_koinly_quarantine.csv"
+    quarantine = QuarantineWriter(quarantine_file, append=append)
+    sharded = bool(shard_rows or shard_bytes or shard_period)
+    if sharded and streaming:
+        raise ValueError("A divisão em vários arquivos exige um arquivo de saída, não um fluxo")
+    result = {}
+
+    mark = None
+    if append:
+        from .incremental import HighWaterMark, default_state_file, file_sizes, truncate_files
+
+        if sharded or streaming:
+            raise ValueError("O modo incremental exige um único arquivo de saída")
+        state_file = default_state_file(output_file)
+        mark = row_filter = HighWaterMark.load(state_file, output_file, row_filter)
+        if mark.last_date:
+            logging.info(f"Acrescentando transações posteriores a {mark.last_date}")
+        # Se a conversão falhar ou for cancelada, os arquivos voltam ao
+        # tamanho de antes, já que a marca não avança
+        sizes = file_sizes([output_file, quarantine.path] + [path for _, path in extra_outputs or []])
+
+    price_index = load_price_index(price_file) if price_file else None
+    if progress is not None and progress.total_rows is None and \
+            isinstance(input_file, (str, os.PathLike)):
+        from .progress import count_lines
+        progress.total_rows = count_lines(input_file)
+    if workers and workers > 1 and isinstance(input_file, (str, os.PathLike)) and not append:
+        from .parallel import iter_koinly_records_parallel
+        records = iter_koinly_records_parallel(input_file, stats, workers=workers,
+                                               on_reject=quarantine, row_filter=row_filter)
+        if progress is not None:
+            # Os trechos chegam prontos: as linhas lidas vêm dos contadores
+            records = progress.track(records, stats)
+        records = fill_net_worth(records, price_index)
+    else:
+        records = iter_koinly_records_from(input_file, stats, on_reject=quarantine,
+                                           price_index=price_index, row_filter=row_filter,
+                                           progress=progress)
+    balances = BalanceTracker(opening_balances, closing_balances)
+    records = balances.track(records)
+
+    asset_ids = load_asset_ids(asset_file)
+    from .formats import FormatWriters
+    extra = FormatWriters(extra_outputs or [], append=append, asset_ids=asset_ids)
+    if extra_outputs:
+        records = extra.tee(records)
+
+    # Depois dos saldos e dos outros formatos, que usam os tickers (a cópia
+    # 'koinly' aplica a tabela na escrita)
+    if asset_ids:
+        records = apply_asset_ids(records, asset_ids)
+
+    try:
+        with quarantine, extra:
+            if sharded:
+                shards, manifest_file = write_sharded_output(
+                    records, output_file,
+                    shard_rows=shard_rows, shard_bytes=shard_bytes,
+                    shard_period=shard_period, shard_workers=shard_workers,
+                )
+                result = {"shards": shards, "manifest_file": manifest_file}
+            elif streaming:
+                writer = csv.writer(output_file)
+                writer.writerow(KOINLY_HEADER)
+                for record in records:
+                    writer.writerow(record.to_row())
+                    output_file.flush()
+                output_file.flush()
+            else:
+                from .pipeline import BackgroundWriter, pipeline_enabled
+
+                with open(output_file, mode='a' if append else 'w', encoding='utf-8', newline='') as outfile:
+                    # Cabeçalho Koinly (no modo incremental, só em arquivo novo)
+                    if not append or outfile.tell() == 0:
+                        csv.writer(outfile).writerow(KOINLY_HEADER)
+
+                    rows = (record.to_row() for record in records)
+                    if pipeline_enabled():
+                        # A formatação e a gravação do CSV ficam com uma thread,
+                        # em paralelo com a leitura e a conversão
+                        with BackgroundWriter(outfile) as writer:
+                            writer.writerows(rows)
                     else:
-                        # Segunda parte do Convert - complementa a transação
-                        valor = extract_numeric_value(valor_str)
-                        if valor.startswith("-"):
-                            current_convert[1] = valor.lstrip("-")
-                            current_convert[2] = moeda
-                        else:
-                            current_convert[3] = valor.lstrip("+")
-                            current_convert[4] = moeda
-                        
-                        # Escreve a transação Convert completa
-                        writer.writerow(current_convert)
-                        log_transaction(row, current_convert)
-                        converted_rows += 1
-                        current_convert = None
-                else:
-                    # Para outras operações (não Convert), processa normalmente
-                    if current_convert:
-                        # Se havia um Convert incompleto, escreve ele antes
-                        writer.writerow(current_convert)
-                        log_transaction(row, current_convert)
-                        converted_rows += 1
-                        current_convert = None
-                    
-                    row_data = process_novadax_row(row)
-                    writer.writerow(row_data)
-                    log_transaction(row, row_data)
-                    converted_rows += 1
-                    
-            except Exception as e:
-                error_rows += 1
-                logging.error(f"Erro ao processar linha {total_rows}: {str(e)}")
-                logging.error(f"Conteúdo da linha: {row}")
-        
-        # Se sobrou algum Convert incompleto
-        if current_convert:
-            writer.writerow(current_convert)
-            converted_rows += 1
-    
+                        csv.writer(outfile).writerows(rows)
+    except BaseException:
+        if mark is not None:
+            truncate_files(sizes)
+        raise
+
+    if progress is not None:
+        progress.finish()
+    if quarantine.rows and quarantine.path is not None:
+        result["quarantine_file"] = quarantine.path
+    if extra.paths:
+        result["extra_outputs"] = extra.paths
+
+    if mark is not None:
+        # A marca só avança depois que a saída foi gravada por completo
+        mark.save(state_file)
+        # As linhas anteriores à marca passaram pelo row_filter, mas não
+        # foram descartadas por um filtro
+        stats['filtered_rows'] -= mark.skipped_rows
+        result.update(skipped_rows=mark.skipped_rows, state_file=state_file)
+
     logging.info(f"\nResumo da conversão:")
-    logging.info(f"Total de linhas processadas: {total_rows}")
-    logging.info(f"Linhas convertidas com sucesso: {converted_rows}")
-    logging.info(f"Linhas com erro: {error_rows}")
-    logging.info(f"Arquivo convertido salvo em: {output_file}")
-    
+    logging.info(f"Total de linhas processadas: {stats['total_rows']}")
+    logging.info(f"Linhas convertidas com sucesso: {stats['converted_rows']}")
+    logging.info(f"Linhas com erro: {stats['error_rows']}")
+    logging.info(f"Linhas de tipo não identificado: {stats['unclassified_rows']}")
+    if stats['filtered_rows']:
+        logging.info(f"Linhas descartadas pelos filtros: {stats['filtered_rows']}")
+    if mark is not None:
+        logging.info(f"Linhas já convertidas antes (puladas): {mark.skipped_rows}")
+    if quarantine.rows and quarantine.path is not None:
+        logging.info(f"Linhas rejeitadas salvas em: {quarantine.path}")
+    elif quarantine.rows:
+        logging.warning(f"{quarantine.rows} linhas rejeitadas descartadas (sem arquivo de quarentena)")
+    logging.info(f"Arquivo convertido salvo em: {output_name}")
+
+    balance_summary = balances.summary()
+    for currency, point in balance_summary['negative_balances'].items():
+        logging.warning(f"Saldo negativo de {currency}: {point['balance']} em {point['date']}")
+
     return {
-        "total_rows": total_rows,
-        "converted_rows": converted_rows,
-        "error_rows": error_rows,
-        "output_file": output_file
-    } 
\ No newline at end of file
+        "total_rows": stats['total_rows'],
+        "converted_rows": stats['converted_rows'],
+        "error_rows": stats['error_rows'],
+        "unclassified_rows": stats['unclassified_rows'],
+        "filtered_rows": stats['filtered_rows'],
+        "quarantined_rows": quarantine.rows,
+        "output_file": output_name,
+        "balances": balance_summary,
+        **result
+    }
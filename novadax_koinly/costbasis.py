@@ -0,0 +1,320 @@
+import csv
+import heapq
+import logging
+import os
+import tempfile
+from collections import deque
+from decimal import Decimal
+from operator import itemgetter
+
+from .converter import (TRADE_LABELS, KoinlyRecord, configure_logging, group_koinly_records,
+                        iter_koinly_records_from, new_stats)
+from .merge import DEFAULT_RUN_ROWS, detect_format, is_sorted, open_sorted
+from .prices import fill_net_worth, load_price_index
+
+ZERO = Decimal(0)
+FIAT = "BRL"
+
+# Limite mensal de alienações isentas de imposto sobre ganho de capital
+EXEMPTION_LIMIT = Decimal("35000")
+
+# Labels cujo envio de cripto é uma alienação (venda ou troca)
+DISPOSAL_LABELS = frozenset(("sell", "trade"))
+
+DISPOSAL_REPORT_HEADER = [
+    "Mes", "Ativo", "Quantidade", "Valor de Alienacao (BRL)", "Custo (BRL)",
+    "Ganho (BRL)", "Total Alienado no Mes (BRL)", "Isento",
+]
+
+class _Disposals:
+    """
+    Acumuladores das alienações de um ativo em um mês.
+    """
+    __slots__ = ('quantity', 'proceeds', 'cost', 'rows', 'unpriced')
+
+    def __init__(self):
+        self.quantity = ZERO
+        self.proceeds = ZERO
+        self.cost = ZERO
+        self.rows = 0
+        self.unpriced = 0
+
+def brl_value(record):
+    """
+    Valor da transação em reais: a perna em BRL quando existe, senão o Net
+    Worth em BRL. None se não houver como avaliar.
+    """
+    if record.sent_currency == FIAT and record.sent_amount is not None:
+        return record.sent_amount
+    if record.received_currency == FIAT and record.received_amount is not None:
+        return record.received_amount
+    if record.net_worth_currency == FIAT:
+        return record.net_worth_amount
+    return None
+
+def _split_value(total: Decimal, records, amount_attr: str, currency_attr: str) -> dict:
+    """
+    Divide 'total' entre as linhas de cripto de uma operação, pela
+    quantidade. Só quando são todas do mesmo ativo; senão, retorna {} e cada
+    linha é avaliada por brl_value.
+    """
+    if not records or len({getattr(record, currency_attr) for record in records}) > 1:
+        return {}
+    quantity = sum((getattr(record, amount_attr) for record in records), ZERO)
+    if quantity <= ZERO:
+        return {}
+    return {id(record): total * getattr(record, amount_attr) / quantity for record in records}
+
+def group_brl_values(group) -> dict:
+    """
+    Valor em reais das pernas em cripto de uma operação cujas linhas têm a
+    mesma data/hora (veja converter.group_koinly_records): numa Compra, o
+    valor pago em reais é o custo da cripto recebida; numa Venda, o valor
+    recebido em reais é o valor de alienação da cripto enviada. Retorna
+    {id(registro): valor}; linhas sem perna em reais na operação ficam de
+    fora.
+    """
+    paid = received = None
+    bought, sold = [], []
+    for record in group:
+        if record.label not in TRADE_LABELS:
+            continue
+        if record.sent_amount is not None:
+            if record.sent_currency == FIAT:
+                paid = (paid or ZERO) + record.sent_amount
+            elif record.sent_currency:
+                sold.append(record)
+        if record.received_amount is not None:
+            if record.received_currency == FIAT:
+                received = (received or ZERO) + record.received_amount
+            elif record.received_currency:
+                bought.append(record)
+
+    values = {}
+    if paid is not None:
+        values.update(_split_value(paid, bought, 'received_amount', 'received_currency'))
+    if received is not None:
+        values.update(_split_value(received, sold, 'sent_amount', 'sent_currency'))
+    return values
+
+class CostBasisTracker:
+    """
+    Custo de aquisição pelo método FIFO, em uma única passada e com Decimal
+    exato. Cada ativo tem uma fila (deque) de lotes [quantidade, custo total];
+    cada lote entra e sai da fila uma única vez, então o trabalho por linha é
+    O(1) amortizado.
+
+    Cripto recebida vira um lote com custo igual ao valor em reais da
+    transação. Cripto enviada em venda ou troca é uma alienação: consome os
+    lotes mais antigos e soma o valor de alienação, o custo e o ganho ao mês.
+    O valor em reais vem da perna em reais da mesma operação (veja
+    update_group e group_brl_values) e, sem ela, de brl_value.
+    Saques e taxas em cripto só consomem os lotes. As transações precisam
+    chegar em ordem crescente de data.
+    """
+
+    def __init__(self):
+        self.lots = {}
+        self.months = {}
+        self.uncovered = {}
+        self.unpriced_rows = 0
+        self.out_of_order = False
+        self._last_date = None
+
+    def _acquire(self, asset: str, quantity: Decimal, cost) -> None:
+        lots = self.lots.get(asset)
+        if lots is None:
+            lots = self.lots[asset] = deque()
+        lots.append([quantity, cost if cost is not None else ZERO])
+
+    def _consume(self, asset: str, quantity: Decimal) -> Decimal:
+        """
+        Retira 'quantity' dos lotes mais antigos e retorna o custo retirado.
+        """
+        lots = self.lots.get(asset)
+        cost = ZERO
+        while quantity > ZERO and lots:
+            lot = lots[0]
+            if lot[0] <= quantity:
+                quantity -= lot[0]
+                cost += lot[1]
+                lots.popleft()
+            else:
+                portion = lot[1] * quantity / lot[0]
+                lot[0] -= quantity
+                lot[1] -= portion
+                cost += portion
+                quantity = ZERO
+        if quantity > ZERO:
+            self.uncovered[asset] = self.uncovered.get(asset, ZERO) + quantity
+        return cost
+
+    def update(self, record, value=None) -> None:
+        """
+        Processa uma transação (O(1) amortizado). 'value' é o valor em reais
+        já conhecido pela operação (veja update_group); sem ele, vale
+        brl_value(record).
+        """
+        if record.date is not None:
+            if self._last_date is not None and record.date < self._last_date:
+                self.out_of_order = True
+            self._last_date = record.date
+
+        if value is None:
+            value = brl_value(record)
+
+        if record.received_amount is not None and record.received_currency not in ("", FIAT):
+            self._acquire(record.received_currency, record.received_amount, value)
+
+        if record.sent_amount is not None and record.sent_currency not in ("", FIAT):
+            cost = self._consume(record.sent_currency, record.sent_amount)
+            if record.label in DISPOSAL_LABELS:
+                month = record.date.strftime("%Y-%m") if record.date else "Invalid Date"
+                assets = self.months.get(month)
+                if assets is None:
+                    assets = self.months[month] = {}
+                disposals = assets.get(record.sent_currency)
+                if disposals is None:
+                    disposals = assets[record.sent_currency] = _Disposals()
+                disposals.quantity += record.sent_amount
+                disposals.proceeds += value if value is not None else ZERO
+                disposals.cost += cost
+                disposals.rows += 1
+                if value is None:
+                    disposals.unpriced += 1
+                    self.unpriced_rows += 1
+
+        if record.fee_amount is not None and record.fee_currency not in ("", FIAT):
+            self._consume(record.fee_currency, record.fee_amount)
+
+    def update_group(self, group) -> None:
+        """
+        Processa as transações de uma mesma data/hora, avaliando as pernas
+        em cripto pela perna em reais da operação (veja group_brl_values).
+        """
+        values = group_brl_values(group)
+        for record in group:
+            self.update(record, values.get(id(record)))
+
+    def track(self, records):
+        """
+        Repassa as transações acumulando o custo no caminho.
+        """
+        for group in group_koinly_records(records):
+            self.update_group(group)
+            yield from group
+
+    def summary(self) -> dict:
+        """
+        Retorna, por mês, as alienações de cada ativo e o total alienado
+        (comparado ao limite de isenção), além das posições restantes, das
+        quantidades vendidas sem lote de compra correspondente e das
+        alienações sem valor em reais.
+
+        Um mês com alienações sem valor em reais tem 'exempt' None
+        (indeterminado) enquanto o total avaliado estiver dentro do limite.
+        """
+        months = {}
+        for month in sorted(self.months):
+            assets = {}
+            total = ZERO
+            unpriced = 0
+            for asset, disposals in sorted(self.months[month].items()):
+                assets[asset] = {
+                    "quantity": disposals.quantity,
+                    "proceeds": disposals.proceeds,
+                    "cost": disposals.cost,
+                    "gain": disposals.proceeds - disposals.cost,
+                    "rows": disposals.rows,
+                    "unpriced_rows": disposals.unpriced,
+                }
+                total += disposals.proceeds
+                unpriced += disposals.unpriced
+            exempt = total <= EXEMPTION_LIMIT
+            months[month] = {
+                "assets": assets,
+                "proceeds": total,
+                "gain": sum((entry["gain"] for entry in assets.values()), ZERO),
+                "unpriced_rows": unpriced,
+                "exempt": None if exempt and unpriced else exempt,
+            }
+
+        holdings = {}
+        for asset, lots in sorted(self.lots.items()):
+            if lots:
+                holdings[asset] = {
+                    "quantity": sum((lot[0] for lot in lots), ZERO),
+                    "cost": sum((lot[1] for lot in lots), ZERO),
+                }
+
+        return {
+            "months": months,
+            "holdings": holdings,
+            "uncovered": dict(sorted(self.uncovered.items())),
+            "unpriced_rows": self.unpriced_rows,
+            "out_of_order": self.out_of_order,
+        }
+
+def iter_chronological_records(input_file, stats, workdir, run_rows=DEFAULT_RUN_ROWS):
+    """
+    Gera as transações de um CSV da NovaDax ou Koinly em ordem crescente de
+    data. Arquivos fora de ordem são ordenados em disco (veja merge).
+    """
+    kind = detect_format(input_file)
+    if kind == 'novadax' and is_sorted(input_file, kind):
+        yield from iter_koinly_records_from(input_file, stats)
+        return
+    streams, _ = open_sorted(input_file, kind, stats, workdir, run_rows)
+    for _, row in heapq.merge(*streams, key=itemgetter(0)):
+        yield KoinlyRecord.from_row(row)
+
+def write_disposal_report(summary, report_file):
+    """
+    Grava o relatório mensal de alienações por ativo.
+    """
+    with open(report_file, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(DISPOSAL_REPORT_HEADER)
+        for month, entry in summary['months'].items():
+            for asset, disposals in entry['assets'].items():
+                writer.writerow([
+                    month, asset,
+                    format(disposals['quantity'], 'f'),
+                    format(disposals['proceeds'], '.2f'),
+                    format(disposals['cost'], '.2f'),
+                    format(disposals['gain'], '.2f'),
+                    format(entry['proceeds'], '.2f'),
+                    {True: "sim", False: "nao", None: "indeterminado"}[entry['exempt']],
+                ])
+    return report_file
+
+def compute_cost_basis(input_file, report_file=None, price_file=None, run_rows=DEFAULT_RUN_ROWS):
+    """
+    Calcula o custo FIFO e as alienações mensais de um CSV da NovaDax ou de
+    uma saída Koinly, sem passar pelo Koinly. Retorna o resumo de
+    CostBasisTracker.summary() com as estatísticas da conversão.
+    """
+    configure_logging()
+    logging.info(f"Calculando custo FIFO de {input_file}")
+
+    stats = new_stats()
+    tracker = CostBasisTracker()
+    price_index = load_price_index(price_file) if price_file else None
+
+    output_dir = os.path.dirname(os.path.abspath(report_file or input_file))
+    with tempfile.TemporaryDirectory(dir=output_dir) as workdir:
+        records = iter_chronological_records(input_file, stats, workdir, run_rows)
+        for group in group_koinly_records(fill_net_worth(records, price_index)):
+            tracker.update_group(group)
+
+    summary = tracker.summary()
+    summary["stats"] = stats
+    if report_file:
+        summary["report_file"] = write_disposal_report(summary, report_file)
+
+    for asset, quantity in summary["uncovered"].items():
+        logging.warning(f"Venda de {quantity} {asset} sem compra correspondente (custo zero)")
+    if summary["unpriced_rows"]:
+        logging.warning(f"{summary['unpriced_rows']} alienações sem valor em reais")
+
+    return summary
@@ -0,0 +1,221 @@
+import csv
+from typing import List
+
+from .converter import KOINLY_HEADER, TRADE_LABELS, format_amount, group_koinly_records
+
+# Formatos de saída registrados: nome -> classe (veja register_format)
+OUTPUT_FORMATS = {}
+
+# Datas com segundos para os formatos que aceitam (o Koinly usa minutos)
+ISO_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def register_format(name):
+    """
+    Registra um formato de saída. A classe define 'header' e rows(record),
+    que gera as linhas de um KoinlyRecord; uma instância é criada por
+    arquivo, então pode guardar estado (ex.: numeração). Formatos que
+    juntam as pernas de uma operação definem também group_rows(group), que
+    recebe os registros com a mesma data/hora (veja
+    converter.group_koinly_records).
+    """
+    def decorator(cls):
+        OUTPUT_FORMATS[name] = cls
+        return cls
+    return decorator
+
+def _iso_date(record) -> str:
+    return record.date.strftime(ISO_DATE_FORMAT) if record.date else ""
+
+@register_format("koinly")
+class KoinlyFormat:
+    """
+    O próprio CSV Koinly (útil para uma cópia na mesma passada), com os
+    identificadores de ativos da tabela 'asset_ids' (veja assets), como no
+    arquivo principal.
+    """
+    header = KOINLY_HEADER
+    asset_ids = None
+
+    def rows(self, record):
+        row = record.to_row()
+        if self.asset_ids:
+            from .assets import asset_id
+            for column in (2, 4, 6):  # Moedas de envio, recebimento e taxa
+                row[column] = asset_id(self.asset_ids, row[column])
+        yield row
+
+@register_format("cointracking")
+class CoinTrackingFormat:
+    """
+    CSV no estilo do CoinTracking: uma linha por transação, com o tipo do
+    CoinTracking no lugar do label. As duas pernas de uma Compra/Venda ou
+    Convert formam uma única linha Trade, com compra e venda. Taxas avulsas
+    vão como 'Other Fee', com o valor na coluna de venda.
+    """
+    header = ["Type", "Buy Amount", "Buy Currency", "Sell Amount", "Sell Currency",
+              "Fee", "Fee Currency", "Exchange", "Trade-Group", "Comment", "Date"]
+
+    TYPES = {
+        "buy": "Trade", "sell": "Trade", "trade": "Trade",
+        "deposit": "Deposit", "withdrawal": "Withdrawal",
+        "reward": "Reward / Bonus", "airdrop": "Airdrop",
+        "fee": "Other Fee", "withdrawal-fee": "Other Fee",
+    }
+
+    def rows(self, record):
+        sell_amount, sell_currency = record.sent_amount, record.sent_currency
+        fee_amount, fee_currency = record.fee_amount, record.fee_currency
+        if sell_amount is None and record.received_amount is None:
+            sell_amount, sell_currency, fee_amount, fee_currency = fee_amount, fee_currency, None, ""
+        yield [
+            self.TYPES.get(record.label, record.label),
+            format_amount(record.received_amount), record.received_currency,
+            format_amount(sell_amount), sell_currency,
+            format_amount(fee_amount), fee_currency,
+            "NovaDax", "", record.description, _iso_date(record),
+        ]
+
+    def group_rows(self, group):
+        """
+        Junta a perna enviada e a recebida de cada operação do grupo, na
+        ordem em que aparecem; o CoinTracking não aceita Trade com um lado
+        só. Se as pernas não formam pares (quantidades diferentes, ou taxa
+        nas duas), cada registro vai sozinho, como em rows().
+        """
+        sent, received = [], []
+        for record in group:
+            if record.label in TRADE_LABELS:
+                if record.sent_amount is not None and record.received_amount is None:
+                    sent.append(record)
+                elif record.received_amount is not None and record.sent_amount is None:
+                    received.append(record)
+
+        pairs, second = {}, set()
+        if len(sent) == len(received):
+            for sell, buy in zip(sent, received):
+                if sell.fee_amount is not None and buy.fee_amount is not None:
+                    continue
+                first = sell if group.index(sell) < group.index(buy) else buy
+                pairs[id(first)] = (sell, buy)
+                second.add(id(buy if first is sell else sell))
+
+        for record in group:
+            if id(record) in second:
+                continue
+            pair = pairs.get(id(record))
+            if pair is None:
+                yield from self.rows(record)
+                continue
+            sell, buy = pair
+            fee = sell if sell.fee_amount is not None else buy
+            yield [
+                "Trade",
+                format_amount(buy.received_amount), buy.received_currency,
+                format_amount(sell.sent_amount), sell.sent_currency,
+                format_amount(fee.fee_amount), fee.fee_currency,
+                "NovaDax", "", record.description, _iso_date(record),
+            ]
+
+@register_format("ledger")
+class LedgerFormat:
+    """
+    Razão genérico: um lançamento por movimento de moeda (entrada positiva,
+    saída e taxa negativas), com o valor em BRL do registro. Os lançamentos
+    da mesma transação (os registros com a mesma data/hora: as pernas de uma
+    Compra/Venda ou Convert e a taxa) têm o mesmo número.
+    """
+    header = ["Transacao", "Data", "Label", "Moeda", "Quantidade", "Valor BRL", "Descricao"]
+
+    def __init__(self):
+        self.number = 0
+
+    def rows(self, record):
+        self.number += 1
+        yield from self._entries(record)
+
+    def group_rows(self, group):
+        self.number += 1
+        for record in group:
+            yield from self._entries(record)
+
+    def _entries(self, record):
+        value = format_amount(record.net_worth_amount)
+        for amount, currency, sign in ((record.received_amount, record.received_currency, ""),
+                                       (record.sent_amount, record.sent_currency, "-"),
+                                       (record.fee_amount, record.fee_currency, "-")):
+            if amount is not None:
+                yield [self.number, _iso_date(record), record.label, currency,
+                       sign + format_amount(amount) if amount else format_amount(amount),
+                       value, record.description]
+
+def parse_outputs(specs) -> List[tuple]:
+    """
+    'FORMATO=ARQUIVO' -> [(formato, arquivo)], validando os formatos.
+    """
+    outputs = []
+    for spec in specs:
+        name, sep, path = spec.partition('=')
+        name = name.strip().lower()
+        if not sep or not path.strip():
+            raise ValueError(f"Saída inválida: {spec} (use FORMATO=ARQUIVO)")
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato desconhecido: {name} (disponíveis: {', '.join(OUTPUT_FORMATS)})")
+        outputs.append((name, path.strip()))
+    return outputs
+
+class FormatWriters:
+    """
+    Grava os mesmos registros em vários formatos na mesma passada: tee()
+    repassa cada registro adiante depois de gravá-lo em cada arquivo, de
+    modo que um formato a mais custa só a escrita, não outra leitura e
+    classificação do extrato. Os formatos com o atributo 'asset_ids'
+    recebem a tabela de identificadores de ativos.
+    """
+
+    def __init__(self, outputs, append=False, asset_ids=None):
+        self.paths = []
+        self._outputs = []
+        try:
+            for name, path in outputs:
+                outfile = open(path, mode='a' if append else 'w', encoding='utf-8', newline='')
+                output_format = OUTPUT_FORMATS[name]()
+                if hasattr(output_format, 'asset_ids'):
+                    output_format.asset_ids = asset_ids
+                self._outputs.append((outfile, csv.writer(outfile), output_format))
+                self.paths.append(path)
+        except BaseException:
+            self.close()
+            raise
+        for outfile, writer, output_format in self._outputs:
+            if outfile.tell() == 0:
+                writer.writerow(output_format.header)
+
+    def tee(self, records):
+        if not any(hasattr(output_format, 'group_rows') for _, _, output_format in self._outputs):
+            for record in records:
+                for _, writer, output_format in self._outputs:
+                    writer.writerows(output_format.rows(record))
+                yield record
+            return
+
+        # Algum formato junta as pernas de cada operação: os registros
+        # passam adiante grupo a grupo (mesma data/hora)
+        for group in group_koinly_records(records):
+            for _, writer, output_format in self._outputs:
+                if hasattr(output_format, 'group_rows'):
+                    writer.writerows(output_format.group_rows(group))
+                else:
+                    for record in group:
+                        writer.writerows(output_format.rows(record))
+            yield from group
+
+    def close(self):
+        for outfile, _, _ in self._outputs:
+            outfile.close()
+        self._outputs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from .converter import _date_key, extract_numeric_value, normalize_str
+
+NOVADAX_DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+def default_state_file(output_file: str) -> str:
+    """
+    Caminho padrão do arquivo de estado do modo incremental para uma saída
+    Koinly.
+    """
+    return os.path.splitext(output_file)[0] + "_state.json"
+
+def file_sizes(paths) -> dict:
+    """
+    Tamanho atual de cada arquivo (None se ainda não existe), para desfazer
+    um acréscimo que não terminou (veja truncate_files).
+    """
+    return {path: os.path.getsize(path) if os.path.exists(path) else None for path in paths}
+
+def truncate_files(sizes: dict) -> None:
+    """
+    Volta cada arquivo ao tamanho registrado por file_sizes; os que não
+    existiam são apagados.
+    """
+    for path, size in sizes.items():
+        if size is None:
+            if os.path.exists(path):
+                os.remove(path)
+        elif os.path.exists(path):
+            with open(path, mode='r+b') as outfile:
+                outfile.truncate(size)
+
+def row_fingerprint(row) -> str:
+    """
+    Impressão digital da linha: data, tipo, moeda, valor numérico e status.
+    Acentos, maiúsculas, espaços e a estimativa '(≈R$...)' são ignorados,
+    para que a mesma transação tenha a mesma impressão vinda do CSV ou do
+    PDF.
+    """
+    fields = [row[0], row[1], row[2], extract_numeric_value(row[3]), row[4]]
+    text = "\x1f".join("".join(normalize_str(str(cell)).split()) for cell in fields)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+class HighWaterMark:
+    """
+    Marca d'água do modo incremental: a data da última linha convertida e
+    as impressões digitais das linhas com essa data. Usada como row_filter
+    (veja converter.RowFilter), descarta as linhas anteriores à marca e as
+    da mesma data que já foram convertidas, e acompanha a nova marca.
+
+    Linhas com data em formato inesperado não têm posição no tempo: suas
+    impressões ficam guardadas à parte ('undated'). Linhas recusadas pelo
+    row_filter interno não avançam a marca, para serem avaliadas de novo
+    na próxima conversão; as operações recusadas inteiras (veja
+    RowFilter.accepts_operation) não chegam à marca.
+    """
+
+    def __init__(self, last_date: Optional[str] = None, fingerprints=(), undated=(),
+                 row_filter=None):
+        self.last_date = last_date
+        self.row_filter = row_filter
+        self.skipped_rows = 0
+        self._key = _date_key(last_date) if last_date else None
+        self._converted = Counter(fingerprints)
+        self._converted_undated = Counter(undated)
+
+        # Nova marca, acompanhada durante a conversão
+        self._new_key = self._key
+        self._new_date = last_date
+        self._new_fingerprints = list(fingerprints)
+        self._new_undated = list(undated)
+
+    @classmethod
+    def load(cls, state_file: str, output_file: str, row_filter=None) -> "HighWaterMark":
+        """
+        Lê a marca do arquivo de estado. Sem arquivo de saída (ou vazio), a
+        conversão começa do zero; com saída mas sem estado não há como saber
+        o que já foi convertido sem relê-la, e um ValueError é levantado.
+        """
+        if not os.path.exists(state_file):
+            if os.path.exists(output_file) and os.path.getsize(output_file):
+                raise ValueError(
+                    f"Arquivo de estado {state_file} não encontrado para {output_file}. "
+                    "O modo incremental só continua arquivos criados por ele."
+                )
+            return cls(row_filter=row_filter)
+
+        with open(state_file, mode='r', encoding='utf-8') as infile:
+            state = json.load(infile)
+        return cls(state.get("last_date"), state.get("fingerprints", []),
+                   state.get("undated", []), row_filter=row_filter)
+
+    @property
+    def since(self) -> Optional[datetime]:
+        """
+        Data da marca, para pular páginas inteiras na extração do PDF.
+        """
+        return datetime.strptime(self.last_date, NOVADAX_DATE_FORMAT) if self.last_date else None
+
+    def accepts_row(self, row, tipo_normalizado: str) -> bool:
+        data_str = row[0].strip()
+        key = _date_key(data_str)
+        if key is None:
+            fingerprint = row_fingerprint(row)
+            if self._converted_undated[fingerprint]:
+                self._converted_undated[fingerprint] -= 1
+                self.skipped_rows += 1
+                return False
+        elif self._key is not None and key <= self._key:
+            if key < self._key:
+                self.skipped_rows += 1
+                return False
+            fingerprint = row_fingerprint(row)
+            if self._converted[fingerprint]:
+                self._converted[fingerprint] -= 1
+                self.skipped_rows += 1
+                return False
+
+        if self.row_filter is not None and not self.row_filter.accepts_row(row, tipo_normalizado):
+            return False
+
+        if key is None:
+            self._new_undated.append(fingerprint)
+        elif self._new_key is None or key > self._new_key:
+            self._new_key, self._new_date = key, data_str
+            self._new_fingerprints = [row_fingerprint(row)]
+        elif key == self._new_key:
+            self._new_fingerprints.append(row_fingerprint(row))
+        return True
+
+    def accepts_operation(self, rows) -> bool:
+        return self.row_filter is None or self.row_filter.accepts_operation(rows)
+
+    def save(self, state_file: str) -> None:
+        """
+        Grava a nova marca. Deve ser chamada só depois que a saída foi
+        gravada por completo; a troca do arquivo é atômica.
+        """
+        tmp_file = state_file + ".tmp"
+        with open(tmp_file, mode='w', encoding='utf-8') as outfile:
+            json.dump({
+                "last_date": self._new_date,
+                "fingerprints": self._new_fingerprints,
+                "undated": self._new_undated,
+            }, outfile, indent=2)
+        os.replace(tmp_file, state_file)
@@ -0,0 +1,200 @@
+"""
+Cache de conversões completas: a mesma entrada, com as mesmas opções e as
+mesmas regras de conversão, reaproveita os arquivos gerados da vez anterior
+em vez de converter de novo.
+
+A chave é o hash do conteúdo da entrada, das opções que afetam a saída e de
+uma impressão digital do código do pacote; qualquer mudança nas regras (ex.:
+em process_novadax_row) muda a chave e invalida o que estava guardado. Os
+arquivos ficam guardados pelo hash do conteúdo (saídas iguais são guardadas
+uma vez só), e as conversões usadas há mais tempo são descartadas quando o
+cache passa do tamanho máximo.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Optional
+
+from . import __version__
+from .assets import cache_dir
+
+# Tamanho máximo do cache, em megabytes
+DEFAULT_CACHE_MB = 512
+
+_CHUNK_BYTES = 1024 * 1024
+
+def default_job_cache_dir() -> str:
+    return os.path.join(cache_dir(), "jobs")
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 do conteúdo do arquivo, lido em blocos.
+    """
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as infile:
+        for chunk in iter(lambda: infile.read(_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@lru_cache(maxsize=None)
+def rules_fingerprint() -> str:
+    """
+    Impressão digital das regras de conversão: o código e as tabelas do
+    pacote. Qualquer mudança neles gera outra impressão.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256(__version__.encode('utf-8'))
+    for path in sorted(glob.glob(os.path.join(package_dir, "*.py")) +
+                       glob.glob(os.path.join(package_dir, "*.csv"))):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(file_digest(path).encode('utf-8'))
+    return digest.hexdigest()
+
+def _replace_paths(value, paths: Dict[str, str]):
+    if isinstance(value, str):
+        return paths.get(value, value)
+    if isinstance(value, list):
+        return [_replace_paths(item, paths) for item in value]
+    if isinstance(value, dict):
+        return {key: _replace_paths(item, paths) for key, item in value.items()}
+    return value
+
+class JobCache:
+    """
+    Cache de conversões em 'directory' (padrão: default_job_cache_dir()):
+
+        entries/<chave>.json    arquivos gerados (papel -> hash) e o resultado
+        blobs/<hash>            conteúdo dos arquivos
+
+    Os papéis ('koinly', 'quarantine', ...) ligam os arquivos guardados aos
+    caminhos pedidos na conversão atual, que podem ser outros.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        self.directory = directory or default_job_cache_dir()
+        self.max_bytes = max_bytes
+        self.entries_dir = os.path.join(self.directory, "entries")
+        self.blobs_dir = os.path.join(self.directory, "blobs")
+
+    def job_key(self, input_file: str, options: dict) -> str:
+        """
+        Chave da conversão: conteúdo da entrada, opções que afetam a saída
+        (serializáveis em JSON; caminhos de arquivos auxiliares devem vir
+        como file_digest) e impressão digital das regras.
+        """
+        key = json.dumps({
+            "input": file_digest(input_file),
+            "options": options,
+            "rules": rules_fingerprint(),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _job_file(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key + ".json")
+
+    def _blob_file(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest)
+
+    def restore(self, key: str, outputs: Dict[str, str]) -> Optional[dict]:
+        """
+        Se a conversão estiver no cache, copia os arquivos guardados para os
+        caminhos de 'outputs' (papel -> caminho) e retorna o resultado
+        guardado, com os caminhos trocados pelos atuais. Senão, None.
+        """
+        job_file = self._job_file(key)
+        try:
+            with open(job_file, mode='r', encoding='utf-8') as infile:
+                job = json.load(infile)
+        except (OSError, ValueError):
+            return None
+        if not set(job["files"]) <= set(outputs):
+            return None
+
+        try:
+            for role, digest in job["files"].items():
+                tmp_file = outputs[role] + ".tmp"
+                shutil.copyfile(self._blob_file(digest), tmp_file)
+                os.replace(tmp_file, outputs[role])
+        except FileNotFoundError:
+            # Conteúdo descartado por outro processo no meio do caminho
+            os.remove(job_file)
+            return None
+
+        os.utime(job_file)  # Usada agora: fica por último na fila de descarte
+        paths = {job["paths"][role]: outputs[role] for role in job["files"]}
+        return _replace_paths(job["result"], paths)
+
+    def store(self, key: str, outputs: Dict[str, str], result: dict) -> None:
+        """
+        Guarda os arquivos gerados (papel -> caminho) e o resultado da
+        conversão, e descarta as conversões mais antigas se o cache passar
+        do tamanho máximo. Valores do resultado que não são JSON (ex.:
+        Decimal) são guardados como texto.
+        """
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+        files = {}
+        for role, path in outputs.items():
+            digest = file_digest(path)
+            blob_file = self._blob_file(digest)
+            if not os.path.exists(blob_file):
+                shutil.copyfile(path, blob_file + ".tmp")
+                os.replace(blob_file + ".tmp", blob_file)
+            files[role] = digest
+
+        job_file = self._job_file(key)
+        with open(job_file + ".tmp", mode='w', encoding='utf-8') as outfile:
+            json.dump({"files": files, "paths": outputs, "result": result}, outfile, default=str)
+        os.replace(job_file + ".tmp", job_file)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Descarta as conversões usadas há mais tempo até o cache caber em
+        max_bytes, e o conteúdo que nenhuma conversão usa mais.
+        """
+        jobs = []
+        for job_file in glob.glob(os.path.join(self.entries_dir, "*.json")):
+            try:
+                with open(job_file, mode='r', encoding='utf-8') as infile:
+                    digests = set(json.load(infile)["files"].values())
+                info = os.stat(job_file)
+            except (OSError, ValueError, KeyError):
+                continue
+            jobs.append((info.st_mtime, job_file, info.st_size, digests))
+        jobs.sort()
+
+        blob_sizes = {}
+        for blob_file in glob.glob(os.path.join(self.blobs_dir, "*")):
+            if not blob_file.endswith(".tmp"):
+                blob_sizes[os.path.basename(blob_file)] = os.path.getsize(blob_file)
+
+        references = Counter(digest for _, _, _, digests in jobs for digest in digests)
+        for digest in set(blob_sizes) - set(references):
+            self._remove(self._blob_file(digest))
+
+        total = (sum(size for _, _, size, _ in jobs) +
+                 sum(blob_sizes.get(digest, 0) for digest in references))
+        for _, job_file, size, digests in jobs:
+            if total <= self.max_bytes:
+                break
+            self._remove(job_file)
+            total -= size
+            for digest in digests:
+                references[digest] -= 1
+                if not references[digest]:
+                    self._remove(self._blob_file(digest))
+                    total -= blob_sizes.get(digest, 0)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,211 @@
+import csv
+import heapq
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+from .assets import apply_asset_ids, load_asset_ids
+from .converter import (
+    KOINLY_DATE_FORMAT, KOINLY_HEADER, configure_logging, is_novadax_header,
+    iter_koinly_records_from, new_stats, parse_date,
+)
+
+# Linhas ordenadas em memória por vez ao ordenar uma entrada fora de ordem
+DEFAULT_RUN_ROWS = 100_000
+
+# Linhas sem data válida vão para o fim da saída
+_NO_DATE = datetime.max
+
+def _koinly_key(row) -> datetime:
+    try:
+        return datetime.strptime(row[0], KOINLY_DATE_FORMAT)
+    except (ValueError, IndexError):
+        return _NO_DATE
+
+def detect_format(path: str) -> str:
+    """
+    Identifica a entrada pelo cabeçalho: 'koinly' ou 'novadax'.
+    """
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        header = next(csv.reader(infile), None)
+    if header == KOINLY_HEADER:
+        return 'koinly'
+    if header and is_novadax_header(header):
+        return 'novadax'
+    raise ValueError(f"{path}: cabeçalho não reconhecido (esperado CSV Koinly ou NovaDax)")
+
+def _iter_dates(path: str, kind: str):
+    """
+    Gera a data de cada linha do arquivo, sem converter as transações.
+    """
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.reader(infile)
+        next(reader, None)
+        for row in reader:
+            if kind == 'koinly':
+                yield _koinly_key(row)
+            elif len(row) >= 5:
+                yield parse_date(row[0]) or _NO_DATE
+
+def is_sorted(path: str, kind: str) -> bool:
+    """
+    Verifica, em uma passada e memória constante, se o arquivo já está em
+    ordem crescente de data.
+    """
+    previous = None
+    for date in _iter_dates(path, kind):
+        if previous is not None and date < previous:
+            return False
+        previous = date
+    return True
+
+def iter_keyed_rows(path: str, kind: str, stats, asset_ids=None):
+    """
+    Gera (data, linha Koinly) na ordem do arquivo. Extratos NovaDax são
+    convertidos em streaming, com os tickers de asset_ids trocados pelos
+    identificadores Koinly.
+    """
+    if kind == 'koinly':
+        with open(path, mode='r', encoding='utf-8', newline='') as infile:
+            reader = csv.reader(infile)
+            next(reader, None)
+            for row in reader:
+                if row:
+                    yield _koinly_key(row), row
+    else:
+        for record in apply_asset_ids(iter_koinly_records_from(path, stats), asset_ids or {}):
+            yield record.date or _NO_DATE, record.to_row()
+
+def iter_run_file(path: str):
+    """
+    Lê um trecho ordenado gravado por spill_sorted_runs.
+    """
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        for row in csv.reader(infile):
+            yield _koinly_key(row), row
+
+def spill_sorted_runs(keyed_rows, workdir: str, run_rows: int = DEFAULT_RUN_ROWS):
+    """
+    Ordenação externa: ordena blocos de até run_rows linhas em memória e
+    grava cada bloco ordenado em um arquivo temporário. A ordenação é
+    estável, então linhas da mesma operação mantêm a ordem original.
+    Retorna os caminhos dos trechos.
+    """
+    runs = []
+    buffer = []
+
+    def flush():
+        buffer.sort(key=lambda item: item[0])
+        fd, run_file = tempfile.mkstemp(suffix='.csv', dir=workdir)
+        with os.fdopen(fd, mode='w', encoding='utf-8', newline='') as outfile:
+            csv.writer(outfile).writerows(row for _, row in buffer)
+        runs.append(run_file)
+        buffer.clear()
+
+    for item in keyed_rows:
+        buffer.append(item)
+        if len(buffer) >= run_rows:
+            flush()
+    if buffer:
+        flush()
+    return runs
+
+def open_sorted(path: str, kind: str, stats, workdir: str, run_rows: int = DEFAULT_RUN_ROWS,
+                asset_ids=None):
+    """
+    Abre a entrada como fluxos de (data, linha Koinly) em ordem crescente:
+    um único fluxo se o arquivo já estiver ordenado, ou um por trecho
+    ordenado em disco. Retorna (fluxos, número de trechos gravados).
+    """
+    if is_sorted(path, kind):
+        return [iter_keyed_rows(path, kind, stats, asset_ids)], 0
+    logging.info(f"{path} fora de ordem: ordenando em disco")
+    runs = spill_sorted_runs(iter_keyed_rows(path, kind, stats, asset_ids), workdir, run_rows)
+    return [iter_run_file(run_file) for run_file in runs], len(runs)
+
+def _tag(keyed_rows, source):
+    for date, row in keyed_rows:
+        yield date, source, row
+
+def dedup_merged(merged, stats):
+    """
+    Remove duplicatas na saída já ordenada. Só é guardado o bloco da data
+    corrente (no formato do Koinly, com minutos, para que extratos NovaDax e
+    arquivos Koinly da mesma transação coincidam): uma linha é descartada quando outra entrada já emitiu a mesma
+    linha (pelo menos) o mesmo número de vezes nessa data. Linhas repetidas
+    dentro de um mesmo arquivo são transações legítimas e são mantidas.
+    """
+    current = None
+    seen = {}
+    for date, source, row in merged:
+        if row[0] != current:
+            current = row[0]
+            seen = {}
+        key = tuple(row)
+        counts = seen.setdefault(key, {})
+        counts[source] = counts.get(source, 0) + 1
+        if counts[source] > max((n for s, n in counts.items() if s != source), default=0):
+            yield date, source, row
+        else:
+            stats['duplicate_rows'] += 1
+
+def merge_statements(input_files, output_file, dedup=False, run_rows=DEFAULT_RUN_ROWS,
+                     asset_file=None):
+    """
+    Junta vários arquivos Koinly ou extratos NovaDax em uma única saída
+    Koinly em ordem cronológica, com um merge de k vias (heap). Entradas já
+    ordenadas são lidas diretamente; as demais são antes ordenadas em disco
+    em trechos de até run_rows linhas. A memória depende do número de
+    arquivos (e trechos), não do número de linhas.
+
+    Nos extratos NovaDax, os tickers são trocados pelos identificadores
+    Koinly como na conversão (veja assets.load_asset_ids).
+    """
+    configure_logging()
+    logging.info(f"Juntando {len(input_files)} arquivos em {output_file}")
+
+    stats = {
+        "input_files": len(input_files),
+        "sorted_inputs": 0,
+        "spilled_runs": 0,
+        "merged_rows": 0,
+        "duplicate_rows": 0,
+        "rejected_rows": 0,
+        "output_file": output_file,
+    }
+    conversion_stats = new_stats()
+    asset_ids = load_asset_ids(asset_file)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_file))) as workdir:
+        streams = []
+        for source, path in enumerate(input_files):
+            sorted_streams, runs = open_sorted(path, detect_format(path), conversion_stats,
+                                               workdir, run_rows, asset_ids)
+            if runs:
+                stats['spilled_runs'] += runs
+            else:
+                stats['sorted_inputs'] += 1
+            streams.extend(_tag(rows, source) for rows in sorted_streams)
+
+        # Empates de data mantêm a ordem das entradas (heapq.merge é estável)
+        merged = heapq.merge(*streams, key=lambda item: item[0])
+        if dedup:
+            merged = dedup_merged(merged, stats)
+
+        tmp_file = output_file + ".tmp"
+        with open(tmp_file, mode='w', encoding='utf-8', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(KOINLY_HEADER)
+            for _, _, row in merged:
+                writer.writerow(row)
+                stats['merged_rows'] += 1
+        os.replace(tmp_file, output_file)
+
+    stats['rejected_rows'] = conversion_stats['error_rows'] + conversion_stats['unclassified_rows']
+
+    logging.info(f"Linhas na saída: {stats['merged_rows']}")
+    logging.info(f"Duplicatas removidas: {stats['duplicate_rows']}")
+    logging.info(f"Trechos ordenados em disco: {stats['spilled_runs']}")
+
+    return stats
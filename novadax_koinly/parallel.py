@@ -0,0 +1,153 @@
+import csv
+import io
+import mmap
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from .converter import iter_koinly_records, new_stats, normalize_str
+from .pdf_converter import process_context
+
+# Trechos menores que isso não compensam o custo de um processo
+MIN_CHUNK_BYTES = 1024 * 1024
+
+def _parse_line(line: bytes) -> list:
+    if line.count(b'"') % 2:
+        return []
+    try:
+        return next(csv.reader([line.decode('utf-8')]), [])
+    except (UnicodeDecodeError, csv.Error):
+        return []
+
+def _is_safe_start(line: bytes, previous: bytes) -> bool:
+    """
+    Uma fronteira entre trechos só pode cair antes de uma linha válida que não
+    seja Convert nem Taxa de Convert, e com data/hora diferente da linha
+    anterior ('previous'): assim um Convert pendente do trecho anterior é
+    emitido exatamente como no processamento sequencial, e as linhas de uma
+    operação são filtradas juntas (veja converter.RowFilter).
+    """
+    row = _parse_line(line)
+    if len(row) < 5 or "convert" in normalize_str(row[1]):
+        return False
+    previous_row = _parse_line(previous)
+    return bool(previous_row) and previous_row[0].strip() != row[0].strip()
+
+def find_chunk_boundaries(mm, chunk_size: int) -> List[int]:
+    """
+    Monta o índice de deslocamentos (em bytes) onde o arquivo pode ser
+    dividido. Cada fronteira é o início de um registro: a quebra de linha
+    anterior não pode estar dentro de aspas (contagem de aspas par desde a
+    fronteira anterior). O primeiro deslocamento é o início dos dados, logo
+    após o cabeçalho, e o último é o fim do arquivo.
+    """
+    size = len(mm)
+    header_end = mm.find(b'\n')
+    if header_end == -1:
+        return [size, size]
+
+    boundaries = [header_end + 1]
+    target = boundaries[0] + chunk_size
+    while target < size:
+        start = boundaries[-1]
+        quotes = mm[start:target].count(b'"')
+        pos = target
+        boundary = None
+        while pos < size:
+            newline = mm.find(b'\n', pos)
+            if newline == -1:
+                break
+            quotes += mm[pos:newline + 1].count(b'"')
+            pos = newline + 1
+            if quotes % 2 == 0 and pos < size:
+                line_end = mm.find(b'\n', pos)
+                line = mm[pos:line_end if line_end != -1 else size]
+                previous = mm[mm.rfind(b'\n', 0, pos - 1) + 1:pos - 1]
+                if _is_safe_start(line, previous):
+                    boundary = pos
+                    break
+        if boundary is None:
+            break
+        boundaries.append(boundary)
+        target = boundary + chunk_size
+
+    boundaries.append(size)
+    return boundaries
+
+def _convert_chunk(input_file: str, start: int, end: int, row_filter=None):
+    """
+    Converte um trecho do arquivo (executado em um processo do pool).
+    """
+    stats = new_stats()
+    edge = {}
+    rejected = []
+    with open(input_file, 'rb') as infile, \
+         mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = io.TextIOWrapper(io.BytesIO(mm[start:end]), encoding='utf-8')
+        records = list(iter_koinly_records(
+            csv.reader(text), stats, edge,
+            on_reject=lambda line, row, reason: rejected.append((line, row, reason)),
+            row_filter=row_filter,
+        ))
+    return records, edge, stats, rejected
+
+def iter_koinly_records_parallel(input_file, stats, workers=None, chunk_size=None, on_reject=None,
+                                 row_filter=None):
+    """
+    Versão paralela de iter_koinly_records para CSVs grandes: o arquivo é
+    mapeado em memória, dividido em trechos por um índice de fronteiras
+    seguras e cada trecho é convertido em um processo. Os resultados são
+    emitidos na ordem original e a Taxa de Convert pendente no fim de cada
+    trecho é aplicada ao trecho seguinte, de modo que a saída é idêntica à
+    do processamento sequencial. As linhas rejeitadas são repassadas a
+    on_reject com a numeração do arquivo inteiro.
+
+    Ficam em andamento no máximo workers + 1 trechos: os registros de cada
+    trecho são liberados depois de emitidos, então a memória não cresce com
+    o tamanho do arquivo.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(input_file)
+    if chunk_size is None:
+        chunk_size = max(MIN_CHUNK_BYTES, size // (workers * 4) + 1)
+
+    if size == 0:
+        return
+
+    with open(input_file, 'rb') as infile, \
+         mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        boundaries = find_chunk_boundaries(mm, chunk_size)
+
+    pending_fee = None
+    chunks = iter(zip(boundaries, boundaries[1:]))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as executor:
+        futures = deque()
+        while True:
+            while len(futures) <= workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                futures.append(executor.submit(_convert_chunk, input_file, *chunk, row_filter))
+            if not futures:
+                break
+            records, edge, chunk_stats, rejected = futures.popleft().result()
+            if on_reject:
+                for line, row, reason in rejected:
+                    on_reject(stats['total_rows'] + line, row, reason)
+            for key, value in chunk_stats.items():
+                stats[key] += value
+
+            # Emenda o estado da Taxa de Convert entre os trechos
+            if pending_fee:
+                for record, data_str in edge['open_converts']:
+                    if data_str == pending_fee['date']:
+                        record.fee_amount = pending_fee['amount']
+                        record.fee_currency = sys.intern(pending_fee['currency'])
+                        pending_fee = None
+                        break
+            if edge['fee_seen']:
+                pending_fee = edge['fee']
+
+            yield from records
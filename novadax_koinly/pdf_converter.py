@@ -1,7 +1,11 @@
-import pdfplumber
+import contextlib
 import csv
+import io
 import unicodedata
 import re
+from datetime import datetime, timedelta
+
+DATE_PATTERN = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}')
 
 def normalize_text(text):
     """
@@ -74,10 +78,9 @@ def join_broken_text(text1, text2):
     if text1.endswith('-'):
         return text1[:-1] + text2
     
-    # Para valores monetários e números
+    # Para valores monetários e números (inclusive a estimativa '(≈R$...)'
+    # quebrada logo depois do marcador, que precisa ser mantido)
     if any(char.isdigit() for char in text1) and any(char.isdigit() for char in text2):
-        # Remove qualquer parte de valor aproximado antes de juntar
-        text1 = text1.rstrip('(≈R$')
         return text1 + text2
     
     # Para textos normais, junta com espaço se necessário
@@ -95,7 +98,11 @@ def should_combine_rows(current_row, next_row):
     # Se a próxima linha começa com data, é uma nova transação
     if next_row[0] and is_date_format(str(next_row[0]).strip()):
         return False
-        
+
+    # Cabeçalho repetido no topo da página seguinte não é continuação
+    if is_table_header(next_row):
+        return False
+
     # Se a próxima linha contém "Histórico:", não combinar
     if any("historico:" in str(cell).lower() for cell in next_row):
         return False
@@ -113,8 +120,12 @@ def should_combine_rows(current_row, next_row):
                 return True
             if "taxa de" in cell_text and i == 1:  # Coluna de tipo
                 return True
-            if any(cell_text.endswith(suffix) for suffix in ['(', '≈', '≈R$', '+']):
+            if any(cell_text.endswith(suffix) for suffix in ['(', '≈', '≈r$', '+']):
                 return True
+
+    # A estimativa '(≈R$...)' que ficou inteira na linha de baixo
+    if any(str(cell).strip().startswith(('(≈', '≈')) for cell in next_row if cell):
+        return True
     
     return False
 
@@ -143,8 +154,10 @@ def combine_row_cells(current_text, next_text):
     # Se é um valor numérico quebrado
     if (any(c.isdigit() for c in current_text) and 
         any(c.isdigit() for c in next_text)):
-        # Remove marcadores de valor aproximado se estiverem no final
-        current_text = current_text.rstrip('(≈R$')
+        # A estimativa '(≈R$...)' quebrada logo depois do marcador continua
+        # na próxima parte: o marcador fica, para extract_brl_estimate
+        if current_text.endswith(('(', '≈', '$')):
+            return current_text + next_text
         # Se o próximo texto começa com parênteses ou ≈, adiciona espaço
         if next_text.startswith('(') or next_text.startswith('≈'):
             return current_text + ' ' + next_text
@@ -243,56 +256,562 @@ def clean_table_row(row):
     
     return cleaned_row
 
-def novadax_pdf_to_csv(pdf_path="novadax.pdf", csv_path="extrato_novadax.csv"):
+def parse_date_bound(value, end_of_day=False):
     """
-    Extrai tabelas do PDF da Novadax e salva em CSV.
+    Interpreta um limite de data ('YYYY-MM-DD' ou 'DD/MM/YYYY', com hora
+    opcional). Sem hora, 'end_of_day' faz o limite valer até o fim do dia.
+    Aceita também datetime (retornado como está) e None.
     """
-    with pdfplumber.open(pdf_path) as pdf:
-        all_raw_rows = []
-        
-        for i, page in enumerate(pdf.pages):
+    if value is None or isinstance(value, datetime):
+        return value
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            date = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return date + timedelta(days=1, microseconds=-1) if end_of_day else date
+    raise ValueError(f"Data inválida: {value} (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+def parse_page_ranges(spec):
+    """
+    Interpreta uma seleção de páginas como '1-3,5,10-' (numeradas a partir
+    de 1; '10-' vai até o fim). Retorna lista de (início, fim ou None).
+    """
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition('-')
+        try:
+            first = int(start) if start else 1
+            last = (int(end) if end else None) if sep else first
+        except ValueError:
+            raise ValueError(f"Seleção de páginas inválida: {spec}")
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Seleção de páginas inválida: {spec}")
+        ranges.append((first, last))
+    return ranges
+
+def page_in_ranges(page_number, ranges):
+    """
+    Verifica se a página (a partir de 1) está na seleção.
+    """
+    return any(first <= page_number and (last is None or page_number <= last)
+               for first, last in ranges)
+
+def parse_row_date(text):
+    """
+    Retorna a data/hora da primeira data 'DD/MM/YYYY HH:MM:SS' do texto.
+    """
+    match = DATE_PATTERN.search(str(text))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(0), "%d/%m/%Y %H:%M:%S")
+    except ValueError:
+        return None
+
+def probe_page_dates(page):
+    """
+    Sonda barata da página: lê só o texto (sem montar tabelas) e retorna a
+    primeira e a última data de transação. (None, None) indica uma página
+    sem transações (capa, resumo).
+    """
+    dates = [parse_row_date(match) for match in DATE_PATTERN.findall(page.extract_text() or "")]
+    dates = [date for date in dates if date is not None]
+    if not dates:
+        return None, None
+    return dates[0], dates[-1]
+
+NOVADAX_CSV_HEADER = ["Data", "Tipo", "Moeda", "Valor", "Status"]
+
+# Assinatura de arquivos PDF; a especificação permite lixo antes dela no
+# primeiro KB
+PDF_MAGIC = b"%PDF"
+PDF_MAGIC_WINDOW = 1024
+
+def is_pdf_data(head: bytes) -> bool:
+    """
+    Verifica pelos primeiros bytes se o conteúdo é um PDF.
+    """
+    return PDF_MAGIC in head[:PDF_MAGIC_WINDOW]
+
+def _open_pdf(pdf_source):
+    """
+    Abre o PDF com o pdfplumber a partir de um caminho, bytes ou arquivo
+    aberto em modo binário.
+    """
+    # Importado aqui para que conversões só de CSV não carreguem o pdfplumber
+    try:
+        import pdfplumber
+    except ImportError:
+        raise ImportError(
+            "O processamento de PDF requer o pdfplumber. "
+            "Instale com: pip install novadax-koinly[pdf]"
+        )
+
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        pdf_source = io.BytesIO(bytes(pdf_source))
+    return pdfplumber.open(pdf_source)
+
+def _close_page(page):
+    """
+    Libera o cache de layout da página já processada, para que a memória
+    não cresça com o número de páginas.
+    """
+    close = getattr(page, 'close', None) or getattr(page, 'flush_cache', None)
+    if close:
+        close()
+
+# Estratégias de extração: as tabelas pelas linhas desenhadas (fiel, mas
+# pode levar minutos em páginas densas ou com gráficos soltos) e o
+# agrupamento de palavras pela posição (barato, usado como alternativa)
+EXTRACT_TABLES = "tables"
+EXTRACT_WORDS = "words"
+
+# Limite de tempo por página sugerido para a linha de comando, em segundos
+DEFAULT_PAGE_TIMEOUT = 60
+
+# Distância vertical máxima, em pontos, entre palavras da mesma linha
+LINE_TOLERANCE = 3
+
+def _header_columns(lines):
+    """
+    Procura a linha de cabeçalho (Data, Tipo, Moeda, Valor, Status) entre as
+    linhas de palavras. Retorna (índice da linha, limites entre colunas) ou
+    (None, None). Cada limite fica no meio do espaço entre dois títulos.
+    """
+    names = [name.lower() for name in NOVADAX_CSV_HEADER]
+    for index, (_, words) in enumerate(lines):
+        found = {}
+        for word in words:
+            text = normalize_text(word['text']).lower()
+            if text in names and text not in found:
+                found[text] = word
+        if len(found) == len(names):
+            titles = [found[name] for name in names]
+            return index, [(left['x1'] + right['x0']) / 2 for left, right in zip(titles, titles[1:])]
+    return None, None
+
+def _word_lines(page):
+    """
+    Agrupa as palavras da página em linhas pela posição vertical.
+    """
+    lines = []
+    for word in sorted(page.extract_words(), key=lambda w: w['top']):
+        if lines and word['top'] - lines[-1][0] <= LINE_TOLERANCE:
+            lines[-1][1].append(word)
+        else:
+            lines.append((word['top'], [word]))
+    return lines
+
+def extract_word_rows(page, columns=None, first_page=None):
+    """
+    Extração barata de tabelas, usada quando extract_tables passa do limite
+    de tempo: as palavras são agrupadas em linhas pela posição vertical e
+    em colunas pelos títulos do cabeçalho. Retorna (tabelas no formato de
+    extract_tables, limites entre colunas).
+
+    Páginas sem cabeçalho usam os limites de uma página anterior
+    ('columns') ou, na falta deles, os do cabeçalho de 'first_page'.
+    """
+    lines = _word_lines(page)
+    header, found = _header_columns(lines)
+    if header is not None:
+        # O que vem antes do cabeçalho é título da página, não tabela
+        lines, columns = lines[header:], found
+    elif columns is None and first_page is not None:
+        columns = _header_columns(_word_lines(first_page))[1]
+    if columns is None:
+        return [], None
+
+    rows = []
+    for _, words in lines:
+        cells = [[] for _ in range(len(columns) + 1)]
+        for word in sorted(words, key=lambda w: w['x0']):
+            column = sum(1 for limit in columns if word['x0'] >= limit)
+            cells[column].append(word['text'])
+        rows.append([" ".join(cell) if cell else None for cell in cells])
+    return [rows], columns
+
+def _extract_page(pdf, index, mode, columns=None):
+    """
+    Extrai as tabelas da página 'index' com a estratégia 'mode'. Para
+    EXTRACT_WORDS retorna também os limites entre colunas.
+    """
+    page = pdf.pages[index]
+    try:
+        if mode == EXTRACT_TABLES:
+            return page.extract_tables()
+        return extract_word_rows(page, columns, pdf.pages[0] if index else None)
+    finally:
+        _close_page(page)
+
+def _page_worker(pdf_source, conn, parent_conn=None):
+    """
+    Processo auxiliar de PageExtractor: abre o PDF uma vez e atende pedidos
+    (página, estratégia, colunas) até receber None ou até o processo que o
+    criou terminar.
+    """
+    if parent_conn is not None:
+        # A ponta herdada do processo pai precisa ser fechada aqui; senão
+        # recv() nunca vê o fim da conexão quando o pai morre
+        parent_conn.close()
+    try:
+        pdf = _open_pdf(pdf_source)
+    except Exception as e:
+        conn.send(("error", e))
+        return
+    conn.send(("ready", None))
+
+    with pdf:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            try:
+                result = ("ok", _extract_page(pdf, *request))
+            except Exception as e:
+                result = ("error", e)
+            try:
+                conn.send(result)
+            except (BrokenPipeError, ConnectionResetError):
+                break  # O processo que pediu a página terminou
+            except Exception as e:  # Exceção que não pode ser serializada
+                conn.send(("error", RuntimeError(f"{result[1]!r} ({e})")))
+
+def process_context():
+    """
+    Contexto do multiprocessing para os processos filhos da conversão
+    (extração do PDF, pipeline, conversão em paralelo). Usa 'spawn': a
+    conversão pode rodar em uma thread (veja aio), e um fork de um processo
+    com várias threads pode travar o filho em uma trava que outra thread
+    segurava.
+    """
+    import multiprocessing
+
+    return multiprocessing.get_context('spawn')
+
+class PageExtractor:
+    """
+    Extrai páginas em um processo separado, com limite de tempo por página.
+    Quando uma página passa do limite, o processo é encerrado (e recriado
+    no pedido seguinte), para que uma página patológica não trave o
+    extrato inteiro. Abrir o PDF no processo não conta no limite.
+    """
+    def __init__(self, pdf_source, timeout):
+        self.pdf_source = pdf_source
+        self.timeout = timeout
+        self.process = None
+        self.conn = None
+
+    def _start(self):
+        context = process_context()
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_page_worker, args=(self.pdf_source, child, self.conn), daemon=True
+        )
+        self.process.start()
+        child.close()
+        try:
+            status, error = self.conn.recv()
+        except EOFError:
+            status, error = "error", RuntimeError("o processo de extração terminou ao abrir o PDF")
+        if status == "error":
+            self._stop()
+            raise error
+
+    def _stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+            self.process = None
+
+    def extract(self, index, mode=EXTRACT_TABLES, columns=None):
+        """
+        Extrai a página 'index' (a partir de 0) como _extract_page. Retorna
+        None se o limite de tempo estourou ou o processo morreu.
+        """
+        if self.process is None:
+            self._start()
+        self.conn.send((index, mode, columns))
+        try:
+            if not self.conn.poll(self.timeout):
+                self._stop()
+                return None
+            status, value = self.conn.recv()
+        except EOFError:
+            self._stop()
+            return None
+        if status == "error":
+            raise value
+        return value
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=1)
+            except (BrokenPipeError, OSError):
+                pass
+            self._stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_raw_rows(pdf, since=None, until=None, page_ranges=None, stats=None, verbose=False,
+                  extractor=None, on_page=None):
+    """
+    Percorre as páginas do PDF e gera (linha bruta da tabela, página).
+
+    'since'/'until' restringem as transações a um período e 'page_ranges' a
+    uma seleção de páginas. Antes da extração de tabelas, que é cara, cada
+    página passa por uma sonda de texto: páginas sem transações ou fora do
+    período são puladas, e a leitura para assim que a ordem do extrato
+    mostra que nenhuma página seguinte pode estar no período.
+
+    Com um 'extractor' (PageExtractor), a extração de cada página tem limite
+    de tempo. Páginas que passam do limite são refeitas por agrupamento de
+    palavras e anotadas em stats["slow_pages"]; as que passam do limite
+    também na alternativa são puladas e anotadas em stats["lost_pages"].
+
+    'on_page(páginas_lidas, total_de_páginas)' é chamado antes de cada
+    página e no fim da leitura (veja progress.Progress.page_done).
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped_pages", 0)
+    stats.setdefault("slow_pages", [])
+    stats.setdefault("lost_pages", [])
+    columns = None  # Limites entre colunas da última extração por palavras
+    stats["total_pages"] = len(pdf.pages)
+    descending = None  # Ordem do extrato, descoberta pelas sondas
+    previous_last = None
+
+    for i, page in enumerate(pdf.pages):
+        if on_page is not None:
+            on_page(i, len(pdf.pages))
+        if page_ranges and not page_in_ranges(i + 1, page_ranges):
+            stats["skipped_pages"] += 1
+            continue
+
+        if since or until:
+            first, last = probe_page_dates(page)
+            if first is None:
+                if verbose:
+                    print(f"Página {i+1} sem transações, pulando...")
+                stats["skipped_pages"] += 1
+                _close_page(page)
+                continue
+
+            if descending is None:
+                if first != last:
+                    descending = first > last
+                elif previous_last is not None and previous_last != first:
+                    descending = previous_last > first
+            previous_last = last
+
+            oldest, newest = (last, first) if descending else (first, last)
+            if (since and newest < since) or (until and oldest > until):
+                stats["skipped_pages"] += 1
+                _close_page(page)
+                # Páginas seguintes são ainda mais antigas (ou mais novas)
+                if descending is not None and (
+                    (descending and since and newest < since) or
+                    (not descending and until and oldest > until)
+                ):
+                    if verbose:
+                        print(f"Página {i+1} fora do período, encerrando a leitura.")
+                    stats["skipped_pages"] += len(pdf.pages) - i - 1
+                    break
+                continue
+
+        if verbose:
             print(f"Processando página {i+1} de {len(pdf.pages)}...")
+        if extractor is None:
             tables = page.extract_tables()
-            
-            for table in tables:
-                # Filtra linhas vazias e linhas de histórico
-                for row in table:
-                    if row and any(cell is not None and str(cell).strip() != "" for cell in row):
-                        # Ignora explicitamente linhas com "Histórico:"
-                        if not any("historico:" in str(cell).lower() for cell in row):
-                            all_raw_rows.append(row)
-        
-        print("Combinando linhas quebradas...")
-        
-        # Processa as linhas
-        transactions = []
-        idx = 0
-        while idx < len(all_raw_rows):
-            row, next_idx = extract_complete_row(all_raw_rows, idx)
-            if row and is_date_format(row[0]):  # Garante que só aceita linhas que começam com data
-                cleaned_row = clean_table_row(row)
-                if len(cleaned_row) >= 4:  # Garante que tem pelo menos data, tipo, moeda e valor
-                    transactions.append(cleaned_row)
-            idx = next_idx
-        
-        # Define o cabeçalho
-        header = ["Data", "Tipo", "Moeda", "Valor", "Status"]
-        
-        # Cria o CSV
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(header)
-            
-            for row in transactions:
-                # Ajusta o número de colunas
-                while len(row) < len(header):
-                    row.append("")
-                writer.writerow(row[:len(header)])
-        
-        print(f"Extração concluída! Arquivo CSV salvo em: {csv_path}")
-        print(f"Total de transações extraídas: {len(transactions)}")
-        
-        return {
-            "total_rows": len(transactions),
-            "csv_path": csv_path
-        } 
\ No newline at end of file
+        else:
+            tables = extractor.extract(i)
+            if tables is None:
+                stats["slow_pages"].append(i + 1)
+                if verbose:
+                    print(f"Página {i+1} passou de {extractor.timeout}s, "
+                          "refazendo por agrupamento de palavras...")
+                result = extractor.extract(i, EXTRACT_WORDS, columns)
+                if result is None:
+                    stats["lost_pages"].append(i + 1)
+                    stats["skipped_pages"] += 1
+                    if verbose:
+                        print(f"Página {i+1} passou do limite também na alternativa, pulando...")
+                    tables = []
+                else:
+                    tables, columns = result[0], result[1] or columns
+        _close_page(page)
+
+        for table in tables:
+            # Filtra linhas vazias e linhas de histórico
+            for row in table:
+                if row and any(cell is not None and str(cell).strip() != "" for cell in row):
+                    # Ignora explicitamente linhas com "Histórico:"
+                    if not any("historico:" in str(cell).lower() for cell in row):
+                        yield row, i + 1
+
+    if on_page is not None:
+        on_page(len(pdf.pages), len(pdf.pages))
+
+def assemble_rows(raw_rows):
+    """
+    Versão em streaming de extract_complete_row: combina as linhas quebradas
+    de cada transação à medida que chegam e gera (linha completa, página da
+    primeira parte). Linhas soltas que não começam com data são ignoradas.
+    """
+    current_row = None
+    current_page = None
+    for row, page in raw_rows:
+        if current_row is not None and should_combine_rows(current_row, row):
+            # Combina as células
+            for i in range(min(len(current_row), len(row))):
+                if row[i] and str(row[i]).strip():
+                    current_row[i] = combine_row_cells(current_row[i], row[i])
+
+            # Se a próxima linha tem mais células, adiciona as extras
+            if len(row) > len(current_row):
+                current_row.extend(row[len(current_row):])
+            continue
+
+        if current_row is not None:
+            yield current_row, current_page
+            current_row = None
+
+        # Só uma linha que começa com data inicia uma transação
+        if row and row[0] and is_date_format(str(row[0]).strip()):
+            current_row, current_page = list(row), page
+
+    if current_row is not None:
+        yield current_row, current_page
+
+def iter_pdf_transactions(pdf_source, since=None, until=None, pages=None, stats=None, verbose=False,
+                          page_timeout=None, pipelined=False, on_page=None):
+    """
+    Extrai as transações do PDF da Novadax sem gravar arquivos, gerando
+    linhas no formato do CSV extraído: Data, Tipo, Moeda, Valor, Status e a
+    página de origem. Aceita caminho, bytes ou arquivo binário aberto.
+    Veja iter_raw_rows para since/until/pages.
+
+    'page_timeout' (segundos) limita o tempo de extração de cada página,
+    que passa a ser feita em um processo separado (veja PageExtractor).
+
+    Com pipelined=True, as páginas são extraídas em um processo produtor
+    enquanto as linhas já extraídas são juntadas, limpas e consumidas
+    (veja pipeline.iter_raw_rows_pipelined).
+
+    'on_page' acompanha as páginas lidas (veja iter_raw_rows).
+    """
+    since = parse_date_bound(since)
+    until = parse_date_bound(until, end_of_day=True)
+    page_ranges = parse_page_ranges(pages) if isinstance(pages, str) else pages
+    stats = stats if stats is not None else {}
+    stats.setdefault("total_rows", 0)
+
+    if (page_timeout or pipelined) and hasattr(pdf_source, 'read'):
+        # O processo de extração precisa abrir o PDF por conta própria
+        pdf_source = pdf_source.read()
+
+    if pipelined:
+        from .pipeline import iter_raw_rows_pipelined
+        raw_rows = iter_raw_rows_pipelined(pdf_source, since, until, page_ranges, stats, verbose,
+                                           page_timeout, on_page=on_page)
+        yield from _clean_transactions(raw_rows, since, until, stats)
+        return
+
+    extractor = PageExtractor(pdf_source, page_timeout) if page_timeout else contextlib.nullcontext()
+    with _open_pdf(pdf_source) as pdf, extractor:
+        raw_rows = iter_raw_rows(pdf, since, until, page_ranges, stats, verbose,
+                                 extractor if page_timeout else None, on_page)
+        yield from _clean_transactions(raw_rows, since, until, stats)
+
+def _clean_transactions(raw_rows, since, until, stats):
+    """
+    Junta as linhas quebradas, descarta o que não é transação (ou está fora
+    do período) e limpa as células; veja iter_pdf_transactions.
+    """
+    for row, page in assemble_rows(raw_rows):
+        if not is_date_format(row[0]):  # Garante que só aceita linhas que começam com data
+            continue
+        if since or until:
+            row_date = parse_row_date(row[0])
+            if row_date and ((since and row_date < since) or (until and row_date > until)):
+                continue
+        cleaned_row = clean_table_row(row)
+        if len(cleaned_row) < 4:  # Garante que tem pelo menos data, tipo, moeda e valor
+            continue
+
+        # Ajusta o número de colunas
+        while len(cleaned_row) < len(NOVADAX_CSV_HEADER):
+            cleaned_row.append("")
+        stats["total_rows"] += 1
+        yield cleaned_row[:len(NOVADAX_CSV_HEADER)] + [page]
+
+def iter_pdf_to_csv(pdf_path, csv_path, since=None, until=None, pages=None, stats=None,
+                    page_timeout=None, pipelined=False, verbose=True, on_page=None):
+    """
+    Extrai as transações do PDF e grava o CSV, gerando cada linha logo
+    depois de gravá-la: a conversão pode consumir as linhas enquanto a
+    extração continua, sem esperar o CSV completo. Veja
+    iter_pdf_transactions para os demais parâmetros.
+    """
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(NOVADAX_CSV_HEADER + ["Pagina"])
+        for row in iter_pdf_transactions(pdf_path, since, until, pages, stats, verbose=verbose,
+                                         page_timeout=page_timeout, pipelined=pipelined,
+                                         on_page=on_page):
+            writer.writerow(row)
+            yield row
+
+def extraction_summary(csv_path, stats):
+    """
+    Exibe o resumo da extração e o retorna como dicionário.
+    """
+    print(f"Extração concluída! Arquivo CSV salvo em: {csv_path}")
+    print(f"Total de transações extraídas: {stats['total_rows']}")
+    if stats["skipped_pages"]:
+        print(f"Páginas puladas: {stats['skipped_pages']} de {stats['total_pages']}")
+    if stats["slow_pages"]:
+        print(f"Páginas acima do limite de tempo: {', '.join(map(str, stats['slow_pages']))}")
+    if stats["lost_pages"]:
+        print(f"Páginas não extraídas nem na alternativa: {', '.join(map(str, stats['lost_pages']))}")
+
+    return {
+        "total_rows": stats["total_rows"],
+        "csv_path": csv_path,
+        "skipped_pages": stats["skipped_pages"],
+        "slow_pages": stats["slow_pages"],
+        "lost_pages": stats["lost_pages"],
+    }
+
+def novadax_pdf_to_csv(pdf_path="novadax.pdf", csv_path="extrato_novadax.csv",
+                       since=None, until=None, pages=None, page_timeout=None):
+    """
+    Extrai tabelas do PDF da Novadax e salva em CSV.
+
+    A coluna Pagina é ignorada na conversão, mas identifica a origem das
+    linhas rejeitadas. Veja iter_pdf_transactions para
+    since/until/pages/page_timeout.
+    """
+    stats = {}
+    for _ in iter_pdf_to_csv(pdf_path, csv_path, since, until, pages, stats, page_timeout):
+        pass
+    return extraction_summary(csv_path, stats)
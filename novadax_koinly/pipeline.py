@@ -0,0 +1,216 @@
+"""
+Pipeline interno da conversão, com filas limitadas entre os estágios:
+
+    páginas do PDF (processo produtor)
+        -> junção, limpeza e conversão das linhas (processo principal)
+        -> gravação do CSV (thread de escrita)
+
+Cada estágio trabalha enquanto os outros trabalham, então o tempo total
+tende ao do estágio mais lento, e não à soma de todos. As filas são
+limitadas: um estágio rápido espera o seguinte (backpressure) em vez de
+acumular o extrato inteiro na memória.
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+
+from .converter import serialize_rows
+from .pdf_converter import PageExtractor, _open_pdf, iter_raw_rows, process_context
+
+# Páginas extraídas que podem esperar pela conversão
+DEFAULT_QUEUE_PAGES = 8
+
+# Linhas por lote enviado à thread de escrita, e lotes que podem esperar
+DEFAULT_WRITE_BATCH = 512
+DEFAULT_QUEUE_BATCHES = 16
+
+# Intervalo, em segundos, para conferir se o produtor ainda está vivo
+_PRODUCER_POLL = 1
+
+def pipeline_enabled() -> bool:
+    """
+    O pipeline só compensa com mais de um processador disponível: com um
+    só, os estágios se revezam na mesma CPU e as filas são custo extra.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) > 1
+    return (os.cpu_count() or 1) > 1
+
+class _ConsumerGone(Exception):
+    """
+    O processo principal terminou sem ler o resto das páginas.
+    """
+
+def _put(pages_queue, item):
+    """
+    Envia um item ao consumidor, esperando enquanto a fila estiver cheia,
+    mas desiste se o processo principal tiver terminado (ex.: a saída foi
+    fechada por um 'head' e ninguém mais vai ler a fila).
+    """
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            pages_queue.put(item, timeout=_PRODUCER_POLL)
+            return
+        except queue.Full:
+            if parent is not None and not parent.is_alive():
+                raise _ConsumerGone()
+
+def _page_producer(pdf_source, since, until, page_ranges, verbose, page_timeout,
+                   messages_to_stderr, report_pages, pages_queue):
+    """
+    Processo produtor: percorre o PDF com iter_raw_rows e envia as linhas de
+    cada página como um lote. Com report_pages, envia também ("page",
+    (lidas, total)) a cada página. Termina com ("done", stats) ou ("error",
+    exc).
+    """
+    if messages_to_stderr:
+        # Com a saída padrão ocupada pelo CSV, as mensagens vão para stderr
+        sys.stdout = sys.stderr
+    stats = {}
+    try:
+        extractor = PageExtractor(pdf_source, page_timeout) if page_timeout else None
+        try:
+            with _open_pdf(pdf_source) as pdf:
+                batch, current_page = [], None
+
+                def on_page(done, total):
+                    # As linhas das páginas anteriores vão antes do aviso
+                    nonlocal batch
+                    if batch:
+                        _put(pages_queue, batch)
+                        batch = []
+                    _put(pages_queue, ("page", (done, total)))
+
+                for row, page in iter_raw_rows(pdf, since, until, page_ranges, stats, verbose,
+                                               extractor, on_page if report_pages else None):
+                    if page != current_page and batch:
+                        _put(pages_queue, batch)
+                        batch = []
+                    current_page = page
+                    batch.append((row, page))
+                if batch:
+                    _put(pages_queue, batch)
+        finally:
+            if extractor is not None:
+                extractor.close()
+        _put(pages_queue, ("done", stats))
+    except _ConsumerGone:
+        # O que ficou no buffer da fila não tem mais quem leia
+        pages_queue.cancel_join_thread()
+    except BaseException as e:
+        try:
+            _put(pages_queue, ("error", e))
+        except _ConsumerGone:
+            pages_queue.cancel_join_thread()
+
+def iter_raw_rows_pipelined(pdf_source, since=None, until=None, page_ranges=None, stats=None,
+                            verbose=False, page_timeout=None, queue_pages=DEFAULT_QUEUE_PAGES,
+                            on_page=None):
+    """
+    Como iter_raw_rows, mas as páginas são extraídas em um processo
+    produtor, até 'queue_pages' páginas à frente de quem consome. Os
+    contadores de páginas chegam em 'stats' no fim da extração; 'on_page'
+    é chamado aqui, à medida que as linhas de cada página são consumidas.
+    Se o consumo parar antes do fim, o produtor é encerrado.
+    """
+    stats = stats if stats is not None else {}
+    context = process_context()
+    pages_queue = context.Queue(maxsize=queue_pages)
+    # Não é daemon: com limite de tempo, o produtor cria o processo de
+    # extração (veja PageExtractor)
+    producer = context.Process(
+        target=_page_producer,
+        args=(pdf_source, since, until, page_ranges, verbose, page_timeout,
+              sys.stdout is sys.stderr, on_page is not None, pages_queue),
+    )
+    producer.start()
+    # Se o gerador não for fechado antes de o programa sair (ex.: Ctrl-C
+    # durante a conversão), o multiprocessing esperaria pelo produtor, que
+    # espera alguém ler a fila; registrado depois, este encerramento roda antes
+    atexit.register(producer.terminate)
+    finished = False
+    try:
+        while True:
+            try:
+                item = pages_queue.get(timeout=_PRODUCER_POLL)
+            except queue.Empty:
+                if not producer.is_alive():
+                    raise RuntimeError("O processo de extração do PDF terminou inesperadamente")
+                continue
+            if isinstance(item, tuple):
+                kind, value = item
+                if kind == "page":
+                    on_page(*value)
+                    continue
+                if kind == "error":
+                    raise value
+                stats.update(value)
+                finished = True
+                break
+            yield from item
+    finally:
+        atexit.unregister(producer.terminate)
+        if not finished:
+            producer.terminate()
+        producer.join()
+
+class BackgroundWriter:
+    """
+    Grava linhas CSV em uma thread separada. As linhas são agrupadas em
+    lotes de 'batch_rows' e passam por uma fila de até 'queue_batches'
+    lotes; com a fila cheia, writerow espera a gravação (backpressure).
+    Erros de escrita são relançados em close().
+    """
+
+    def __init__(self, outfile, batch_rows=DEFAULT_WRITE_BATCH, queue_batches=DEFAULT_QUEUE_BATCHES):
+        self.outfile = outfile
+        self.batch_rows = batch_rows
+        self._batch = []
+        self._queue = queue.Queue(maxsize=queue_batches)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="novadax-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            if self._error is None:
+                try:
+                    self.outfile.write(serialize_rows(batch))
+                except BaseException as e:
+                    # Continua consumindo a fila para não travar quem grava
+                    self._error = e
+
+    def writerow(self, row):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_rows:
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        if self._thread is None:
+            return
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
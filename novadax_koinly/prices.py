@@ -0,0 +1,116 @@
+import csv
+import os
+from bisect import bisect_right
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Formatos de data aceitos no arquivo de preços
+PRICE_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+
+NET_WORTH_CURRENCY = "BRL"
+
+class PriceIndex:
+    """
+    Índice de preços históricos em BRL. Para cada ativo guarda as datas em
+    ordem crescente e os preços correspondentes, permitindo busca binária
+    pelo último preço conhecido até uma data.
+    """
+    __slots__ = ('_dates', '_prices')
+
+    def __init__(self, series: Dict[str, List[Tuple[datetime, Decimal]]]):
+        self._dates = {}
+        self._prices = {}
+        for asset, points in series.items():
+            points.sort(key=lambda point: point[0])
+            self._dates[asset] = [date for date, _ in points]
+            self._prices[asset] = [price for _, price in points]
+
+    def __contains__(self, asset: str) -> bool:
+        return asset in self._dates
+
+    def price_at(self, asset: str, date: datetime) -> Optional[Decimal]:
+        """
+        Retorna o preço em BRL do ativo na data (último preço conhecido até
+        ela), ou None se não houver preço anterior à data.
+        """
+        dates = self._dates.get(asset)
+        if not dates:
+            return None
+        idx = bisect_right(dates, date)
+        if idx == 0:
+            return None
+        return self._prices[asset][idx - 1]
+
+def _parse_price_date(text: str) -> Optional[datetime]:
+    for fmt in PRICE_DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+@lru_cache(maxsize=None)
+def _load_price_index(path: str, mtime: float) -> PriceIndex:
+    series = {}
+    with open(path, mode='r', encoding='utf-8') as infile:
+        reader = csv.reader(infile)
+        next(reader, None)  # Cabeçalho: Date,Asset,Price
+        for row in reader:
+            if len(row) < 3:
+                continue
+            date = _parse_price_date(row[0])
+            try:
+                price = Decimal(row[2].strip())
+            except InvalidOperation:
+                continue
+            if date is None:
+                continue
+            series.setdefault(row[1].strip().upper(), []).append((date, price))
+    return PriceIndex(series)
+
+def load_price_index(path: str) -> PriceIndex:
+    """
+    Carrega o arquivo de preços históricos (CSV com colunas Date, Asset e
+    Price em BRL). O índice é mantido em cache enquanto o arquivo não mudar.
+    """
+    return _load_price_index(os.path.abspath(path), os.path.getmtime(path))
+
+def estimate_net_worth(record, price_index: Optional[PriceIndex]) -> Optional[Decimal]:
+    """
+    Calcula o valor em BRL de uma transação sem estimativa própria: usa o
+    valor em reais quando um dos lados é BRL, senão o preço histórico do
+    ativo recebido, enviado ou da taxa (nessa ordem).
+    """
+    legs = (
+        (record.received_amount, record.received_currency),
+        (record.sent_amount, record.sent_currency),
+        (record.fee_amount, record.fee_currency),
+    )
+    for amount, currency in legs:
+        if amount is not None and currency.upper() == NET_WORTH_CURRENCY:
+            return amount
+
+    if price_index is None or record.date is None:
+        return None
+
+    for amount, currency in legs:
+        if amount is None:
+            continue
+        price = price_index.price_at(currency.upper(), record.date)
+        if price is not None:
+            return (amount * price).quantize(Decimal("0.01"))
+    return None
+
+def fill_net_worth(records, price_index: Optional[PriceIndex] = None):
+    """
+    Preenche as colunas Net Worth das transações que não trouxeram a
+    estimativa '(≈R$...)' do extrato.
+    """
+    for record in records:
+        if record.net_worth_amount is None:
+            record.net_worth_amount = estimate_net_worth(record, price_index)
+        if record.net_worth_amount is not None:
+            record.net_worth_currency = NET_WORTH_CURRENCY
+        yield record
@@ -0,0 +1,229 @@
+"""
+Acompanhamento de conversões longas: progresso (páginas e linhas lidas,
+velocidade e tempo restante estimado) e cancelamento cooperativo.
+
+Os pontos de checagem ficam entre as páginas do PDF e a cada lote de
+linhas. Sem um Progress, a conversão não passa por nenhum deles.
+"""
+import logging
+import sys
+import threading
+import time
+
+# Intervalo mínimo entre dois avisos ao callback, em segundos
+DEFAULT_INTERVAL = 0.5
+
+# Linhas entre dois pontos de checagem
+ROW_BATCH = 100
+
+_CHUNK_BYTES = 1024 * 1024
+
+class ConversionCancelled(Exception):
+    """
+    A conversão foi interrompida por um CancelToken (ou pelo callback).
+    """
+
+class CancelToken:
+    """
+    Pedido de cancelamento, que pode vir de outra thread. A conversão para
+    no próximo ponto de checagem com ConversionCancelled; os arquivos que
+    estavam sendo gravados ficam incompletos.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise ConversionCancelled("Conversão cancelada")
+
+def count_lines(path) -> int:
+    """
+    Linhas do CSV sem o cabeçalho, contadas pelas quebras de linha: uma
+    estimativa do total de linhas do extrato, para o tempo restante.
+    """
+    lines, last = 0, b"\n"
+    with open(path, mode='rb') as infile:
+        for chunk in iter(lambda: infile.read(_CHUNK_BYTES), b""):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        lines += 1  # Última linha sem quebra
+    return max(lines - 1, 0)
+
+def _format_count(value: float) -> str:
+    return f"{value:,.0f}".replace(",", ".")
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class Progress:
+    """
+    Progresso de uma conversão. 'callback' é chamado no máximo a cada
+    'interval' segundos, e uma última vez no fim, com um dicionário:
+
+        pages_done, total_pages   páginas do PDF já lidas (total None fora do PDF)
+        rows_done, total_rows     linhas do extrato já lidas e o total, se conhecido
+        elapsed                   segundos desde o início
+        rows_per_second           velocidade desde o aviso anterior (no fim, a média)
+        fraction                  fração concluída, de 0 a 1, ou None
+        eta                       segundos restantes estimados, ou None
+        done                      True no último aviso
+
+    'cancel' (CancelToken) é checado nos mesmos pontos; o callback também
+    pode interromper a conversão levantando ConversionCancelled.
+    """
+
+    def __init__(self, callback=None, interval=DEFAULT_INTERVAL, cancel=None, total_rows=None):
+        self.callback = callback
+        self.interval = interval
+        self.cancel = cancel
+        self.total_rows = total_rows
+        self.pages_done = 0
+        self.total_pages = None
+        self.rows_done = 0
+        self._start = self._last_time = time.monotonic()
+        self._next_report = self._start + interval
+        self._last_rows = 0
+
+    def page_done(self, pages_done: int, total_pages: int) -> None:
+        """
+        Ponto de checagem entre páginas do PDF (veja
+        pdf_converter.iter_raw_rows, parâmetro on_page).
+        """
+        self.pages_done, self.total_pages = pages_done, total_pages
+        self.checkpoint()
+
+    def track(self, items, stats=None, batch=ROW_BATCH):
+        """
+        Repassa 'items' (linhas do extrato ou registros convertidos) com um
+        ponto de checagem a cada 'batch' itens. Com 'stats' (veja
+        converter.new_stats), as linhas lidas vêm de stats['total_rows'];
+        senão, cada item conta como uma linha.
+        """
+        base, count = self.rows_done, 0
+        for count, item in enumerate(items, 1):
+            yield item
+            if not count % batch:
+                self.rows_done = stats['total_rows'] if stats is not None else base + count
+                self.checkpoint()
+        self.rows_done = stats['total_rows'] if stats is not None else base + count
+
+    def checkpoint(self) -> None:
+        """
+        Checa o cancelamento e, se já passou o intervalo, avisa o callback.
+        """
+        if self.cancel is not None:
+            self.cancel.check()
+        if self.callback is not None:
+            now = time.monotonic()
+            if now >= self._next_report:
+                self._report(now)
+
+    def fraction(self):
+        if self.total_pages:
+            return self.pages_done / self.total_pages
+        if self.total_rows:
+            return min(self.rows_done / self.total_rows, 1.0)
+        return None
+
+    def finish(self) -> None:
+        """
+        Último aviso, com a conversão concluída.
+        """
+        if self.callback is not None:
+            self._report(time.monotonic(), done=True)
+
+    def _report(self, now: float, done: bool = False) -> None:
+        elapsed = now - self._start
+        if done:
+            fraction, eta = 1.0, 0.0
+            rate = self.rows_done / elapsed if elapsed > 0 else 0.0
+        else:
+            window = now - self._last_time
+            rate = (self.rows_done - self._last_rows) / window if window > 0 else 0.0
+            fraction, eta = self.fraction(), None
+            if self.total_pages is None and self.total_rows and rate > 0:
+                eta = max(self.total_rows - self.rows_done, 0) / rate
+            elif fraction:
+                eta = elapsed * (1 - fraction) / fraction
+
+        self._last_time, self._last_rows = now, self.rows_done
+        self._next_report = now + self.interval
+        self.callback({
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "rows_done": self.rows_done,
+            "total_rows": self.total_rows,
+            "elapsed": elapsed,
+            "rows_per_second": rate,
+            "fraction": fraction,
+            "eta": eta,
+            "done": done,
+        })
+
+class ProgressLine:
+    """
+    Callback de Progress que mostra o progresso em uma única linha do
+    terminal ('stream', padrão sys.stderr), reescrita a cada aviso:
+
+        páginas 12/86 | 3.456 linhas | 1.234 linhas/s | 14% | faltam 0:42
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._width = 0
+
+    def __call__(self, info: dict) -> None:
+        parts = []
+        if info["total_pages"]:
+            parts.append(f"páginas {info['pages_done']}/{info['total_pages']}")
+        parts.append(f"{_format_count(info['rows_done'])} linhas")
+        parts.append(f"{_format_count(info['rows_per_second'])} linhas/s")
+        if info["fraction"] is not None:
+            parts.append(f"{info['fraction']:.0%}")
+        if info["done"]:
+            parts.append(f"em {_format_duration(info['elapsed'])}")
+        elif info["eta"] is not None:
+            parts.append(f"faltam {_format_duration(info['eta'])}")
+
+        text = " | ".join(parts)
+        self.stream.write("\r" + text.ljust(self._width))
+        self._width = len(text)
+        if info["done"]:
+            self.stream.write("\n")
+            self._width = 0
+        self.stream.flush()
+
+    def clear(self) -> None:
+        """
+        Apaga a linha de progresso, se houver uma na tela.
+        """
+        if self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self.stream.flush()
+            self._width = 0
+
+    def quiet_logging(self) -> None:
+        """
+        Deixa no terminal só os avisos e erros do logging, que apagam a linha
+        de progresso antes de aparecer; o registro de cada transação continua
+        no arquivo de log (veja converter.configure_logging).
+        """
+        for handler in logging.getLogger().handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setLevel(logging.WARNING)
+                handler.addFilter(self._before_log)
+
+    def _before_log(self, record) -> bool:
+        self.clear()
+        return True
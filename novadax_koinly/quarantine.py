@@ -0,0 +1,172 @@
+import csv
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+from .assets import apply_asset_ids, load_asset_ids
+from .converter import (
+    KOINLY_DATE_FORMAT, KOINLY_HEADER, configure_logging, iter_koinly_records, new_stats,
+)
+from .prices import fill_net_worth, load_price_index
+
+QUARANTINE_HEADER = ["Linha", "Pagina", "Motivo", "Data", "Tipo", "Moeda", "Valor", "Status"]
+
+# Coluna opcional com a página do PDF no CSV extraído (veja pdf_converter)
+PAGE_COLUMN = 5
+
+def default_quarantine_file(output_file: str) -> str:
+    """
+    Caminho padrão do arquivo de quarentena para uma saída Koinly.
+    """
+    return os.path.splitext(output_file)[0] + "_quarantine.csv"
+
+class QuarantineWriter:
+    """
+    Grava as linhas rejeitadas na conversão (com número da linha, página do
+    PDF quando houver e motivo). O arquivo só é criado na primeira rejeição.
+
+    Com append=True (conversão incremental), as rejeições são acrescentadas
+    ao arquivo existente: as de execuções anteriores ficam antes da marca
+    d'água e não seriam rejeitadas de novo.
+
+    Sem path (fluxo sem arquivo de quarentena), as linhas rejeitadas são
+    só contadas.
+    """
+
+    def __init__(self, path: Optional[str], append: bool = False):
+        self.path = path
+        self.append = append
+        self.rows = 0
+        self._file = None
+        self._writer = None
+
+    def __call__(self, line_number, row, reason):
+        if self.path is None:
+            self.rows += 1
+            return
+        if self._file is None:
+            self._file = open(self.path, mode='a' if self.append else 'w',
+                              encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            if self._file.tell() == 0:
+                self._writer.writerow(QUARANTINE_HEADER)
+        page = row[PAGE_COLUMN] if len(row) > PAGE_COLUMN else ""
+        self._writer.writerow([line_number, page, reason] + list(row[:5]))
+        self.rows += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_quarantine(path: str):
+    """
+    Lê o arquivo de quarentena. Retorna lista de (linha, página, linha Novadax).
+    """
+    entries = []
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.reader(infile)
+        next(reader, None)
+        for row in reader:
+            if len(row) < 3:
+                continue
+            entries.append((row[0], row[1], row[3:8]))
+    return entries
+
+def _parse_koinly_date(text: str):
+    try:
+        return datetime.strptime(text, KOINLY_DATE_FORMAT)
+    except ValueError:
+        return None
+
+def merge_into_output(output_file: str, records) -> int:
+    """
+    Insere as transações na saída Koinly existente, respeitando a ordem de
+    datas do arquivo (crescente ou decrescente). O arquivo é reescrito de
+    forma atômica. Retorna o número de transações inseridas.
+    """
+    with open(output_file, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.reader(infile)
+        header = next(reader, None) or KOINLY_HEADER
+        existing = list(reader)
+
+    dates = [d for d in (_parse_koinly_date(row[0]) for row in existing if row) if d]
+    descending = len(dates) > 1 and dates[0] > dates[-1]
+
+    dated = [r for r in records if r.date is not None]
+    undated = [r for r in records if r.date is None]
+    dated.sort(key=lambda r: r.date, reverse=descending)
+
+    def comes_before(record, date):
+        return record.date > date if descending else record.date < date
+
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        idx = 0
+        for row in existing:
+            date = _parse_koinly_date(row[0]) if row else None
+            if date is not None:
+                while idx < len(dated) and comes_before(dated[idx], date):
+                    writer.writerow(dated[idx].to_row())
+                    idx += 1
+            writer.writerow(row)
+        for record in dated[idx:] + undated:
+            writer.writerow(record.to_row())
+    os.replace(tmp_file, output_file)
+    return len(dated) + len(undated)
+
+def reprocess_quarantine(quarantine_file, output_file, price_file=None, asset_file=None):
+    """
+    Converte novamente só as linhas em quarentena (com as regras atuais) e
+    insere as que agora são reconhecidas na saída Koinly existente, sem
+    refazer a extração e a conversão completas. As linhas que continuam
+    rejeitadas permanecem no arquivo de quarentena. Os tickers são trocados
+    pelos identificadores Koinly como na conversão (veja
+    assets.load_asset_ids).
+    """
+    configure_logging()
+    logging.info(f"Reprocessando {quarantine_file} em {output_file}")
+
+    entries = read_quarantine(quarantine_file)
+    stats = new_stats()
+    remaining = []
+
+    def on_reject(local_line, row, reason):
+        line_number, page, _ = entries[local_line - 1]
+        remaining.append([line_number, page, reason] + list(row[:5]))
+
+    price_index = load_price_index(price_file) if price_file else None
+    records = list(apply_asset_ids(fill_net_worth(
+        iter_koinly_records((row for _, _, row in entries), stats, on_reject=on_reject),
+        price_index,
+    ), load_asset_ids(asset_file)))
+    recovered = merge_into_output(output_file, records) if records else 0
+
+    if remaining:
+        with open(quarantine_file, mode='w', encoding='utf-8', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(QUARANTINE_HEADER)
+            writer.writerows(remaining)
+    else:
+        os.remove(quarantine_file)
+
+    logging.info(f"Linhas reprocessadas: {len(entries)}")
+    logging.info(f"Transações recuperadas: {recovered}")
+    logging.info(f"Linhas ainda em quarentena: {len(remaining)}")
+
+    return {
+        "reprocessed_rows": len(entries),
+        "recovered_rows": recovered,
+        "remaining_rows": len(remaining),
+        "output_file": output_file,
+        "quarantine_file": quarantine_file if remaining else None,
+    }
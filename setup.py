@@ -7,10 +7,14 @@ setup(
     author="Rivson CS",
     author_email="email@example.com",  # Substitua pelo seu email
     url="https://github.com/rivsoncs/NovaDax-to-Koinly-Conversor",
-    packages=find_packages(),
-    install_requires=[
-        "pdfplumber",
-    ],
+    packages=find_packages(exclude=["tests", "tests.*"]),
+    # Tabela de identificadores de ativos do Koinly (veja assets.py)
+    package_data={"novadax_koinly": ["koinly_assets.csv"]},
+    install_requires=[],
+    extras_require={
+        # Necessário apenas para converter extratos em PDF
+        "pdf": ["pdfplumber>=0.7.0"],
+    },
     entry_points={
         "console_scripts": [
             "novadax-koinly=novadax_koinly.cli:main",
@@ -0,0 +1,446 @@
+"""
+Harness diferencial: compara motores de conversão com a referência congelada.
+
+Gera extratos NovaDax aleatórios (reprodutíveis pela semente) com os casos
+difíceis do formato: separadores de milhar e decimais fora do padrão,
+estimativas '(≈R$...)' malformadas, tipos desconhecidos, linhas quebradas,
+campos com quebra de linha e pernas de Convert intercaladas. Cada motor
+registrado converte o mesmo extrato e a saída é comparada, linha a linha,
+com reference.reference_convert. Em caso de diferença, a entrada é reduzida
+ao menor trecho que ainda diverge e um relatório é gravado.
+
+Para testar um motor novo, registre-o com @register_engine antes de chamar
+run_difftest (ou main).
+
+Uso:
+    python -m tests.difftest [--cases 200] [--rows 60] [--seed 0] [--engine NOME ...]
+"""
+import argparse
+import contextlib
+import csv
+import difflib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import unicodedata
+from datetime import datetime, timedelta
+
+from .reference import reference_convert
+from .synthetic import NOVADAX_HEADER, write_rows_pdf
+
+DEFAULT_CASES = 200
+DEFAULT_ROWS = 60
+# Casos por motor de PDF (cada um gera e extrai um PDF, bem mais lento)
+DEFAULT_PDF_CASES = 10
+# Limite de execuções do motor ao reduzir uma entrada divergente
+MAX_SHRINK_RUNS = 300
+
+# Motores registrados: nome -> (função, só entradas representáveis em PDF)
+ENGINES = {}
+
+def register_engine(name, pdf=False):
+    """
+    Registra um motor de conversão. A função recebe (linhas NovaDax sem
+    cabeçalho, pasta de trabalho) e retorna (linhas Koinly, rejeições), com
+    rejeições como lista de (número da linha, motivo). Motores com pdf=True
+    só recebem entradas que podem ser desenhadas em um PDF.
+    """
+    def decorator(func):
+        ENGINES[name] = (func, pdf)
+        return func
+    return decorator
+
+# --- Geração de entradas ---------------------------------------------------
+
+_TYPES = [
+    "Depósito em Reais", "Saque em Reais", "Depósito de criptomoedas",
+    "Saque de criptomoedas", "Taxa de saque de criptomoedas", "Taxa de transação",
+    "Redeemed Bonus", "Staking", "Airdrop", "Troca",
+]
+_ODD_TYPES = [
+    "DEPÓSITO EM REAIS", "deposito em reais", "Compra (BTC/BRL)", "compra(btc/brl)",
+    "Compra", "Venda", "Bônus de indicação", "Coisa Desconhecida", "Transferência interna",
+]
+_CURRENCIES = ["BRL", "BTC", "ETH", "USDT", "NOVA", "brl"]
+_STATUSES = ["Concluído", "Concluído", "Concluído", "Pendente", "Cancelado"]
+_BROKEN_VALUES = ["", "abc", "N/A", "1,2,3", "--5", "+"]
+
+def _number(rng, pdf):
+    """
+    Um número no formato brasileiro, com variações de separadores.
+    """
+    magnitude = rng.choice([1e-8, 1e-3, 1, 100, 1e5, 1e7])
+    value = rng.uniform(0, 10) * magnitude
+    decimals = rng.choice([0, 2, 8])
+    text = f"{value:,.{decimals}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    if not pdf and rng.random() < 0.2:
+        text = text.replace(".", "")  # Sem separador de milhar
+    return text
+
+def _value(rng, sign, pdf):
+    if not pdf and rng.random() < 0.05:
+        return rng.choice(_BROKEN_VALUES)
+    sign = rng.choice([sign, sign, sign, "", sign + " "]) if not pdf else sign
+    text = sign + _number(rng, pdf)
+    if not pdf and rng.random() < 0.6:
+        estimate = rng.choice(["(≈R${})", "(≈R${})", "(≈ R$ {})", "(≈R${}", "(≈R$)"])
+        text += " " + estimate.format(_number(rng, pdf))
+    return text
+
+def _date(rng, date, pdf):
+    if not pdf and rng.random() < 0.04:
+        return rng.choice(["", "2023-01-01 10:00:00", "31/02/2023 10:00:00",
+                           " " + date.strftime("%d/%m/%Y %H:%M:%S"), "01/01/2023"])
+    return date.strftime("%d/%m/%Y %H:%M:%S")
+
+def _ascii(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+def _row(rng, date, tipo, currency, sign, pdf):
+    status = rng.choice(_STATUSES)
+    if pdf:
+        # A extração do PDF remove acentos dos textos (veja
+        # pdf_converter.clean_table_row); a entrada já vem nessa forma
+        tipo, status = _ascii(tipo), _ascii(status)
+    return [_date(rng, date, pdf), tipo, currency, _value(rng, sign, pdf), status]
+
+def _convert_legs(rng, date, pdf):
+    sold, bought = rng.sample(["BRL", "USDT", "BTC", "ETH"], 2)
+    return [_row(rng, date, "Convert", sold, "-", pdf), _row(rng, date, "Convert", bought, "+", pdf)]
+
+def _convert_fee(rng, date, pdf):
+    return _row(rng, date, "Taxa de Convert", rng.choice(["USDT", "BRL", "BTC"]), "-", pdf)
+
+def _operation(rng, date, pdf):
+    """
+    Gera as linhas de uma operação (uma ou mais linhas com a mesma data).
+    """
+    kind = rng.random()
+    if kind < 0.3:
+        tipo = rng.choice(_ODD_TYPES if rng.random() < 0.2 else _TYPES)
+        return [_row(rng, date, tipo, rng.choice(_CURRENCIES), rng.choice("+-"), pdf)]
+    if kind < 0.5:
+        base = rng.choice(["BTC", "ETH", "NOVA"])
+        side = rng.choice(["Compra", "Venda"])
+        tipo = f"{side}({base}/BRL)"
+        legs = [_row(rng, date, tipo, "BRL", "-" if side == "Compra" else "+", pdf),
+                _row(rng, date, tipo, base, "+" if side == "Compra" else "-", pdf)]
+        rng.shuffle(legs)
+        if rng.random() < 0.7:
+            legs.append(_row(rng, date, "Taxa de transação", rng.choice([base, "BRL"]), "-", pdf))
+        return legs
+    if kind < 0.85:
+        # Variações de Convert: taxa antes/depois, taxa de outra data, perna
+        # solta, Converts seguidos e pernas intercaladas com outra operação
+        variant = rng.randrange(6)
+        legs = _convert_legs(rng, date, pdf)
+        if variant == 0:
+            return [_convert_fee(rng, date, pdf)] + legs
+        if variant == 1:
+            return legs + [_convert_fee(rng, date, pdf)]
+        if variant == 2:
+            return [_convert_fee(rng, date - timedelta(seconds=1), pdf)] + legs
+        if variant == 3:
+            return legs[:1]
+        if variant == 4:
+            return legs + _convert_legs(rng, date, pdf)
+        other = _row(rng, date, rng.choice(_TYPES), rng.choice(_CURRENCIES), "+", pdf)
+        return [legs[0], other, legs[1]]
+    if pdf:
+        return [_row(rng, date, "Coisa Desconhecida", rng.choice(_CURRENCIES), "+", pdf)]
+    # Linhas quebradas
+    broken = rng.randrange(5)
+    row = _row(rng, date, rng.choice(_TYPES), rng.choice(_CURRENCIES), "+", pdf)
+    if broken == 0:
+        return [[]]
+    if broken == 1:
+        return [row[:rng.randrange(1, 5)]]
+    if broken == 2:
+        return [row + ["extra", "campos"]]
+    if broken == 3:
+        row[1] = row[1] + "\n(continuação)"
+        return [row]
+    row[3] = '"' + row[3] + '", com vírgula'
+    return [row]
+
+def generate_rows(rng, count, pdf=False):
+    """
+    Gera cerca de 'count' linhas de extrato NovaDax (sem cabeçalho). Com
+    pdf=True, só linhas que podem ser desenhadas e extraídas de um PDF.
+    """
+    rows = []
+    date = datetime(2021, 1, 1) + timedelta(seconds=rng.randrange(10 ** 8))
+    while len(rows) < count:
+        rows.extend(_operation(rng, date, pdf))
+        date += timedelta(seconds=rng.choice([0, 1, 59, 60, 3600, 86400 * 3]))
+    return rows
+
+# --- Motores ---------------------------------------------------------------
+
+def _write_input(rows, workdir):
+    path = os.path.join(workdir, "novadax.csv")
+    with open(path, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(NOVADAX_HEADER)
+        writer.writerows(rows)
+    return path
+
+def _read_output(path):
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        return list(csv.reader(infile))[1:]
+
+def _read_rejects(path):
+    if not os.path.exists(path):
+        return []
+    return [(int(row[0]), row[2]) for row in _read_output(path)]
+
+@register_engine("streaming")
+def _streaming_engine(rows, workdir):
+    from novadax_koinly.converter import iter_koinly_records_from
+
+    rejected = []
+    records = iter_koinly_records_from(
+        [NOVADAX_HEADER] + rows,
+        on_reject=lambda line, row, reason: rejected.append((line, reason)),
+    )
+    return [record.to_row() for record in records], rejected
+
+@register_engine("arquivo")
+def _file_engine(rows, workdir):
+    from novadax_koinly.converter import convert_novadax_to_koinly
+
+    output = os.path.join(workdir, "koinly.csv")
+    quarantine = os.path.join(workdir, "quarantine.csv")
+    convert_novadax_to_koinly(_write_input(rows, workdir), output, quarantine_file=quarantine)
+    return _read_output(output), _read_rejects(quarantine)
+
+@register_engine("fluxo")
+def _stream_output_engine(rows, workdir):
+    from novadax_koinly.converter import convert_novadax_to_koinly
+
+    output = io.StringIO()
+    quarantine = os.path.join(workdir, "quarantine.csv")
+    with open(_write_input(rows, workdir), 'rb') as infile:
+        convert_novadax_to_koinly(infile, output, quarantine_file=quarantine)
+    return list(csv.reader(io.StringIO(output.getvalue())))[1:], _read_rejects(quarantine)
+
+@register_engine("paralelo")
+def _parallel_engine(rows, workdir):
+    from novadax_koinly.converter import new_stats
+    from novadax_koinly.parallel import iter_koinly_records_parallel
+    from novadax_koinly.prices import fill_net_worth
+
+    rejected = []
+    records = iter_koinly_records_parallel(
+        _write_input(rows, workdir), new_stats(), workers=2, chunk_size=256,
+        on_reject=lambda line, row, reason: rejected.append((line, reason)),
+    )
+    return [record.to_row() for record in fill_net_worth(records)], rejected
+
+@register_engine("dividido")
+def _sharded_engine(rows, workdir):
+    from novadax_koinly.converter import convert_novadax_to_koinly
+
+    output = os.path.join(workdir, "koinly.csv")
+    quarantine = os.path.join(workdir, "quarantine.csv")
+    result = convert_novadax_to_koinly(_write_input(rows, workdir), output, shard_rows=7,
+                                       quarantine_file=quarantine)
+    with open(result["manifest_file"], encoding='utf-8') as manifest:
+        shards = json.load(manifest)["shards"]
+    koinly = []
+    for shard in shards:
+        koinly.extend(_read_output(os.path.join(workdir, shard["file"])))
+    return koinly, _read_rejects(quarantine)
+
+@register_engine("pdf", pdf=True)
+def _pdf_engine(rows, workdir, page_timeout=None):
+    from novadax_koinly.converter import convert_novadax_to_koinly
+    from novadax_koinly.pdf_converter import novadax_pdf_to_csv
+
+    pdf = write_rows_pdf(os.path.join(workdir, "novadax.pdf"), rows)
+    extracted = os.path.join(workdir, "extraido.csv")
+    output = os.path.join(workdir, "koinly.csv")
+    quarantine = os.path.join(workdir, "quarantine.csv")
+    novadax_pdf_to_csv(pdf, extracted, page_timeout=page_timeout)
+    convert_novadax_to_koinly(extracted, output, quarantine_file=quarantine)
+    return _read_output(output), _read_rejects(quarantine)
+
+@register_engine("pdf-limite", pdf=True)
+def _pdf_budget_engine(rows, workdir):
+    # Extração em processo separado, com limite de tempo por página
+    return _pdf_engine(rows, workdir, page_timeout=60)
+
+@register_engine("pdf-pipeline", pdf=True)
+def _pdf_pipeline_engine(rows, workdir):
+    # Como a CLI: páginas em um processo produtor, conversão consumindo as
+    # linhas enquanto o CSV intermediário é gravado
+    from novadax_koinly.converter import convert_novadax_to_koinly
+    from novadax_koinly.pdf_converter import iter_pdf_to_csv
+
+    pdf = write_rows_pdf(os.path.join(workdir, "novadax.pdf"), rows)
+    extracted = os.path.join(workdir, "extraido.csv")
+    output = os.path.join(workdir, "koinly.csv")
+    quarantine = os.path.join(workdir, "quarantine.csv")
+    convert_novadax_to_koinly(iter_pdf_to_csv(pdf, extracted, page_timeout=60, pipelined=True),
+                              output, quarantine_file=quarantine)
+    return _read_output(output), _read_rejects(quarantine)
+
+# --- Comparação ------------------------------------------------------------
+
+def diff_results(expected, actual):
+    """
+    Diferenças linha a linha entre (linhas Koinly, rejeições) da referência
+    e de um motor, no formato de diff unificado. Lista vazia se iguais.
+    """
+    lines = []
+    for title, left, right in (("saída Koinly", expected[0], actual[0]),
+                               ("rejeições", expected[1], actual[1])):
+        left = [",".join(map(str, row)) for row in left]
+        right = [",".join(map(str, row)) for row in right]
+        if left != right:
+            lines.append(f"== {title} (- referência, + motor)")
+            lines.extend(line for line in difflib.unified_diff(left, right, lineterm="", n=1)
+                         if not line.startswith(("---", "+++")))
+    return lines
+
+def _run_engine(func, rows):
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        try:
+            return func(rows, workdir)
+        except Exception as e:
+            return [["exceção", repr(e)]], []
+
+def shrink(rows, fails, max_runs=MAX_SHRINK_RUNS):
+    """
+    Reduz a entrada removendo blocos de linhas (cada vez menores) enquanto
+    fails(linhas) continuar verdadeiro.
+    """
+    runs = 0
+    chunk = max(len(rows) // 2, 1)
+    while chunk >= 1 and runs < max_runs:
+        i = 0
+        while i < len(rows) and runs < max_runs:
+            candidate = rows[:i] + rows[i + chunk:]
+            runs += 1
+            if candidate and fails(candidate):
+                rows = candidate
+            else:
+                i += chunk
+        chunk //= 2
+    return rows
+
+def write_report(engine, case_seed, rows, diff, report_dir):
+    """
+    Grava a entrada reduzida e as diferenças de um caso divergente.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    report_file = os.path.join(report_dir, f"difftest_{engine}_{case_seed}.txt")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(NOVADAX_HEADER)
+    writer.writerows(rows)
+    with open(report_file, 'w', encoding='utf-8') as report:
+        report.write(f"Motor: {engine}, semente do caso: {case_seed}\n\n")
+        report.write("Entrada reduzida:\n")
+        report.write(buffer.getvalue())
+        report.write("\nDiferenças:\n")
+        report.write("\n".join(diff) + "\n")
+    return report_file
+
+def run_difftest(cases=DEFAULT_CASES, rows=DEFAULT_ROWS, seed=0, engines=None,
+                 pdf_cases=DEFAULT_PDF_CASES, report_dir='.'):
+    """
+    Executa os motores (todos os registrados, se engines for None) nos
+    casos gerados. Retorna ({motor: casos executados}, falhas), com falhas
+    como lista de (motor, semente do caso, arquivo de relatório). Só o
+    primeiro caso divergente de cada motor é reduzido e relatado.
+    """
+    names = engines or list(ENGINES)
+    selected = {}
+    for name in names:
+        if name not in ENGINES:
+            raise ValueError(f"Motor desconhecido: {name} (registrados: {', '.join(ENGINES)})")
+        func, pdf = ENGINES[name]
+        if pdf:
+            try:
+                import pdfplumber  # noqa: F401
+            except ImportError:
+                continue
+        selected[name] = (func, pdf)
+
+    # Sem arquivo de log nem mensagens por linha durante as comparações
+    logging.getLogger().addHandler(logging.NullHandler())
+    logging.disable(logging.CRITICAL)
+
+    executed = {name: 0 for name in selected}
+    failures = []
+    try:
+        for case in range(cases):
+            case_seed = seed + case
+            inputs = {}
+            for name, (func, pdf) in selected.items():
+                if pdf and case >= pdf_cases:
+                    continue
+                if any(failed == name for failed, _, _ in failures):
+                    continue
+                if pdf not in inputs:
+                    case_rows = generate_rows(random.Random(case_seed), rows, pdf=pdf)
+                    inputs[pdf] = (case_rows, reference_convert(case_rows))
+                case_rows, expected = inputs[pdf]
+
+                executed[name] += 1
+                diff = diff_results(expected, _run_engine(func, case_rows))
+                if not diff:
+                    continue
+
+                def fails(candidate, func=func):
+                    return bool(diff_results(reference_convert(candidate), _run_engine(func, candidate)))
+
+                reduced = shrink(case_rows, fails)
+                reduced_diff = diff_results(reference_convert(reduced), _run_engine(func, reduced))
+                failures.append((name, case_seed, write_report(
+                    name, case_seed, reduced, reduced_diff or diff, report_dir)))
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return executed, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compara os motores de conversão com a implementação de referência'
+    )
+    parser.add_argument('--cases', type=int, default=DEFAULT_CASES,
+                        help='Número de extratos aleatórios')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS,
+                        help='Linhas por extrato')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Semente inicial (o caso N usa semente + N)')
+    parser.add_argument('--engine', action='append', default=None,
+                        help=f'Motor a testar (pode repetir; padrão: todos). '
+                             f'Registrados: {", ".join(ENGINES)}')
+    parser.add_argument('--pdf-cases', type=int, default=DEFAULT_PDF_CASES,
+                        help='Número de casos para os motores de PDF')
+    parser.add_argument('--report-dir', default='.',
+                        help='Pasta dos relatórios dos casos divergentes')
+    args = parser.parse_args(argv)
+
+    try:
+        executed, failures = run_difftest(args.cases, args.rows, args.seed, args.engine,
+                                          args.pdf_cases, args.report_dir)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(2)
+
+    failed = {name: report for name, _, report in failures}
+    for name, count in executed.items():
+        status = f"DIVERGE -> {failed[name]}" if name in failed else "ok"
+        print(f"{name:>10}: {count} casos, {status}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Verificação de pico de memória dos caminhos de conversão.
+
+Gera extratos sintéticos de tamanhos crescentes, executa cada conversão em
+um processo novo (para que o pico de RSS seja só daquela execução) e mede o
+pico de RSS e o pico do tracemalloc. Falha se algum pico passar do limite ou
+se a memória dos caminhos em streaming crescer de forma (quase) linear com o
+tamanho da entrada. Quando um limite é excedido, grava um relatório com as
+maiores alocações no momento de maior uso de memória encontrado pela
+amostragem (veja _PeakSampler).
+
+Uso:
+    python -m tests.memcheck [--sizes 5000 20000 80000] [--budget-mb 256]
+"""
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+from .synthetic import write_novadax_csv, write_novadax_pdf
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Caminhos que devem usar memória constante (ou sublinear) no tamanho da entrada
+STREAMING_PATHS = ('csv', 'pdf')
+
+DEFAULT_SIZES = (5000, 20000, 80000)
+DEFAULT_PDF_SIZES = (100, 400)
+DEFAULT_BUDGET_MB = 256
+# Expoente máximo de crescimento: pico ~ tamanho ** expoente
+DEFAULT_MAX_EXPONENT = 0.5
+TOP_ALLOCATIONS = 25
+# Amostragem do tracemalloc: intervalo, em segundos, e quanto o uso precisa
+# crescer desde o último snapshot para tirar outro
+SAMPLE_SECONDS = 0.02
+SNAPSHOT_GROWTH = 1.2
+# Tempo máximo de uma medição, em segundos
+MEASURE_TIMEOUT = 600
+_POLL_SECONDS = 1.0
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_path(path, input_file, workdir):
+    if path == 'csv':
+        from novadax_koinly.converter import convert_novadax_to_koinly
+        convert_novadax_to_koinly(input_file, os.path.join(workdir, 'koinly.csv'))
+    elif path == 'pdf':
+        from novadax_koinly.pdf_converter import novadax_pdf_to_csv
+        novadax_pdf_to_csv(input_file, os.path.join(workdir, 'extraido.csv'))
+    else:
+        raise ValueError(f"Caminho desconhecido: {path}")
+
+class _PeakSampler:
+    """
+    Acompanha o uso do tracemalloc em uma thread e guarda as maiores
+    alocações do maior uso visto: um novo snapshot só é tirado quando o uso
+    passa de SNAPSHOT_GROWTH vezes o do último, então são poucos, e só as
+    linhas do relatório ficam guardadas. O tracemalloc não avisa no pico
+    exato; o uso no snapshot guardado fica em 'snapshot_mb'. O pico da
+    execução ('peak_mb') não conta a memória usada pelos snapshots.
+    """
+
+    def __init__(self):
+        self.top_allocations = None
+        self.snapshot_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_mb = max(self.peak_mb, peak / (1024 * 1024))
+        if self.top_allocations is None or current > self.snapshot_mb * 1024 * 1024 * SNAPSHOT_GROWTH:
+            self.top_allocations = self._top_allocations()
+            self.snapshot_mb = current / (1024 * 1024)
+            # O pico seguinte não deve contar o próprio snapshot (Python 3.9+)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+    @staticmethod
+    def _top_allocations():
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        return [str(stat) for stat in statistics[:TOP_ALLOCATIONS]]
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self._sample()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()  # O fim da execução também é um candidato
+
+def _measure(results, path, input_file, workdir):
+    """
+    Executado no processo filho: roda a conversão sob o tracemalloc.
+    """
+    # Sem log em arquivo/terminal: mede a conversão, não o volume de log
+    logging.getLogger().addHandler(logging.NullHandler())
+    logging.getLogger().setLevel(logging.WARNING)
+    sys.stdout = open(os.devnull, 'w')
+
+    tracemalloc.start(10)
+    with _PeakSampler() as sampler:
+        _run_path(path, input_file, workdir)
+    tracemalloc.stop()
+
+    results.put({
+        "traced_peak_mb": sampler.peak_mb,
+        "peak_rss_mb": _peak_rss_mb(),
+        "snapshot_mb": sampler.snapshot_mb,
+        "top_allocations": sampler.top_allocations,
+    })
+
+def _wait_result(results, process, name, timeout=MEASURE_TIMEOUT):
+    """
+    Espera o resultado do processo de medição. Falha se ele terminar sem
+    resultado (ex.: exceção na conversão) ou passar de 'timeout' segundos.
+    """
+    waited = 0.0
+    while waited < timeout:
+        try:
+            return results.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            waited += _POLL_SECONDS
+        if process.exitcode is not None:
+            # O resultado pode ter chegado junto com o fim do processo
+            try:
+                return results.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                raise RuntimeError(f"A medição de {name} terminou sem resultado "
+                                   f"(código de saída {process.exitcode})") from None
+    raise RuntimeError(f"A medição de {name} passou de {timeout}s")
+
+def measure_path(path, rows, workdir, seed=0):
+    """
+    Gera a entrada com 'rows' linhas e mede a conversão em um processo novo.
+    """
+    if path == 'pdf':
+        input_file = write_novadax_pdf(os.path.join(workdir, f'novadax_{rows}.pdf'), rows, seed)
+    else:
+        input_file = write_novadax_csv(os.path.join(workdir, f'novadax_{rows}.csv'), rows, seed)
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(results, path, input_file, workdir))
+    process.start()
+    try:
+        result = _wait_result(results, process, f"{path} ({rows} linhas)")
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        os.remove(input_file)
+
+    result.update(path=path, rows=rows)
+    return result
+
+def write_report(result, report_dir, reason):
+    """
+    Grava o relatório das maiores alocações de uma medição que estourou o limite.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    report_file = os.path.join(report_dir, f"memcheck_{result['path']}_{result['rows']}.txt")
+    with open(report_file, 'w', encoding='utf-8') as report:
+        report.write(f"Caminho: {result['path']}, linhas: {result['rows']}\n")
+        report.write(f"Motivo: {reason}\n")
+        report.write(f"Pico tracemalloc: {result['traced_peak_mb']:.2f} MB\n")
+        report.write(f"Pico RSS: {result['peak_rss_mb']} MB\n\n")
+        report.write(f"Maiores alocações (no maior uso amostrado, "
+                     f"{result['snapshot_mb']:.2f} MB):\n")
+        for line in result['top_allocations']:
+            report.write(line + "\n")
+    return report_file
+
+def growth_exponent(small, large):
+    """
+    Expoente k tal que pico ~ linhas ** k entre duas medições.
+    """
+    if small['traced_peak_mb'] <= 0 or large['rows'] == small['rows']:
+        return 0.0
+    ratio = max(large['traced_peak_mb'] / small['traced_peak_mb'], 1e-9)
+    return math.log(ratio) / math.log(large['rows'] / small['rows'])
+
+def run_memcheck(sizes=DEFAULT_SIZES, pdf_sizes=DEFAULT_PDF_SIZES, budget_mb=DEFAULT_BUDGET_MB,
+                 max_exponent=DEFAULT_MAX_EXPONENT, report_dir='.'):
+    """
+    Mede os caminhos CSV e PDF (este só se o pdfplumber estiver instalado).
+    Retorna (medições, falhas).
+    """
+    plan = [('csv', sizes)]
+    try:
+        import pdfplumber  # noqa: F401
+        plan.append(('pdf', pdf_sizes))
+    except ImportError:
+        pass
+
+    results = []
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for path, path_sizes in plan:
+            measured = [measure_path(path, rows, workdir) for rows in sorted(path_sizes)]
+            results.extend(measured)
+
+            for result in measured:
+                peak = result['peak_rss_mb']
+                if peak is not None and peak > budget_mb:
+                    reason = f"pico de RSS {peak:.1f} MB acima do limite de {budget_mb} MB"
+                    failures.append((result, reason, write_report(result, report_dir, reason)))
+
+            if path in STREAMING_PATHS and len(measured) > 1:
+                exponent = growth_exponent(measured[0], measured[-1])
+                if exponent > max_exponent:
+                    reason = (f"memória cresce com expoente {exponent:.2f} no tamanho da entrada "
+                              f"(máximo {max_exponent})")
+                    failures.append((measured[-1], reason, write_report(measured[-1], report_dir, reason)))
+
+    return results, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verificação de pico de memória da conversão')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Tamanhos (linhas) dos CSVs sintéticos')
+    parser.add_argument('--pdf-sizes', type=int, nargs='+', default=list(DEFAULT_PDF_SIZES),
+                        help='Tamanhos (linhas) dos PDFs sintéticos')
+    parser.add_argument('--budget-mb', type=float, default=DEFAULT_BUDGET_MB,
+                        help='Pico de RSS máximo por execução, em MB')
+    parser.add_argument('--max-exponent', type=float, default=DEFAULT_MAX_EXPONENT,
+                        help='Expoente máximo de crescimento da memória nos caminhos em streaming')
+    parser.add_argument('--report-dir', default='.',
+                        help='Pasta dos relatórios de alocação gerados em caso de falha')
+    args = parser.parse_args(argv)
+
+    results, failures = run_memcheck(args.sizes, args.pdf_sizes, args.budget_mb,
+                                     args.max_exponent, args.report_dir)
+
+    for result in results:
+        rss = f"{result['peak_rss_mb']:.1f} MB" if result['peak_rss_mb'] is not None else "n/d"
+        print(f"{result['path']:>4} {result['rows']:>8} linhas: "
+              f"tracemalloc {result['traced_peak_mb']:.2f} MB, RSS {rss}")
+    for result, reason, report_file in failures:
+        print(f"FALHA {result['path']} ({result['rows']} linhas): {reason} -> {report_file}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
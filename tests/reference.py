@@ -0,0 +1,201 @@
+"""
+Implementação de referência da conversão NovaDax -> Koinly, congelada.
+
+Cópia autocontida (só biblioteca padrão) do comportamento de
+process_novadax_row / iter_koinly_records / fill_net_worth (sem arquivo de
+preços) no momento em que o harness diferencial (veja difftest) foi criado,
+inclusive as peculiaridades. Motores otimizados são comparados com ela.
+
+Não altere este módulo para acompanhar otimizações. Quando uma mudança de
+saída for intencional, atualize a referência em um commit próprio,
+explicando a mudança.
+"""
+import re
+import unicodedata
+from datetime import datetime
+from decimal import Decimal
+
+REJECT_INVALID_ROW = "formato inválido (menos de 5 campos)"
+REJECT_UNCLASSIFIED = "tipo de transação não identificado"
+REJECT_ERROR = "erro ao processar"
+
+def _normalize(s):
+    nfkd = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in nfkd if not unicodedata.combining(c)).lower()
+
+def _parse_date(text):
+    try:
+        return datetime.strptime(text, "%d/%m/%Y %H:%M:%S")
+    except ValueError:
+        return None
+
+def _format_date(date):
+    return date.strftime("%Y-%m-%d %H:%M UTC") if date else "Invalid Date"
+
+def _numeric(text):
+    temp = re.sub(r'\(≈R\\$[^)]*\)', '', text)
+    matches = re.findall(r'[+-]?\s*\d[\d.,]*', temp)
+    if not matches:
+        return ""
+    raw_val = re.sub(r'\s+', '', matches[0]).replace(',', '.')
+    parts = raw_val.split('.')
+    if len(parts) > 2:
+        raw_val = ''.join(parts[:-1]) + '.' + parts[-1]
+    return raw_val
+
+def _decimal(value):
+    value = value.lstrip("+-")
+    return Decimal(value) if value else None
+
+def _estimate(text):
+    match = re.search(r'\(≈\s*R\$\s*([^)]*)\)', text)
+    if not match:
+        return None
+    value = _numeric(match.group(1))
+    return _decimal(value) if value else None
+
+def _pair(tipo_str):
+    match = re.search(r'\(([A-Z0-9]+)/([A-Z0-9]+)\)', tipo_str.upper())
+    return (match.group(1), match.group(2)) if match else (None, None)
+
+def _amount(amount):
+    return "" if amount is None else format(amount, 'f')
+
+def reference_row(row):
+    """
+    Converte uma linha em um dicionário com os campos do Koinly (valores
+    Decimal), como process_novadax_row.
+    """
+    data_str, tipo_str, moeda, valor_str, status = row[:5]
+    tipo = _normalize(tipo_str)
+    valor = _numeric(valor_str)
+    base, quote = _pair(tipo_str)
+
+    sent = received = fee = ""
+    sent_cur = received_cur = fee_cur = label = ""
+
+    if "taxa de transacao" in tipo:
+        fee, fee_cur, label = valor, moeda, "fee"
+    elif "taxa de saque" in tipo:
+        fee, fee_cur, label = valor, moeda, "withdrawal-fee"
+    elif "deposito em reais" in tipo:
+        received, received_cur, label = valor.lstrip("+"), moeda, "deposit"
+    elif "saque em reais" in tipo:
+        sent, sent_cur, label = valor.lstrip("-"), moeda, "withdrawal"
+    elif "deposito de criptomoedas" in tipo:
+        received, received_cur, label = valor.lstrip("+"), moeda, "deposit"
+    elif "redeemed bonus" in tipo or "staking" in tipo or "bonus" in tipo:
+        received, received_cur, label = valor.lstrip("+"), moeda, "reward"
+    elif "airdrop" in tipo:
+        received, received_cur, label = valor.lstrip("+"), moeda, "airdrop"
+    elif "convert" in tipo or "troca" in tipo:
+        if valor.startswith("-"):
+            sent, sent_cur = valor.lstrip("-"), moeda
+        else:
+            received, received_cur = valor.lstrip("+"), moeda
+        label = "trade"
+    elif "compra" in tipo:
+        if base and quote:
+            if moeda == quote:
+                sent, sent_cur = valor.lstrip("-"), quote
+            else:
+                received, received_cur = valor.lstrip("+"), base
+        elif moeda.upper() == "BRL":
+            sent, sent_cur = valor.lstrip("-"), "BRL"
+        else:
+            received, received_cur = valor.lstrip("+"), moeda
+        label = "buy"
+    elif "venda" in tipo:
+        if base and quote:
+            if moeda == quote:
+                received, received_cur = valor.lstrip("+"), quote
+            else:
+                sent, sent_cur = valor.lstrip("-"), base
+        elif moeda.upper() == "BRL":
+            received, received_cur = valor.lstrip("+"), "BRL"
+        else:
+            sent, sent_cur = valor.lstrip("-"), moeda
+        label = "sell"
+    elif "saque de criptomoedas" in tipo:
+        sent, sent_cur, label = valor.lstrip("-"), moeda, "withdrawal"
+
+    return {
+        "date": _parse_date(data_str),
+        "sent": _decimal(sent), "sent_cur": sent_cur,
+        "received": _decimal(received), "received_cur": received_cur,
+        "fee": _decimal(fee), "fee_cur": fee_cur,
+        "net_worth": _estimate(valor_str),
+        "label": label, "description": tipo_str,
+    }
+
+def _koinly_row(tx):
+    net_worth = tx["net_worth"]
+    if net_worth is None:
+        for amount, currency in ((tx["received"], tx["received_cur"]),
+                                 (tx["sent"], tx["sent_cur"]),
+                                 (tx["fee"], tx["fee_cur"])):
+            if amount is not None and currency.upper() == "BRL":
+                net_worth = amount
+                break
+    return [
+        _format_date(tx["date"]),
+        _amount(tx["sent"]), tx["sent_cur"],
+        _amount(tx["received"]), tx["received_cur"],
+        _amount(tx["fee"]), tx["fee_cur"],
+        _amount(net_worth), "BRL" if net_worth is not None else "",
+        tx["label"], tx["description"], "",
+    ]
+
+def reference_convert(rows):
+    """
+    Converte as linhas da NovaDax (sem cabeçalho). Retorna (linhas Koinly,
+    rejeições), onde rejeições é uma lista de (número da linha, motivo).
+    """
+    output = []
+    rejected = []
+    current = None
+    convert_fee = None
+
+    for line, row in enumerate(rows, start=1):
+        if len(row) < 5:
+            rejected.append((line, REJECT_INVALID_ROW))
+            continue
+
+        data_str, tipo_str, moeda, valor_str, _ = row[:5]
+        tipo = _normalize(tipo_str)
+        try:
+            if "taxa de convert" in tipo:
+                convert_fee = (_decimal(_numeric(valor_str)), moeda, data_str)
+                continue
+
+            if "convert" in tipo:
+                if current is None:
+                    current = reference_row(row)
+                    if convert_fee and convert_fee[2] == data_str:
+                        current["fee"], current["fee_cur"] = convert_fee[0], convert_fee[1]
+                        convert_fee = None
+                else:
+                    valor = _numeric(valor_str)
+                    if valor.startswith("-"):
+                        current["sent"], current["sent_cur"] = _decimal(valor), moeda
+                    else:
+                        current["received"], current["received_cur"] = _decimal(valor), moeda
+                    if current["net_worth"] is None:
+                        current["net_worth"] = _estimate(valor_str)
+                    output.append(_koinly_row(current))
+                    current = None
+            else:
+                if current:
+                    output.append(_koinly_row(current))
+                    current = None
+                tx = reference_row(row)
+                if not tx["label"]:
+                    rejected.append((line, REJECT_UNCLASSIFIED))
+                    continue
+                output.append(_koinly_row(tx))
+        except Exception as e:
+            rejected.append((line, f"{REJECT_ERROR}: {e}"))
+
+    if current:
+        output.append(_koinly_row(current))
+    return output, rejected
@@ -0,0 +1,161 @@
+"""
+Geração de extratos sintéticos da Novadax (CSV e PDF) para medições de
+desempenho e memória, sem depender de extratos reais.
+"""
+import csv
+import random
+from datetime import datetime, timedelta
+
+NOVADAX_HEADER = ["Data", "Tipo", "Moeda", "Valor", "Status"]
+
+def _brl(value: float) -> str:
+    """
+    Formata um número no padrão brasileiro (1.234,56).
+    """
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+def _amount(value: float, sign: str, estimate: bool, brl: bool = False) -> str:
+    """
+    Valor no formato do extrato: 8 casas para cripto, 2 para reais, com a
+    estimativa em reais opcional.
+    """
+    text = f"{sign}{value:.{2 if brl else 8}f}".replace(".", ",")
+    if estimate:
+        text += f" (≈R${_brl(value if brl else value * 1000)})"
+    return text
+
+def iter_novadax_rows(count: int, seed: int = 0, estimates: bool = True,
+                      start: datetime = datetime(2021, 1, 1)):
+    """
+    Gera 'count' linhas de extrato Novadax (sem cabeçalho) em ordem
+    crescente de data, misturando depósitos, compras e vendas com taxa,
+    Converts com Taxa de Convert, saques e bônus.
+    """
+    rng = random.Random(seed)
+    date = start
+    produced = 0
+    while produced < count:
+        date += timedelta(seconds=rng.randint(60, 86400))
+        stamp = date.strftime("%d/%m/%Y %H:%M:%S")
+        amount = rng.uniform(0.0001, 5)
+        kind = rng.random()
+        if kind < 0.15:
+            rows = [[stamp, "Depósito em Reais", "BRL", _amount(amount * 1000, "+", estimates, brl=True), "Concluído"]]
+        elif kind < 0.45:
+            rows = [
+                [stamp, "Compra(BTC/BRL)", "BRL", _amount(amount * 1000, "-", estimates, brl=True), "Concluído"],
+                [stamp, "Compra(BTC/BRL)", "BTC", _amount(amount / 100, "+", estimates), "Concluído"],
+                [stamp, "Taxa de transação", "BTC", _amount(amount / 10000, "-", estimates), "Concluído"],
+            ]
+        elif kind < 0.65:
+            rows = [
+                [stamp, "Venda(ETH/BRL)", "ETH", _amount(amount / 10, "-", estimates), "Concluído"],
+                [stamp, "Venda(ETH/BRL)", "BRL", _amount(amount * 900, "+", estimates, brl=True), "Concluído"],
+                [stamp, "Taxa de transação", "BRL", _amount(amount, "-", estimates, brl=True), "Concluído"],
+            ]
+        elif kind < 0.8:
+            rows = [
+                [stamp, "Taxa de Convert", "USDT", _amount(amount / 100, "-", estimates), "Concluído"],
+                [stamp, "Convert", "BRL", _amount(amount * 100, "-", estimates, brl=True), "Concluído"],
+                [stamp, "Convert", "USDT", _amount(amount * 19, "+", estimates), "Concluído"],
+            ]
+        elif kind < 0.9:
+            rows = [
+                [stamp, "Saque de criptomoedas", "USDT", _amount(amount, "-", estimates), "Concluído"],
+                [stamp, "Taxa de saque de criptomoedas", "USDT", _amount(amount / 50, "-", estimates), "Concluído"],
+            ]
+        else:
+            rows = [[stamp, "Redeemed Bonus", "NOVA", _amount(amount, "+", estimates), "Concluído"]]
+        for row in rows[:count - produced]:
+            yield row
+            produced += 1
+
+def write_novadax_csv(path: str, count: int, seed: int = 0) -> str:
+    """
+    Grava um CSV sintético da Novadax com 'count' linhas.
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(NOVADAX_HEADER)
+        writer.writerows(iter_novadax_rows(count, seed))
+    return path
+
+# Layout da tabela no PDF sintético (pontos; página A4 em pé)
+_PAGE_WIDTH, _PAGE_HEIGHT = 595, 842
+_COLUMNS = [40, 150, 330, 380, 500, 560]
+_ROW_HEIGHT = 20
+_TOP = 800
+
+def _pdf_text(text: str) -> bytes:
+    data = text.encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def _page_content(rows) -> bytes:
+    """
+    Desenha a tabela com linhas de grade (para a estratégia 'lines' do
+    pdfplumber) e o texto de cada célula.
+    """
+    ops = [b'0.5 w']
+    bottom = _TOP - _ROW_HEIGHT * len(rows)
+    for i in range(len(rows) + 1):
+        y = _TOP - _ROW_HEIGHT * i
+        ops.append(f'{_COLUMNS[0]} {y} m {_COLUMNS[-1]} {y} l S'.encode())
+    for x in _COLUMNS:
+        ops.append(f'{x} {_TOP} m {x} {bottom} l S'.encode())
+    for i, row in enumerate(rows):
+        y = _TOP - _ROW_HEIGHT * (i + 1) + 6
+        for j, cell in enumerate(row):
+            ops.append(b'BT /F1 7 Tf ' + f'{_COLUMNS[j] + 2} {y} Td '.encode()
+                       + _pdf_text(cell) + b' Tj ET')
+    return b'\n'.join(ops)
+
+def write_novadax_pdf(path: str, count: int, seed: int = 0, rows_per_page: int = 35) -> str:
+    """
+    Grava um PDF sintético no layout do extrato da Novadax (uma tabela com
+    cabeçalho por página). Os valores não trazem a estimativa '(≈R$...)',
+    que não existe na codificação da fonte padrão do PDF.
+    """
+    rows = list(iter_novadax_rows(count, seed, estimates=False))
+    return write_rows_pdf(path, rows, rows_per_page)
+
+def write_rows_pdf(path: str, rows, rows_per_page: int = 35) -> str:
+    """
+    Grava as linhas informadas (5 campos cada) como um PDF no layout do
+    extrato da Novadax.
+    """
+    pages = [rows[i:i + rows_per_page] for i in range(0, len(rows), rows_per_page)] or [[]]
+
+    objects = []  # Conteúdo de cada objeto, numerados a partir de 1
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog = add(b'')  # Preenchido no final
+    pages_obj = add(b'')
+    font = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    page_ids = []
+    for page_rows in pages:
+        content = _page_content([NOVADAX_HEADER] + page_rows)
+        stream = add(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        page_ids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] ' % (pages_obj, _PAGE_WIDTH, _PAGE_HEIGHT)
+            + b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>' % (font, stream)
+        ))
+    objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages_obj
+    objects[pages_obj - 1] = (b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % p for p in page_ids)
+                              + b'] /Count %d >>' % len(page_ids))
+
+    with open(path, 'wb') as pdf:
+        pdf.write(b'%PDF-1.4\n')
+        offsets = []
+        for number, obj in enumerate(objects, start=1):
+            offsets.append(pdf.tell())
+            pdf.write(b'%d 0 obj\n' % number + obj + b'\nendobj\n')
+        xref = pdf.tell()
+        pdf.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            pdf.write(b'%010d 00000 n \n' % offset)
+        pdf.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                  % (len(objects) + 1, catalog, xref))
+    return path
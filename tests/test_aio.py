@@ -0,0 +1,26 @@
+"""
+API assíncrona: conversões simultâneas de PDF, que rodam em threads do
+executor e criam os processos de extração e do pipeline a partir delas,
+dão o mesmo resultado da conversão síncrona.
+"""
+import asyncio
+
+from novadax_koinly.aio import AsyncConverter
+
+from .synthetic import write_novadax_pdf
+
+def test_concurrent_pdf_conversions(tmp_path):
+    pdf = str(tmp_path / "extrato.pdf")
+    write_novadax_pdf(pdf, 120)
+    outputs = [str(tmp_path / f"koinly{i}.csv") for i in range(3)]
+
+    async def convert_all():
+        converter = AsyncConverter(concurrency=3)
+        return await asyncio.gather(*(converter.convert(pdf, output, page_timeout=30)
+                                      for output in outputs))
+
+    results = asyncio.run(convert_all())
+    assert [result["converted_rows"] for result in results] == [results[0]["converted_rows"]] * 3
+    assert results[0]["converted_rows"] > 0
+    contents = [open(output, encoding="utf-8").read() for output in outputs]
+    assert contents[1:] == contents[:1] * 2
@@ -0,0 +1,55 @@
+"""
+Saldos negativos só podem ser apontados entre operações: as pernas de um
+Convert (ou de uma Compra e sua taxa) têm a mesma data/hora e entram juntas,
+em qualquer ordem do extrato.
+"""
+from decimal import Decimal
+
+import pytest
+
+from novadax_koinly.balances import BalanceTracker
+from novadax_koinly.converter import iter_koinly_records_from
+
+HEADER = "Data,Tipo,Moeda,Valor,Status\n"
+
+DEPOSIT = ['01/01/2023 10:00:00,Depósito em Reais,BRL,"+100,00",Concluído']
+
+CONVERT_WITH_FEE = [
+    '02/01/2023 10:00:00,Taxa de Convert,USDT,"-0,1",Concluído',
+    '02/01/2023 10:00:00,Convert,BRL,"-100,00",Concluído',
+    '02/01/2023 10:00:00,Convert,USDT,"+9,5",Concluído',
+]
+
+BUY_WITH_FEE = [
+    '02/01/2023 10:00:00,Compra(BTC/BRL),BRL,"-100,00",Concluído',
+    '02/01/2023 10:00:00,Compra(BTC/BRL),BTC,"+0,001",Concluído',
+    '02/01/2023 10:00:00,Taxa de transação,BTC,"-0,000001",Concluído',
+]
+
+def _summary(tmp_path, lines):
+    path = tmp_path / "extrato.csv"
+    path.write_text(HEADER + "\n".join(lines) + "\n", encoding="utf-8")
+    balances = BalanceTracker()
+    for _ in balances.track(iter_koinly_records_from(str(path))):
+        pass
+    return balances.summary()
+
+@pytest.mark.parametrize("operation", [CONVERT_WITH_FEE, BUY_WITH_FEE], ids=["convert", "compra"])
+@pytest.mark.parametrize("descending", [False, True], ids=["crescente", "decrescente"])
+def test_operation_with_fee_is_not_negative(tmp_path, operation, descending):
+    lines = DEPOSIT + operation
+    if descending:
+        # O extrato decrescente lista as operações mais novas primeiro; as
+        # linhas de uma mesma operação mantêm a ordem da NovaDax
+        lines = operation + DEPOSIT
+    summary = _summary(tmp_path, lines)
+    assert summary["order"] == ("descending" if descending else "ascending")
+    assert summary["negative_balances"] == {}
+
+@pytest.mark.parametrize("descending", [False, True], ids=["crescente", "decrescente"])
+def test_overdraft_is_reported(tmp_path, descending):
+    spend = ['02/01/2023 10:00:00,Compra(BTC/BRL),BRL,"-150,00",Concluído',
+             '02/01/2023 10:00:00,Compra(BTC/BRL),BTC,"+0,0015",Concluído']
+    lines = spend + DEPOSIT if descending else DEPOSIT + spend
+    negative = _summary(tmp_path, lines)["negative_balances"]
+    assert negative == {"BRL": {"balance": Decimal("-50.00"), "date": "2023-01-02 10:00 UTC"}}
@@ -0,0 +1,101 @@
+"""
+Custo FIFO e alienações mensais: a perna em reais de uma Compra/Venda avalia
+a perna em cripto da mesma operação, os lotes saem na ordem de compra e o
+limite de isenção é conferido por mês.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from novadax_koinly.converter import KoinlyRecord
+from novadax_koinly.costbasis import compute_cost_basis, group_brl_values
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+def _trade(date, kind, asset, quantity, brl, fee=None):
+    """
+    Linhas NovaDax de uma Compra ou Venda de 'quantity' 'asset' por 'brl'
+    reais, com a taxa (em cripto) opcional.
+    """
+    tipo = f"{kind}({asset}/BRL)"
+    crypto_sign, brl_sign = ("+", "-") if kind == "Compra" else ("-", "+")
+    lines = [f'{date},{tipo},BRL,"{brl_sign}{brl}",Concluído',
+             f'{date},{tipo},{asset},"{crypto_sign}{quantity}",Concluído']
+    if fee:
+        lines.append(f'{date},Taxa de transação,{asset},"-{fee}",Concluído')
+    return lines
+
+def _cost_basis(tmp_path, lines, descending=False):
+    path = tmp_path / "extrato.csv"
+    if descending:
+        lines = lines[::-1]
+    path.write_text("Data,Tipo,Moeda,Valor,Status\n" + "\n".join(lines) + "\n", encoding="utf-8")
+    return compute_cost_basis(str(path), report_file=str(tmp_path / "alienacoes.csv"))
+
+@pytest.mark.parametrize("descending", [False, True], ids=["crescente", "decrescente"])
+def test_fifo_consumes_oldest_lots(tmp_path, descending):
+    summary = _cost_basis(tmp_path, (
+        _trade("01/01/2023 10:00:00", "Compra", "BTC", "1", "100,00")
+        + _trade("02/01/2023 10:00:00", "Compra", "BTC", "1", "200,00")
+        + _trade("03/01/2023 10:00:00", "Venda", "BTC", "1,5", "600,00")
+    ), descending)
+    btc = summary["months"]["2023-01"]["assets"]["BTC"]
+    assert (btc["quantity"], btc["proceeds"], btc["cost"], btc["gain"]) == (
+        Decimal("1.5"), Decimal("600.00"), Decimal("200.00"), Decimal("400.00"))
+    assert summary["holdings"]["BTC"] == {"quantity": Decimal("0.5"), "cost": Decimal("100.00")}
+    assert summary["months"]["2023-01"]["exempt"] is True
+    assert not summary["uncovered"]
+
+def test_fee_consumes_lots_without_disposal(tmp_path):
+    summary = _cost_basis(tmp_path, (
+        _trade("01/01/2023 10:00:00", "Compra", "BTC", "1", "100,00", fee="0,1")
+        + _trade("02/01/2023 10:00:00", "Venda", "BTC", "0,9", "180,00")
+    ))
+    btc = summary["months"]["2023-01"]["assets"]["BTC"]
+    assert (btc["quantity"], btc["cost"], btc["rows"]) == (Decimal("0.9"), Decimal("90.00"), 1)
+    assert "BTC" not in summary["holdings"]
+
+def test_month_above_limit_is_not_exempt(tmp_path):
+    summary = _cost_basis(tmp_path, (
+        _trade("01/03/2023 10:00:00", "Compra", "ETH", "10", "50.000,00")
+        + _trade("02/03/2023 10:00:00", "Venda", "ETH", "10", "60.000,00")
+    ))
+    month = summary["months"]["2023-03"]
+    assert (month["proceeds"], month["gain"], month["exempt"]) == (
+        Decimal("60000.00"), Decimal("10000.00"), False)
+    report = (tmp_path / "alienacoes.csv").read_text(encoding="utf-8")
+    assert "2023-03,ETH,10,60000.00,50000.00,10000.00,60000.00,nao" in report
+
+def test_sale_without_purchase_is_uncovered(tmp_path):
+    summary = _cost_basis(tmp_path, _trade("01/01/2023 10:00:00", "Venda", "BTC", "1", "100,00"))
+    assert summary["uncovered"] == {"BTC": Decimal("1")}
+    assert summary["months"]["2023-01"]["assets"]["BTC"]["cost"] == Decimal("0")
+
+def test_unpriced_disposal_leaves_exemption_undetermined(tmp_path):
+    # Troca de cripto por cripto sem estimativa em reais nem arquivo de preços
+    summary = _cost_basis(tmp_path, [
+        '01/01/2023 10:00:00,Convert,BTC,"-1",Concluído',
+        '01/01/2023 10:00:00,Convert,USDT,"+20000",Concluído',
+    ])
+    month = summary["months"]["2023-01"]
+    assert (month["unpriced_rows"], month["exempt"]) == (1, None)
+    assert "indeterminado" in (tmp_path / "alienacoes.csv").read_text(encoding="utf-8")
+
+def test_group_brl_values_splits_by_quantity():
+    date = datetime(2023, 1, 1, 10)
+    paid = KoinlyRecord(date, sent_amount=Decimal("300"), sent_currency="BRL", label="buy")
+    first = KoinlyRecord(date, received_amount=Decimal("1"), received_currency="BTC", label="buy")
+    second = KoinlyRecord(date, received_amount=Decimal("2"), received_currency="BTC", label="buy")
+    fee = KoinlyRecord(date, fee_amount=Decimal("0.01"), fee_currency="BTC", label="fee")
+    values = group_brl_values([paid, first, second, fee])
+    assert values == {id(first): Decimal("100"), id(second): Decimal("200")}
+
+def test_group_brl_values_skips_mixed_assets():
+    date = datetime(2023, 1, 1, 10)
+    group = [KoinlyRecord(date, sent_amount=Decimal("300"), sent_currency="BRL", label="buy"),
+             KoinlyRecord(date, received_amount=Decimal("1"), received_currency="BTC", label="buy"),
+             KoinlyRecord(date, received_amount=Decimal("2"), received_currency="ETH", label="buy")]
+    assert group_brl_values(group) == {}
@@ -0,0 +1,71 @@
+"""
+Filtro de moeda por operação: as pernas de uma Compra, Venda ou Convert (e
+a taxa) com a mesma data/hora são mantidas ou descartadas juntas, também na
+conversão em paralelo.
+"""
+import mmap
+
+import pytest
+
+from novadax_koinly.converter import RowFilter, iter_koinly_records_from, new_stats
+from novadax_koinly.parallel import find_chunk_boundaries, iter_koinly_records_parallel
+
+from .synthetic import write_novadax_csv
+
+STATEMENT = (
+    "Data,Tipo,Moeda,Valor,Status\n"
+    '01/01/2023 09:00:00,Depósito em Reais,BRL,"+500,00",Concluído\n'
+    '01/01/2023 10:00:00,Compra(BTC/BRL),BRL,"-100,00",Concluído\n'
+    '01/01/2023 10:00:00,Compra(BTC/BRL),BTC,"+0,001",Concluído\n'
+    '01/01/2023 10:00:00,Taxa de transação,BTC,"-0,000001",Concluído\n'
+    '02/01/2023 10:00:00,Venda(ETH/BRL),ETH,"-0,1",Concluído\n'
+    '02/01/2023 10:00:00,Venda(ETH/BRL),BRL,"+90,00",Concluído\n'
+    '02/01/2023 10:00:00,Taxa de transação,BRL,"-0,09",Concluído\n'
+    '03/01/2023 10:00:00,Taxa de Convert,USDT,"-0,1",Concluído\n'
+    '03/01/2023 10:00:00,Convert,BRL,"-100,00",Concluído\n'
+    '03/01/2023 10:00:00,Convert,USDT,"+19,0",Concluído\n'
+)
+
+def _convert(tmp_path, currencies):
+    path = tmp_path / "extrato.csv"
+    path.write_text(STATEMENT, encoding="utf-8")
+    stats = new_stats()
+    records = list(iter_koinly_records_from(str(path), stats,
+                                            row_filter=RowFilter(currencies=currencies)))
+    return [(r.label, r.sent_currency, r.received_currency) for r in records], stats
+
+def test_currency_keeps_whole_buy(tmp_path):
+    records, stats = _convert(tmp_path, ["BTC"])
+    assert records == [("buy", "BRL", ""), ("buy", "", "BTC"), ("fee", "", "")]
+    assert stats["filtered_rows"] == 7
+
+def test_currency_keeps_whole_sell(tmp_path):
+    records, stats = _convert(tmp_path, ["ETH"])
+    assert records == [("sell", "ETH", ""), ("sell", "", "BRL"), ("fee", "", "")]
+
+def test_brl_keeps_every_operation_with_a_brl_leg(tmp_path):
+    records, stats = _convert(tmp_path, ["BRL"])
+    assert [label for label, _, _ in records] == ["deposit", "buy", "buy", "fee",
+                                                  "sell", "sell", "fee", "trade"]
+    assert stats["filtered_rows"] == 0
+
+def test_chunk_boundaries_do_not_split_a_datetime(tmp_path):
+    path = str(tmp_path / "grande.csv")
+    write_novadax_csv(path, 2000)
+    with open(path, "rb") as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        boundaries = find_chunk_boundaries(mm, 4096)
+        assert len(boundaries) > 10
+        for boundary in boundaries[1:-1]:
+            previous = mm[mm.rfind(b"\n", 0, boundary - 1) + 1:boundary]
+            following = mm[boundary:mm.find(b"\n", boundary)]
+            assert previous.split(b",")[0] != following.split(b",")[0]
+
+@pytest.mark.parametrize("currencies", [["BTC"], ["USDT"]])
+def test_parallel_filter_matches_sequential(tmp_path, currencies):
+    path = str(tmp_path / "grande.csv")
+    write_novadax_csv(path, 2000)
+    row_filter = RowFilter(currencies=currencies)
+    sequential = [r.to_row() for r in iter_koinly_records_from(path, row_filter=row_filter)]
+    parallel = [r.to_row() for r in iter_koinly_records_parallel(
+        path, new_stats(), workers=2, chunk_size=4096, row_filter=row_filter)]
+    assert parallel == sequential
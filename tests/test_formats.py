@@ -0,0 +1,57 @@
+"""
+Formatos de --also: a linha Trade do CoinTracking junta as duas pernas da
+operação, o razão numera por transação e a cópia Koinly é igual à saída
+principal.
+"""
+import csv
+
+import pytest
+
+from novadax_koinly.converter import convert_novadax_to_koinly
+
+STATEMENT = (
+    "Data,Tipo,Moeda,Valor,Status\n"
+    '01/01/2023 09:00:00,Depósito em Reais,BRL,"+500,00",Concluído\n'
+    '01/01/2023 10:00:00,Compra(BTC/BRL),BRL,"-100,00",Concluído\n'
+    '01/01/2023 10:00:00,Compra(BTC/BRL),BTC,"+0,001",Concluído\n'
+    '01/01/2023 10:00:00,Taxa de transação,BTC,"-0,000001",Concluído\n'
+    '03/01/2023 10:00:00,Taxa de Convert,USDT,"-0,1",Concluído\n'
+    '03/01/2023 10:00:00,Convert,BRL,"-100,00",Concluído\n'
+    '03/01/2023 10:00:00,Convert,USDT,"+19,0",Concluído\n'
+)
+
+@pytest.fixture
+def outputs(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    statement = tmp_path / "extrato.csv"
+    statement.write_text(STATEMENT, encoding="utf-8")
+    paths = {name: str(tmp_path / f"{name}.csv") for name in ("cointracking", "ledger", "koinly")}
+    convert_novadax_to_koinly(str(statement), str(tmp_path / "saida.csv"),
+                              extra_outputs=list(paths.items()))
+    paths["saida"] = str(tmp_path / "saida.csv")
+    return {name: list(csv.reader(open(path, encoding="utf-8", newline="")))
+            for name, path in paths.items()}
+
+def test_cointracking_pairs_trade_legs(outputs):
+    rows = [row[:7] for row in outputs["cointracking"][1:]]
+    assert rows == [
+        ["Deposit", "500.00", "BRL", "", "", "", ""],
+        ["Trade", "0.001", "BTC", "100.00", "BRL", "", ""],
+        ["Other Fee", "", "", "0.000001", "BTC", "", ""],
+        ["Trade", "19.0", "USDT", "100.00", "BRL", "0.1", "USDT"],
+    ]
+
+def test_ledger_numbers_per_transaction(outputs):
+    entries = [(row[0], row[3], row[4]) for row in outputs["ledger"][1:]]
+    assert entries == [
+        ("1", "BRL", "500.00"),
+        ("2", "BRL", "-100.00"),
+        ("2", "BTC", "0.001"),
+        ("2", "BTC", "-0.000001"),
+        ("3", "USDT", "19.0"),
+        ("3", "BRL", "-100.00"),
+        ("3", "USDT", "-0.1"),
+    ]
+
+def test_koinly_copy_matches_output(outputs):
+    assert outputs["koinly"] == outputs["saida"]
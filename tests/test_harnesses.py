@@ -0,0 +1,18 @@
+"""
+Os harnesses de verificação rodando pelo pytest, em tamanho reduzido: o
+diferencial (motores de conversão contra a referência congelada) e o de
+pico de memória. Para as execuções completas, veja o README.
+"""
+from .difftest import run_difftest
+from .memcheck import run_memcheck
+
+def test_engines_match_reference(tmp_path):
+    executed, failures = run_difftest(cases=20, rows=40, pdf_cases=2, report_dir=str(tmp_path))
+    assert all(executed.values())
+    assert not failures, [report for _, _, report in failures]
+
+def test_memory_stays_within_budget(tmp_path):
+    results, failures = run_memcheck(sizes=(2000, 8000), pdf_sizes=(50,),
+                                     report_dir=str(tmp_path))
+    assert results
+    assert not failures, [reason for _, reason, _ in failures]
@@ -0,0 +1,60 @@
+"""
+Modo incremental (--append-to): uma conversão que falha não deixa linhas
+acrescentadas sem avançar a marca, e linhas descartadas por filtros não
+avançam a marca.
+"""
+import pytest
+
+from novadax_koinly.converter import RowFilter, convert_novadax_to_koinly
+from novadax_koinly.progress import ConversionCancelled, Progress
+
+from .synthetic import write_novadax_csv
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+def _cancel_after(rows):
+    def callback(info):
+        if info["rows_done"] >= rows:
+            raise ConversionCancelled("Conversão cancelada")
+    return callback
+
+def test_failed_append_leaves_outputs_untouched(tmp_path):
+    first, full = str(tmp_path / "jan.csv"), str(tmp_path / "fev.csv")
+    write_novadax_csv(first, 300)
+    write_novadax_csv(full, 3000)  # Mesma semente: começa pelas linhas de jan.csv
+    output, copy = tmp_path / "koinly.csv", tmp_path / "copia.csv"
+    extra = [("koinly", str(copy))]
+    convert_novadax_to_koinly(first, str(output), append=True, extra_outputs=extra)
+    before = output.read_bytes(), copy.read_bytes(), (tmp_path / "koinly_state.json").read_bytes()
+
+    with pytest.raises(ConversionCancelled):
+        convert_novadax_to_koinly(full, str(output), append=True, extra_outputs=extra,
+                                  progress=Progress(_cancel_after(1000), interval=0))
+    assert (output.read_bytes(), copy.read_bytes(),
+            (tmp_path / "koinly_state.json").read_bytes()) == before
+
+    # A próxima conversão acrescenta as linhas novas uma única vez
+    convert_novadax_to_koinly(full, str(output), append=True)
+    convert_novadax_to_koinly(full, str(tmp_path / "inteiro.csv"))
+    assert output.read_bytes() == (tmp_path / "inteiro.csv").read_bytes()
+
+def test_filtered_convert_does_not_advance_mark(tmp_path):
+    statement = tmp_path / "extrato.csv"
+    statement.write_text(
+        "Data,Tipo,Moeda,Valor,Status\n"
+        '01/01/2023 10:00:00,Depósito de criptomoedas,BTC,"+0,001",Concluído\n'
+        '02/01/2023 10:00:00,Taxa de Convert,USDT,"-0,1",Concluído\n'
+        '02/01/2023 10:00:00,Convert,BRL,"-100,00",Concluído\n'
+        '02/01/2023 10:00:00,Convert,USDT,"+19,0",Concluído\n',
+        encoding="utf-8")
+    output = str(tmp_path / "koinly.csv")
+
+    result = convert_novadax_to_koinly(str(statement), output, append=True,
+                                       row_filter=RowFilter(currencies=["BTC"]))
+    assert result["filtered_rows"] == 3
+    # Sem o filtro, o Convert descartado antes entra na saída
+    result = convert_novadax_to_koinly(str(statement), output, append=True)
+    assert result["converted_rows"] == 1
+    assert open(output, encoding="utf-8").read().count("USDT") == 2
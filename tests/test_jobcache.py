@@ -0,0 +1,88 @@
+"""
+Cache de conversões: a mesma entrada com as mesmas opções reaproveita os
+arquivos guardados; outra entrada, outras opções ou outras regras convertem
+de novo, e as conversões usadas há mais tempo saem quando o cache enche.
+"""
+import os
+
+import pytest
+
+from novadax_koinly import jobcache
+from novadax_koinly.cli import main
+from novadax_koinly.jobcache import JobCache
+
+from .synthetic import write_novadax_csv
+
+@pytest.fixture(autouse=True)
+def _fresh_fingerprint():
+    jobcache.rules_fingerprint.cache_clear()
+    yield
+    jobcache.rules_fingerprint.cache_clear()
+
+def _output(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+def test_restore_copies_files_to_new_paths(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"))
+    source = _output(tmp_path, "entrada.csv", "linhas")
+    key = cache.job_key(source, {"currency": None})
+    assert cache.restore(key, {"koinly": str(tmp_path / "x.csv")}) is None
+
+    produced = _output(tmp_path, "koinly.csv", "saida")
+    cache.store(key, {"koinly": produced}, {"output_file": produced, "converted_rows": 3})
+    target = str(tmp_path / "outra.csv")
+    result = cache.restore(key, {"koinly": target})
+    assert result == {"output_file": target, "converted_rows": 3}
+    assert open(target, encoding="utf-8").read() == "saida"
+
+def test_key_changes_with_input_options_and_rules(tmp_path, monkeypatch):
+    cache = JobCache(str(tmp_path / "cache"))
+    source = _output(tmp_path, "entrada.csv", "linhas")
+    key = cache.job_key(source, {"currency": None})
+    assert cache.job_key(source, {"currency": "BTC"}) != key
+    assert cache.job_key(_output(tmp_path, "outra.csv", "outras"), {"currency": None}) != key
+
+    monkeypatch.setattr(jobcache, "__version__", "0+regras-novas")
+    jobcache.rules_fingerprint.cache_clear()
+    assert cache.job_key(source, {"currency": None}) != key
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"), max_bytes=2700)
+    keys = []
+    for i, name in enumerate(["a", "b", "c"]):
+        produced = _output(tmp_path, name + ".csv", name * 1000)
+        keys.append(cache.job_key(produced, {}))
+        cache.store(keys[-1], {"koinly": produced}, {})
+        # mtime distinto por conversão, mesmo em sistemas de arquivos com resolução de 1 s
+        os.utime(cache._job_file(keys[-1]), (i, i))
+        if name == "b":
+            # 'a' é usada de novo: 'b' passa a ser a mais antiga
+            assert cache.restore(keys[0], {"koinly": str(tmp_path / "r.csv")}) is not None
+            os.utime(cache._job_file(keys[0]), (i + 1, i + 1))
+
+    target = {"koinly": str(tmp_path / "r.csv")}
+    assert cache.restore(keys[1], target) is None
+    assert cache.restore(keys[0], target) is not None
+    assert cache.restore(keys[2], target) is not None
+    assert len(os.listdir(cache.blobs_dir)) == 2
+
+def test_cli_reuses_result_until_rules_change(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    write_novadax_csv("novadax.csv", 200)
+    args = ["novadax.csv", "--no-progress", "--cache-dir", str(tmp_path / "cache")]
+
+    main(args + ["-o", "primeira.csv"])
+    assert "reaproveitado do cache" not in capsys.readouterr().out
+    main(args + ["-o", "segunda.csv"])
+    assert "reaproveitado do cache" in capsys.readouterr().out
+    assert (tmp_path / "primeira.csv").read_bytes() == (tmp_path / "segunda.csv").read_bytes()
+
+    main(args + ["-o", "terceira.csv", "--currency", "BTC"])
+    assert "reaproveitado do cache" not in capsys.readouterr().out
+
+    monkeypatch.setattr(jobcache, "__version__", "0+regras-novas")
+    jobcache.rules_fingerprint.cache_clear()
+    main(args + ["-o", "quarta.csv"])
+    assert "reaproveitado do cache" not in capsys.readouterr().out
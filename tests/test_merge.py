@@ -0,0 +1,66 @@
+"""
+'nova2k merge': merge de k vias em ordem cronológica, ordenação em disco das
+entradas fora de ordem e remoção de duplicatas entre entradas.
+"""
+import csv
+
+import pytest
+
+from novadax_koinly.converter import KOINLY_HEADER, convert_novadax_to_koinly
+from novadax_koinly.merge import merge_statements
+
+from .synthetic import write_novadax_csv
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+def _read(path):
+    with open(path, encoding="utf-8", newline="") as infile:
+        return list(csv.reader(infile))
+
+def _write_koinly(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as outfile:
+        csv.writer(outfile).writerows([KOINLY_HEADER] + rows)
+    return str(path)
+
+def _row(date, label, amount="1"):
+    return [date, "", "", amount, "BTC", "", "", "", "", label, "", ""]
+
+def test_merge_interleaves_sorted_inputs(tmp_path):
+    a = _write_koinly(tmp_path / "a.csv", [_row("2023-01-01 10:00 UTC", "a1"),
+                                           _row("2023-01-03 10:00 UTC", "a3")])
+    b = _write_koinly(tmp_path / "b.csv", [_row("2023-01-02 10:00 UTC", "b2"),
+                                           _row("2023-01-03 10:00 UTC", "b3")])
+    stats = merge_statements([a, b], str(tmp_path / "saida.csv"))
+    assert [row[9] for row in _read(tmp_path / "saida.csv")[1:]] == ["a1", "b2", "a3", "b3"]
+    assert (stats["sorted_inputs"], stats["spilled_runs"], stats["merged_rows"]) == (2, 0, 4)
+
+def test_unsorted_input_is_sorted_on_disk_and_stable(tmp_path):
+    rows = [_row("2023-01-05 10:00 UTC", "e"), _row("2023-01-01 10:00 UTC", "a"),
+            _row("2023-01-03 10:00 UTC", "c1"), _row("2023-01-03 10:00 UTC", "c2"),
+            _row("2023-01-02 10:00 UTC", "b"), _row("2023-01-04 10:00 UTC", "d")]
+    path = _write_koinly(tmp_path / "fora.csv", rows)
+    stats = merge_statements([path], str(tmp_path / "saida.csv"), run_rows=4)
+    assert [row[9] for row in _read(tmp_path / "saida.csv")[1:]] == ["a", "b", "c1", "c2", "d", "e"]
+    assert stats["spilled_runs"] == 2
+
+def test_dedup_overlapping_statement_and_koinly_file(tmp_path):
+    jan, full = str(tmp_path / "jan.csv"), str(tmp_path / "completo.csv")
+    write_novadax_csv(jan, 150)
+    write_novadax_csv(full, 400)  # Mesma semente: repete as linhas de jan.csv
+    jan_koinly = str(tmp_path / "jan_koinly.csv")
+    convert_novadax_to_koinly(jan, jan_koinly)
+    convert_novadax_to_koinly(full, str(tmp_path / "esperado.csv"))
+
+    stats = merge_statements([jan_koinly, full], str(tmp_path / "saida.csv"), dedup=True)
+    assert _read(tmp_path / "saida.csv") == _read(tmp_path / "esperado.csv")
+    assert stats["duplicate_rows"] == len(_read(jan_koinly)) - 1
+
+def test_dedup_keeps_repeats_within_one_input(tmp_path):
+    repeated = _row("2023-01-01 10:00 UTC", "x")
+    a = _write_koinly(tmp_path / "a.csv", [repeated, repeated])
+    b = _write_koinly(tmp_path / "b.csv", [repeated])
+    stats = merge_statements([a, b], str(tmp_path / "saida.csv"), dedup=True)
+    assert len(_read(tmp_path / "saida.csv")) == 3
+    assert stats["duplicate_rows"] == 1
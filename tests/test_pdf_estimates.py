@@ -0,0 +1,34 @@
+"""
+A estimativa '(≈R$...)' precisa sobreviver à extração do PDF, inclusive
+quando a célula do valor quebra em duas linhas da tabela logo depois do
+marcador. O PDF sintético não representa o '≈' (a fonte padrão do PDF não
+tem o caractere), então o teste parte das linhas da tabela extraídas.
+"""
+from decimal import Decimal
+
+import pytest
+
+from novadax_koinly.converter import process_novadax_row
+from novadax_koinly.pdf_converter import assemble_rows, clean_table_row
+
+START = ["10/01/2023 10:00:00", "Venda(ETH/BRL)", "ETH"]
+
+@pytest.mark.parametrize("first, rest", [
+    ("-0,5 (≈R$", "1.234,56)"),
+    ("-0,5 (≈", "R$1.234,56)"),
+    ("-0,5 (", "≈R$1.234,56)"),
+    ("-0,5", "(≈R$1.234,56)"),
+])
+def test_estimate_wrapped_across_table_rows(first, rest):
+    raw_rows = [(START + [first, "Concluído"], 1), (["", "", "", rest, ""], 1)]
+    (row, page), = assemble_rows(raw_rows)
+    cleaned = clean_table_row(row)
+    assert cleaned[3] == "-0,5 (≈R$1.234,56)"
+    record = process_novadax_row(cleaned)
+    assert record.sent_amount == Decimal("0.5")
+    assert record.net_worth_amount == Decimal("1234.56")
+
+def test_estimate_wrapped_inside_cell():
+    (row, page), = assemble_rows([(START + ["-0,5 (≈R$\n1.234,56)", "Concluído"], 1)])
+    record = process_novadax_row(clean_table_row(row))
+    assert record.net_worth_amount == Decimal("1234.56")
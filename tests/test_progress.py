@@ -0,0 +1,73 @@
+"""
+Progresso e cancelamento: os avisos ao callback durante a conversão e a
+interrupção cooperativa nos pontos de checagem.
+"""
+import pytest
+
+from novadax_koinly import parallel
+from novadax_koinly.converter import convert_novadax_to_koinly
+from novadax_koinly.progress import CancelToken, ConversionCancelled, Progress, count_lines
+
+from .synthetic import write_novadax_csv
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+@pytest.mark.parametrize("content, lines", [
+    (b"Data\n", 0), (b"Data\na\nb\n", 2), (b"Data\na\nb", 2), (b"", 0),
+])
+def test_count_lines(tmp_path, content, lines):
+    path = tmp_path / "extrato.csv"
+    path.write_bytes(content)
+    assert count_lines(str(path)) == lines
+
+def test_cancel_token():
+    token = CancelToken()
+    token.check()
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(ConversionCancelled):
+        token.check()
+
+def test_track_checkpoints_every_batch():
+    seen = []
+    progress = Progress(lambda info: seen.append(info["rows_done"]), interval=0)
+    assert list(progress.track(range(250), batch=100)) == list(range(250))
+    assert (seen, progress.rows_done) == ([100, 200], 250)
+
+@pytest.mark.parametrize("workers", [None, 2], ids=["sequencial", "paralelo"])
+def test_conversion_reports_progress(tmp_path, monkeypatch, workers):
+    # Trechos pequenos, para que o paralelo também avise antes do fim
+    monkeypatch.setattr(parallel, "MIN_CHUNK_BYTES", 4096)
+    source = str(tmp_path / "extrato.csv")
+    write_novadax_csv(source, 1000)
+    reports = []
+    progress = Progress(reports.append, interval=0)
+    convert_novadax_to_koinly(source, str(tmp_path / "koinly.csv"), progress=progress, workers=workers)
+
+    assert progress.total_rows == 1000
+    *running, last = reports
+    assert running and not any(info["done"] for info in running)
+    rows = [info["rows_done"] for info in running]
+    assert rows == sorted(rows) and 0 < rows[0] < 1000
+    assert all(info["fraction"] == info["rows_done"] / 1000 and info["eta"] is not None
+               for info in running)
+    assert (last["done"], last["fraction"], last["eta"], last["rows_done"]) == (True, 1.0, 0.0, 1000)
+
+def test_cancel_stops_at_next_checkpoint(tmp_path):
+    source = str(tmp_path / "extrato.csv")
+    write_novadax_csv(source, 1000)
+    token = CancelToken()
+    reports = []
+
+    def cancel_after_first(info):
+        reports.append(info)
+        token.cancel()
+
+    progress = Progress(cancel_after_first, interval=0, cancel=token)
+    with pytest.raises(ConversionCancelled):
+        convert_novadax_to_koinly(source, str(tmp_path / "koinly.csv"), progress=progress)
+    # Parou no ponto de checagem seguinte ao primeiro aviso, sem aviso final
+    assert len(reports) == 1 and not reports[0]["done"]
+    assert progress.rows_done < 1000
@@ -0,0 +1,70 @@
+"""
+Quarentena: as linhas rejeitadas vão para o arquivo de quarentena e, depois
+de corrigidas as regras, 'reprocess' insere as recuperadas na saída Koinly
+na ordem de datas do arquivo.
+"""
+import csv
+
+import pytest
+
+from novadax_koinly import converter
+from novadax_koinly.converter import KoinlyRecord, convert_novadax_to_koinly
+from novadax_koinly.quarantine import merge_into_output, read_quarantine, reprocess_quarantine
+
+ROWS = [
+    '01/01/2023 09:00:00,Depósito em Reais,BRL,"+500,00",Concluído',
+    '02/01/2023 09:00:00,Cashback,BRL,"+5,00",Concluído',
+    '03/01/2023 09:00:00,Depósito em Reais,BRL',
+    '04/01/2023 09:00:00,Saque em Reais,BRL,"-100,00",Concluído',
+]
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+def _dates(path):
+    with open(path, encoding="utf-8", newline="") as infile:
+        return [row[0] for row in list(csv.reader(infile))[1:]]
+
+@pytest.mark.parametrize("descending", [False, True], ids=["crescente", "decrescente"])
+def test_reprocess_inserts_recovered_rows_in_order(tmp_path, monkeypatch, descending):
+    statement = tmp_path / "extrato.csv"
+    rows = ROWS[::-1] if descending else ROWS
+    statement.write_text("Data,Tipo,Moeda,Valor,Status\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    output = str(tmp_path / "koinly.csv")
+
+    result = convert_novadax_to_koinly(str(statement), output)
+    assert result["quarantined_rows"] == 2
+    entries = read_quarantine(result["quarantine_file"])
+    assert sorted(row[1] for _, _, row in entries) == ["Cashback", "Depósito em Reais"]
+
+    # Nova regra: Cashback passa a ser reconhecido; a linha incompleta continua rejeitada
+    monkeypatch.setattr(converter, "TYPE_LABELS", converter.TYPE_LABELS + [(("cashback",), "reward")])
+    reprocessed = reprocess_quarantine(result["quarantine_file"], output)
+    assert (reprocessed["recovered_rows"], reprocessed["remaining_rows"]) == (1, 1)
+    assert len(read_quarantine(result["quarantine_file"])) == 1
+
+    expected = ["2023-01-01 09:00 UTC", "2023-01-02 09:00 UTC", "2023-01-04 09:00 UTC"]
+    assert _dates(output) == (expected[::-1] if descending else expected)
+
+def test_reprocess_removes_empty_quarantine(tmp_path, monkeypatch):
+    statement = tmp_path / "extrato.csv"
+    statement.write_text("Data,Tipo,Moeda,Valor,Status\n" + ROWS[1] + "\n", encoding="utf-8")
+    output = str(tmp_path / "koinly.csv")
+    quarantine_file = convert_novadax_to_koinly(str(statement), output)["quarantine_file"]
+
+    monkeypatch.setattr(converter, "TYPE_LABELS", converter.TYPE_LABELS + [(("cashback",), "reward")])
+    assert reprocess_quarantine(quarantine_file, output)["quarantine_file"] is None
+    assert not (tmp_path / "koinly_quarantine.csv").exists()
+    assert _dates(output) == ["2023-01-02 09:00 UTC"]
+
+def test_merge_into_output_keeps_undated_at_the_end(tmp_path):
+    output = tmp_path / "koinly.csv"
+    output.write_text(",".join(converter.KOINLY_HEADER) + "\n"
+                      + "2023-01-03 09:00 UTC" + "," * 11 + "\n"
+                      + "2023-01-01 09:00 UTC" + "," * 11 + "\n", encoding="utf-8")
+    records = [KoinlyRecord(None, label="reward"),
+               KoinlyRecord(converter.datetime(2023, 1, 2, 9), label="reward")]
+    assert merge_into_output(str(output), records) == 2
+    assert _dates(output) == ["2023-01-03 09:00 UTC", "2023-01-02 09:00 UTC",
+                              "2023-01-01 09:00 UTC", "Invalid Date"]
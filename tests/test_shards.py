@@ -0,0 +1,58 @@
+"""
+Divisão da saída em vários arquivos: partes de uma divisão anterior não
+ficam para trás, e a fila de escrita é limitada.
+"""
+import json
+import os
+import threading
+import time
+
+from novadax_koinly import converter
+from novadax_koinly.converter import iter_koinly_records_from, write_sharded_output
+
+from .synthetic import write_novadax_csv
+
+def _records(tmp_path, rows=600):
+    path = str(tmp_path / "extrato.csv")
+    write_novadax_csv(path, rows)
+    return iter_koinly_records_from(path)
+
+def test_fewer_shards_remove_leftovers(tmp_path):
+    output = str(tmp_path / "koinly.csv")
+    many, _ = write_sharded_output(_records(tmp_path), output, shard_rows=50)
+    few, manifest_file = write_sharded_output(_records(tmp_path), output, shard_rows=200)
+    assert len(few) < len(many)
+
+    with open(manifest_file, encoding="utf-8") as manifest:
+        listed = {os.path.basename(shard["file"]) for shard in json.load(manifest)["shards"]}
+    on_disk = {name for name in os.listdir(tmp_path) if name.startswith("koinly_0")}
+    assert on_disk == listed
+
+def test_pending_writes_are_bounded(tmp_path, monkeypatch):
+    written = 0
+    lock = threading.Lock()
+    write_shard = converter._write_shard
+
+    def slow_write(path, chunks):
+        nonlocal written
+        time.sleep(0.01)
+        write_shard(path, chunks)
+        with lock:
+            written += 1
+
+    monkeypatch.setattr(converter, "_write_shard", slow_write)
+    monkeypatch.setattr(converter, "SHARD_PENDING", 2)
+    shard_rows, most_pending = 10, 0
+
+    def counting(records):
+        nonlocal most_pending
+        for count, record in enumerate(records):
+            # Cada parte fechada e ainda não gravada espera na fila
+            most_pending = max(most_pending, count // shard_rows - written)
+            yield record
+
+    shards, _ = write_sharded_output(counting(_records(tmp_path)), str(tmp_path / "koinly.csv"),
+                                     shard_rows=shard_rows, shard_workers=1)
+    assert len(shards) > 30
+    # Na fila, mais a parte em gravação e a que está sendo montada
+    assert most_pending <= 4
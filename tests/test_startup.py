@@ -0,0 +1,71 @@
+"""
+Tempo de partida da CLI: `nova2k --help` e a conversão de um CSV pequeno não
+podem carregar a pilha de PDF (pdfplumber) nem passar do orçamento de tempo.
+"""
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Orçamentos em segundos, além da partida do próprio interpretador
+HELP_BUDGET = 0.3
+CSV_BUDGET = 0.6
+
+# Cada medição é a melhor de algumas execuções, para reduzir o ruído
+RUNS = 3
+
+SMALL_CSV = (
+    "Data,Tipo,Moeda,Valor,Status\n"
+    '10/01/2023 10:00:00,Depósito em Reais,BRL,"+100,00",Concluído\n'
+    '11/01/2023 10:00:00,Compra(BTC/BRL),BRL,"-50,00",Concluído\n'
+    '11/01/2023 10:00:00,Compra(BTC/BRL),BTC,"+0,00050000",Concluído\n'
+)
+
+HELP_CODE = """
+import sys
+from novadax_koinly.cli import main
+try:
+    main(['--help'])
+except SystemExit:
+    pass
+print('pdfplumber' in sys.modules)
+"""
+
+CSV_CODE = """
+import sys
+from novadax_koinly.cli import main
+main(['novadax.csv', '-o', 'koinly.csv', '--no-cache', '--no-progress'])
+print('pdfplumber' in sys.modules)
+"""
+
+def _run(code, cwd):
+    """
+    Melhor tempo de RUNS execuções de 'code' em um interpretador novo, e a
+    última linha da saída da última execução.
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, XDG_CACHE_HOME=str(cwd))
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                                   capture_output=True, text=True, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    lines = completed.stdout.strip().splitlines()
+    return best, lines[-1] if lines else ""
+
+def test_help_is_fast_and_skips_pdf_stack(tmp_path):
+    baseline, _ = _run("pass", tmp_path)
+    elapsed, pdf_loaded = _run(HELP_CODE, tmp_path)
+    assert pdf_loaded == "False"
+    assert elapsed - baseline < HELP_BUDGET, f"--help levou {elapsed - baseline:.3f}s"
+
+def test_csv_run_is_fast_and_skips_pdf_stack(tmp_path):
+    (tmp_path / "novadax.csv").write_text(SMALL_CSV, encoding="utf-8")
+    baseline, _ = _run("pass", tmp_path)
+    elapsed, pdf_loaded = _run(CSV_CODE, tmp_path)
+    assert pdf_loaded == "False"
+    assert (tmp_path / "koinly.csv").exists()
+    assert elapsed - baseline < CSV_BUDGET, f"conversão de CSV levou {elapsed - baseline:.3f}s"
@@ -0,0 +1,32 @@
+"""
+Entrada e saída padrão (nova2k - > saida.csv): as linhas rejeitadas não vão
+para um arquivo na pasta atual, a menos que --quarantine seja informado.
+"""
+import os
+import subprocess
+import sys
+
+from .test_startup import REPO_DIR
+
+STATEMENT = (
+    "Data,Tipo,Moeda,Valor,Status\n"
+    '01/01/2023 09:00:00,Depósito em Reais,BRL,"+500,00",Concluído\n'
+    '02/01/2023 09:00:00,Tipo desconhecido,BRL,"+1,00",Concluído\n'
+)
+
+def _run(cwd, *args):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, XDG_CACHE_HOME=str(cwd / "cache"))
+    return subprocess.run([sys.executable, "-m", "novadax_koinly.cli", "-", "--no-progress", *args],
+                          input=STATEMENT.encode("utf-8"), capture_output=True, cwd=cwd,
+                          env=env, check=True)
+
+def test_stream_without_quarantine_writes_nothing(tmp_path):
+    run = _run(tmp_path)
+    assert run.stdout.decode("utf-8").count("\n") == 2  # Cabeçalho e o depósito
+    assert "1 linhas rejeitadas descartadas" in run.stderr.decode("utf-8")
+    assert not [name for name in os.listdir(tmp_path) if "quarantine" in name]
+
+def test_stream_with_quarantine(tmp_path):
+    _run(tmp_path, "--quarantine", "rejeitadas.csv")
+    with open(tmp_path / "rejeitadas.csv", encoding="utf-8") as infile:
+        assert "Tipo desconhecido" in infile.read()